@@ -2,13 +2,23 @@
 
 import os
 import tempfile
-from flask import Flask, request, jsonify, send_from_directory
+import time
+from flask import Flask, Response, request, jsonify, send_from_directory, url_for
 from flask_cors import CORS # Needed for frontend development serving from different port
 
 # Import the processing function from your core logic
 # Assuming your structure is backend/malaphor_core/process.py
 # Make sure backend/malaphor_core/__init__.py exists
-from malaphor_mvp.process import run_full_pipeline
+from malaphor_mvp.process import run_full_pipeline, MODEL_MODES, PIPELINE_STAGES
+from malaphor_mvp.model.cpu_perf import configure_cpu_threads
+from malaphor_mvp.utils.json_stream import extend_object, iter_file, iter_json, negotiate_encoding, compress_chunks
+from malaphor_mvp.utils.instrumentation import Instrumentation, MetricsRegistry, summarize_reports
+from malaphor_mvp.utils.result_cache import ResultCache, result_cache_key, save_upload
+from malaphor_mvp.data_processing.graph_cache import file_sha256
+from malaphor_mvp.utils.payload import PAYLOAD_FORMATS
+from malaphor_mvp.jobs.store import JobStore, current_owner
+from malaphor_mvp.jobs.job_queue import JobQueue
+from malaphor_mvp.anomaly_detection.online import BatcherClosed, MicroBatcher, OnlineScorer, events_from_records
 
 
 
@@ -31,8 +41,100 @@ CORS(app) # Enable CORS for development
 # Define the directory to save temporary uploaded files
 UPLOAD_FOLDER = tempfile.gettempdir()
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+# Each upload is written here under a unique name (never the client's file name) and deleted after use
+app.config['UPLOAD_TEMP_DIR'] = os.path.join(UPLOAD_FOLDER, 'malaphor_uploads')
+# Pipeline settings; they are part of the result cache key
+app.config['PIPELINE_PARAMS'] = {'epochs': 150, 'contamination': 0.2, 'max_path_length': 4}
+# Results are cached by upload content + parameters, so re-uploading the same export returns instantly
+app.config['RESULT_CACHE_DIR'] = os.path.join(UPLOAD_FOLDER, 'malaphor_result_cache')
+app.config['RESULT_CACHE_MAX_BYTES'] = int(os.environ.get('MALAPHOR_RESULT_CACHE_MB', 1024)) * 1024 * 1024
+# Uploads are read in chunks of this many rows so large exports don't have to fit in memory at once
+app.config['INGEST_CHUNKSIZE'] = 100_000
+# Built graphs are cached here by content hash, so re-uploading the same export skips parsing
+app.config['GRAPH_CACHE_DIR'] = os.path.join(UPLOAD_FOLDER, 'malaphor_graph_cache')
+# Trained GraphSAGE model, written only by uploads with save_model=1; uploads with
+# model_mode=inference/finetune reuse it instead of retraining
+app.config['MODEL_PATH'] = os.path.join(UPLOAD_FOLDER, 'malaphor_model', 'graphsage.pt')
+# Processes used for the risky path search, e.g. MALAPHOR_PATH_WORKERS=4
+app.config['PATH_WORKERS'] = int(os.environ.get('MALAPHOR_PATH_WORKERS', 1))
+# Threads scoring node embeddings with the Isolation Forest, e.g. MALAPHOR_ANOMALY_WORKERS=4
+app.config['ANOMALY_WORKERS'] = int(os.environ.get('MALAPHOR_ANOMALY_WORKERS', 1))
+# zlib level for gzip/deflate /upload responses (1 = fastest, 9 = smallest); level 1 is ~2.5x faster than 6 on large graphs
+app.config['RESPONSE_COMPRESSION_LEVEL'] = 1
+# Background jobs (/jobs): at most this many pipelines run at once, e.g. MALAPHOR_JOB_WORKERS=2
+app.config['JOB_WORKERS'] = int(os.environ.get('MALAPHOR_JOB_WORKERS', 1))
+# Job records (SQLite) and job results live here
+app.config['JOBS_DIR'] = os.path.join(UPLOAD_FOLDER, 'malaphor_jobs')
+# Online scoring (/online/score): concurrent requests are merged into batches of at most this many events
+app.config['ONLINE_MAX_BATCH_EVENTS'] = 1024
+# Seconds an /online/score request waits for its scores before giving up
+app.config['ONLINE_SCORE_TIMEOUT'] = 30
 # os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
+# Pin torch's CPU thread pools on CPU-only hosts, e.g. MALAPHOR_TORCH_THREADS=8
+if os.environ.get('MALAPHOR_TORCH_THREADS') or os.environ.get('MALAPHOR_TORCH_INTEROP_THREADS'):
+    print("Torch CPU threads (intra-op, inter-op):", configure_cpu_threads(
+        int(os.environ.get('MALAPHOR_TORCH_THREADS', 0)),
+        int(os.environ.get('MALAPHOR_TORCH_INTEROP_THREADS', 0)),
+    ))
+
+
+job_store = JobStore(os.path.join(app.config['JOBS_DIR'], 'jobs.sqlite3'), os.path.join(app.config['JOBS_DIR'], 'results'))
+result_cache = ResultCache(app.config['RESULT_CACHE_DIR'], app.config['RESULT_CACHE_MAX_BYTES'])
+# Instrumentation reports of recent /upload requests, for /metrics
+upload_metrics = MetricsRegistry()
+
+
+def get_job_queue():
+    """
+    The app's JobQueue, created on first use.
+
+    Not created at import time: spawned worker processes re-import this module,
+    and each would otherwise start a pool of its own.
+    """
+    if 'job_queue' not in app.extensions:
+        app.extensions['job_queue'] = JobQueue(job_store, max_workers=app.config['JOB_WORKERS'], pipeline_kwargs={
+            'chunksize': app.config['INGEST_CHUNKSIZE'],
+            'graph_cache_dir': app.config['GRAPH_CACHE_DIR'],
+            'model_path': app.config['MODEL_PATH'],
+            'path_workers': app.config['PATH_WORKERS'],
+            'anomaly_workers': app.config['ANOMALY_WORKERS'],
+            **app.config['PIPELINE_PARAMS'],
+        }, result_cache=result_cache)
+    return app.extensions['job_queue']
+
+
+def stream_json(results):
+    """Streams `results` as JSON, gzip/deflate-compressed when the client accepts it."""
+    return stream_json_chunks(iter_json(results))
+
+
+def stream_json_chunks(chunks, headers=None):
+    """Streams already-encoded JSON chunks, gzip/deflate-compressed when the client accepts it."""
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+    chunks = compress_chunks(chunks, encoding, app.config['RESPONSE_COMPRESSION_LEVEL'])
+    response = Response(chunks, mimetype='application/json', headers=headers)
+    if encoding is not None:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
+
+def cache_key_for(content_hash, options):
+    """
+    The result cache key of an upload, or None if its results must not be cached.
+
+    Uploads with save_model write MODEL_PATH, so they always run (a cache hit
+    would skip the save), and so do 'finetune' runs. 'inference' results depend
+    on the saved model, so its content is part of the key.
+    """
+    if options['save_model'] or options['model_mode'] == 'finetune':
+        return None
+    params = {**app.config['PIPELINE_PARAMS'], **options}
+    if options['model_mode'] == 'inference':
+        params['model'] = file_sha256(app.config['MODEL_PATH'])
+    return result_cache_key(content_hash, params)
+
 
 @app.route('/')
 def index():
@@ -40,42 +142,260 @@ def index():
     # print("runnnnnnnbyy")
     return send_from_directory(app.static_folder, 'index.html')
 
+def parse_upload():
+    """
+    Validates an upload form (file, model_mode, format, save_model).
+
+    Returns:
+        tuple: (file, pipeline options dict, None), or (None, None, error response) if invalid.
+    """
+    if 'file' not in request.files:
+        return None, None, (jsonify({'error': 'No file part in the request'}), 400)
+
+    file = request.files['file']
+
+    if file.filename == '':
+        return None, None, (jsonify({'error': 'No selected file'}), 400)
+    if not file.filename.endswith('.csv'):
+        return None, None, (jsonify({'error': 'Invalid file type. Please upload a CSV.'}), 400)
+
+    model_mode = request.form.get('model_mode', 'train')
+    if model_mode not in MODEL_MODES:
+        return None, None, (jsonify({'error': f'Invalid model_mode. Use one of: {", ".join(MODEL_MODES)}'}), 400)
+    if model_mode != 'train' and not os.path.exists(app.config['MODEL_PATH']):
+        return None, None, (jsonify({'error': 'No saved model yet. Run an upload with model_mode=train and '
+                                                       'save_model=1 first.'}), 400)
+    # save_model=1 makes a 'train' / 'finetune' upload replace the saved model
+    save_model = request.form.get('save_model', '').lower() in ('1', 'true', 'yes')
+    if save_model and model_mode == 'inference':
+        return None, None, (jsonify({'error': 'save_model needs model_mode=train or finetune'}), 400)
+
+    # 'columnar' sends one array per field (node IDs once, edges as index pairs); much smaller for big graphs
+    payload_format = request.form.get('format', 'records')
+    if payload_format not in PAYLOAD_FORMATS:
+        return None, None, (jsonify({'error': f'Invalid format. Use one of: {", ".join(PAYLOAD_FORMATS)}'}), 400)
+
+    return file, {'model_mode': model_mode, 'payload_format': payload_format, 'save_model': save_model}, None
+
+
 @app.route('/upload', methods=['POST'])
 def upload_file():
     """Handle CSV file upload, process it, and return results."""
     print("Got the file csv")
-    if 'file' not in request.files:
-        return jsonify({'error': 'No file part in the request'}), 400
+    file, options, error = parse_upload()
+    if error is not None:
+        return error
+    # metrics=1 adds the run's timing / memory report to the response as 'metrics'
+    include_metrics = request.form.get('metrics', '').lower() in ('1', 'true', 'yes')
+    metrics = Instrumentation()
 
-    file = request.files['file']
+    # Save the file temporarily, hashing it on the way
+    with metrics.span('receive_upload'):
+        temp_filepath, content_hash = save_upload(file.stream, app.config['UPLOAD_TEMP_DIR'])
+    print(f"Received and saved file to: {temp_filepath}")
 
-    if file.filename == '':
-        return jsonify({'error': 'No selected file'}), 400
+    try:
+        with metrics.span('result_cache_lookup'):
+            cache_key = cache_key_for(content_hash, options)
+            cached_path = result_cache.get_path(cache_key) if cache_key else None
+        metrics.set_counter('result_cache_hit', cached_path is not None)
+        if cached_path is not None:
+            print(f"Returning cached results {cache_key[:12]}")
+            chunks = iter_file(cached_path)
+            report = metrics.report()
+            upload_metrics.record(report)
+            if include_metrics:
+                chunks = extend_object(chunks, {'metrics': report})
+            return stream_json_chunks(chunks, headers={'X-Result-Cache': 'hit'})
+
+        # Run the processing pipeline
+        # Use the temporary file path
+        results = run_full_pipeline(
+            temp_filepath,
+            chunksize=app.config['INGEST_CHUNKSIZE'],
+            graph_cache_dir=app.config['GRAPH_CACHE_DIR'],
+            model_path=app.config['MODEL_PATH'],
+            path_workers=app.config['PATH_WORKERS'],
+            anomaly_workers=app.config['ANOMALY_WORKERS'],
+            content_hash=content_hash,
+            instrumentation=metrics,
+            **app.config['PIPELINE_PARAMS'],
+            **options,
+        )
+        if cache_key:
+            with metrics.span('result_cache_store'):
+                result_cache.put(cache_key, results)
+
+        report = metrics.report()
+        upload_metrics.record(report)
+        return stream_json({**results, 'metrics': report} if include_metrics else results)
+
+    except Exception as e:
+        # Log the error for debugging
+        print(f"An error occurred during pipeline processing: {e}")
+        # Return an error response to the frontend
+        return jsonify({'error': 'Error processing the file', 'details': str(e)}), 500
+
+    finally:
+        # Clean up the temporary file
+        os.remove(temp_filepath)
+
+
+def job_status(job):
+    """The public view of a job record."""
+    return {
+        'job_id': job['id'],
+        'status': job['status'],
+        'filename': job['filename'],
+        'stage': job['stage'],
+        'stage_progress': job['stage_progress'],
+        'stages': list(PIPELINE_STAGES),
+        'error': job['error'],
+        'cancel_requested': job['cancel_requested'],
+        'created_at': job['created_at'],
+        'started_at': job['started_at'],
+        'finished_at': job['finished_at'],
+        'metrics': job['metrics'],
+        'status_url': url_for('get_job', job_id=job['id']),
+        'result_url': url_for('get_job_result', job_id=job['id']),
+    }
+
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """Queue a CSV upload for background processing; poll the returned status_url for progress."""
+    file, options, error = parse_upload()
+    if error is not None:
+        return error
+
+    temp_filepath, content_hash = save_upload(file.stream, app.config['UPLOAD_TEMP_DIR'])
+    cache_key = cache_key_for(content_hash, options)
+    cached_path = result_cache.get_path(cache_key) if cache_key else None
+    if cached_path is not None:
+        # Already computed: the job is born finished
+        os.remove(temp_filepath)
+        job_id = job_store.create(options, file.filename, owner=current_owner())
+        job_store.save_result_file(job_id, cached_path)
+        print(f"Job {job_id} for {file.filename} served from cached results {cache_key[:12]}")
+        return jsonify(job_status(job_store.get(job_id))), 202
+
+    job_id = get_job_queue().submit(temp_filepath, {**options, 'content_hash': content_hash}, filename=file.filename,
+                                    delete_input=True, cache_key=cache_key)
+    print(f"Queued job {job_id} for {file.filename}")
+    return jsonify(job_status(job_store.get(job_id))), 202
+
+
+@app.route('/jobs', methods=['GET'])
+def list_jobs():
+    """List the most recent jobs."""
+    return jsonify({'jobs': [job_status(job) for job in job_store.list_jobs()]})
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Status and per-stage progress of a job."""
+    job = job_store.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify(job_status(job))
+
+
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    """The pipeline results of a finished job (same body /upload returns)."""
+    job = job_store.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    if job['status'] != 'succeeded':
+        return jsonify({'error': f"Job is {job['status']}, no result available", **job_status(job)}), 409
+
+    return stream_json_chunks(iter_file(job['result_path']))
+
+
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    """Cancel a queued or running job (a running job stops at its next progress update)."""
+    job = job_store.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    if not get_job_queue().cancel(job_id):
+        return jsonify({'error': f"Job already {job['status']}", **job_status(job)}), 409
+    return jsonify(job_status(job_store.get(job_id))), 202
+
+@app.route('/online/graph', methods=['POST'])
+def load_online_graph():
+    """Start online scoring: load a baseline CSV as the graph new events are added to, with the saved model."""
+    if 'file' not in request.files or not request.files['file'].filename.endswith('.csv'):
+        return jsonify({'error': 'Upload the baseline events as a CSV file'}), 400
+    if not os.path.exists(app.config['MODEL_PATH']):
+        return jsonify({'error': 'No saved model yet. Run an upload with model_mode=train and save_model=1 first.'}), 400
+
+    temp_filepath, _ = save_upload(request.files['file'].stream, app.config['UPLOAD_TEMP_DIR'])
+    try:
+        scorer = OnlineScorer.from_files(temp_filepath, app.config['MODEL_PATH'])
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    finally:
+        os.remove(temp_filepath)
+
+    previous = app.extensions.get('online_batcher')
+    app.extensions['online_batcher'] = MicroBatcher(scorer, max_batch_events=app.config['ONLINE_MAX_BATCH_EVENTS'])
+    if previous is not None:
+        previous.close()
+    data = scorer.builder.data
+    print(f"Online scoring ready on {data.num_nodes} nodes / {data.num_edges} edges")
+    return jsonify({'nodes': data.num_nodes, 'edges': data.num_edges})
+
+
+@app.route('/online/score', methods=['POST'])
+def score_online():
+    """
+    Add new events to the online graph and score the entities they name, without retraining or refitting.
 
-    if file and file.filename.endswith('.csv'):
-        # Save the file temporarily
-        temp_filepath = os.path.join(app.config['UPLOAD_FOLDER'], file.filename)
-        file.save(temp_filepath)
-        print(f"Received and saved file to: {temp_filepath}")
+    Body: {"events": [{source_id, source_type, target_id, target_type, relationship_type,
+    feature1, feature2}, ...]}. Returns one score per entity (new or changed).
+    """
+    if app.extensions.get('online_batcher') is None:
+        return jsonify({'error': 'No online graph loaded. POST a baseline CSV to /online/graph first.'}), 409
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        return jsonify({'error': 'Invalid events', 'details': 'Body must be a JSON object with an "events" list'}), 400
+    try:
+        events_df = events_from_records(body.get('events'))
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': 'Invalid events', 'details': str(e)}), 400
+    if events_df.empty:
+        return jsonify({'scores': []})
 
+    start = time.perf_counter()
+    try:
         try:
-            # Run the processing pipeline
-            # Use the temporary file path
-            results = run_full_pipeline(temp_filepath)
+            scores = app.extensions['online_batcher'].score(events_df, timeout=app.config['ONLINE_SCORE_TIMEOUT'])
+        except BatcherClosed:
+            # The graph was replaced (and the old batcher closed) while this request was on its way; use the new one
+            scores = app.extensions['online_batcher'].score(events_df, timeout=app.config['ONLINE_SCORE_TIMEOUT'])
+    except TimeoutError:
+        return jsonify({'error': 'Online scoring timed out'}), 503
+    return jsonify({'scores': scores, 'latency_ms': (time.perf_counter() - start) * 1000})
 
-            # Clean up the temporary file (optional, but good practice)
-            # os.remove(temp_filepath)
 
-            return jsonify(results)
+@app.route('/metrics', methods=['GET'])
+def metrics_summary():
+    """Per-stage timing / memory aggregated over recent uploads and jobs, plus cache, queue and online scoring state."""
+    online_batcher = app.extensions.get('online_batcher')
+    return jsonify({
+        'uploads': upload_metrics.summary(),
+        'jobs': summarize_reports(job_store.recent_metrics()),
+        'jobs_by_status': job_store.status_counts(),
+        'result_cache': result_cache.stats(),
+        'online': online_batcher.stats() if online_batcher is not None else None,
+    })
 
-        except Exception as e:
-            # Log the error for debugging
-            print(f"An error occurred during pipeline processing: {e}")
-            # Return an error response to the frontend
-            return jsonify({'error': 'Error processing the file', 'details': str(e)}), 500
 
-    else:
-        return jsonify({'error': 'Invalid file type. Please upload a CSV.'}), 400
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    """Result cache hit / miss counters and size."""
+    return jsonify(result_cache.stats())
 
 # To run the Flask development server
 if __name__ == '__main__':
@@ -1,9 +1,85 @@
+import numpy as np
 import torch
 import pandas as pd
+from joblib import Parallel, delayed
 from sklearn.ensemble import IsolationForest
 from ..training.train import train_graphsage # Assuming train_graphsage returns embeddings
+from ..utils.derived_cache import node_id_array, node_type_codes
 
-def detect_anomalies(data, embeddings, contamination='auto'):
+# The forest is fitted on at most this many embeddings (sampled uniformly); smaller graphs use all of them
+DEFAULT_FIT_SAMPLE_SIZE = 100_000
+# Embeddings are scored in chunks of this many rows, spread across n_jobs threads
+SCORE_CHUNK_SIZE = 65536
+
+
+def fit_detector(embeddings, contamination='auto', fit_sample_size=DEFAULT_FIT_SAMPLE_SIZE, n_estimators=100,
+                 random_state=42):
+    """
+    Fits the Isolation Forest on (a uniform sample of) the node embeddings.
+
+    Each tree only ever sees max_samples (256) points, but fitting still scores
+    the whole training set once to place the contamination threshold, so on
+    large graphs that pass, not the trees, dominates. Fitting on a sample of
+    fit_sample_size nodes bounds it; graphs up to that size are fitted on every
+    node, exactly as before.
+
+    Args:
+        embeddings (torch.Tensor or np.ndarray): Node embeddings.
+        contamination ('auto' or float): The proportion of outliers in the data set.
+        fit_sample_size (int, optional): Fit on at most this many nodes (None: all).
+        n_estimators (int): Number of trees.
+        random_state (int): Seed for the sample and the forest.
+
+    Returns:
+        IsolationForest: The fitted detector (reusable on later snapshots, see score_embeddings).
+    """
+    embeddings_np = embeddings.cpu().numpy() if isinstance(embeddings, torch.Tensor) else np.asarray(embeddings)
+    if fit_sample_size is not None and len(embeddings_np) > fit_sample_size:
+        sample = np.random.default_rng(random_state).choice(len(embeddings_np), fit_sample_size, replace=False)
+        embeddings_np = embeddings_np[np.sort(sample)]
+
+    # Note: Isolation Forest is unsupervised, it learns what "normal" looks like
+    # on the data it's fit on. For a real scenario, you might train
+    # IF on embeddings of known good data or a training subset.
+    detector = IsolationForest(n_estimators=n_estimators, contamination=contamination, random_state=random_state)
+    print(f"Fitting Isolation Forest on {len(embeddings_np)} node embeddings...")
+    detector.fit(embeddings_np)
+    return detector
+
+
+def score_embeddings(detector, embeddings, n_jobs=1, chunk_size=SCORE_CHUNK_SIZE):
+    """
+    Anomaly scores and predictions from a single pass over the forest.
+
+    decision_function and predict each walk every tree for every node;
+    predict is just decision_function < 0, so both come from one
+    score_samples pass here. Rows are scored independently, so chunks are
+    scored in parallel threads (tree traversal runs without the GIL) with the
+    same results as one call.
+
+    Args:
+        detector (IsolationForest): A fitted detector.
+        embeddings (torch.Tensor or np.ndarray): Node embeddings.
+        n_jobs (int): Threads scoring chunks concurrently.
+        chunk_size (int): Rows per chunk.
+
+    Returns:
+        tuple: (anomaly_scores, predictions) as numpy arrays. Lower score = more
+               anomalous (same scale as decision_function); prediction -1 marks an anomaly.
+    """
+    embeddings_np = embeddings.cpu().numpy() if isinstance(embeddings, torch.Tensor) else np.asarray(embeddings)
+    chunks = [embeddings_np[start:start + chunk_size] for start in range(0, len(embeddings_np), chunk_size)]
+    if n_jobs > 1 and len(chunks) > 1:
+        scores = Parallel(n_jobs=n_jobs, prefer='threads')(delayed(detector.score_samples)(chunk) for chunk in chunks)
+    else:
+        scores = [detector.score_samples(chunk) for chunk in chunks]
+    anomaly_scores = (np.concatenate(scores) if scores else np.empty(0)) - detector.offset_
+    predictions = np.where(anomaly_scores < 0, -1, 1)
+    return anomaly_scores, predictions
+
+
+def detect_anomalies(data, embeddings, contamination='auto', detector=None, fit_sample_size=DEFAULT_FIT_SAMPLE_SIZE,
+                     n_jobs=1):
     """
     Detects anomalies using Isolation Forest on node embeddings.
 
@@ -11,49 +87,31 @@ def detect_anomalies(data, embeddings, contamination='auto'):
         data (torch_geometric.data.Data): The graph data object (needed for index mapping).
         embeddings (torch.Tensor): The learned node embeddings from the GNN.
         contamination ('auto' or float): The proportion of outliers in the data set.
+        detector (IsolationForest, optional): Previously fitted detector (e.g. from the model
+                                              bundle) to score with instead of fitting a new one.
+        fit_sample_size (int, optional): See fit_detector.
+        n_jobs (int): Threads for scoring (see score_embeddings).
 
     Returns:
         pandas.DataFrame: A DataFrame with node IDs, original types, anomaly scores, and prediction.
     """
-    # Isolation Forest works best on numpy arrays
-    embeddings_np = embeddings.cpu().numpy()
+    if detector is None:
+        detector = fit_detector(embeddings, contamination=contamination, fit_sample_size=fit_sample_size)
 
-    # Initialize and train Isolation Forest
-    # Note: Isolation Forest is unsupervised, it learns what "normal" looks like
-    # on the entire dataset it's fit on. For a real scenario, you might train
-    # IF on embeddings of known good data or a training subset. For MVP, we fit on all.
-    iso_forest = IsolationForest(contamination=contamination, random_state=42)
-    print("Fitting Isolation Forest on node embeddings...")
-    iso_forest.fit(embeddings_np)
-
-    # Predict anomaly scores (-higher means less anomalous, +lower means more anomalous)
+    # Anomaly scores (higher means less anomalous, lower means more anomalous)
     # and prediction (-1 for outlier, 1 for inlier)
-    anomaly_scores = iso_forest.decision_function(embeddings_np)
-    predictions = iso_forest.predict(embeddings_np)
+    anomaly_scores, predictions = score_embeddings(detector, embeddings, n_jobs=n_jobs)
 
-    # Map results back to original node IDs and types
+    # Map results back to original node IDs and types, whole columns at once
+    # The type for a node index `i` corresponds to data.x[i, 0] after mapping.
     results_df = pd.DataFrame({
-        'node_index': range(len(data.idx_to_id)),
-        'node_id': [data.idx_to_id[i] for i in range(len(data.idx_to_id))],
+        'node_index': range(data.num_nodes),
+        'node_id': node_id_array(data),
         'anomaly_score': anomaly_scores,
-        'prediction': predictions # -1 is anomaly
+        'prediction': predictions, # -1 is anomaly
+        'node_type': np.asarray(data.unique_types, dtype=object)[node_type_codes(data)],
     })
 
-    # Add original node type for context
-    type_map_df = pd.DataFrame({
-        'node_id': list(data.id_to_idx.keys()),
-        'node_type': [data.unique_types[int(data.x[i, 0].item())] for i in range(len(data.idx_to_id))]
-        # Note: This line assumes node types are stored correctly in the graph data object
-        # Let's refine this based on how we stored type info in build_graph
-    })
-    # Correct way to get types: Get original types from the all_entities df or store it better
-    # For now, let's load the entities list or use the mapping created in build_graph
-    # Assuming build_graph added unique_types and type_to_int to data object
-    # The type for a node index `i` corresponds to data.x[i, 0] after mapping.
-    original_types = [data.unique_types[int(data.x[i, 0].item())] for i in range(len(data.idx_to_id))]
-    results_df['node_type'] = original_types
-
-
     # Sort by anomaly score (lower score means more anomalous)
     results_df = results_df.sort_values(by='anomaly_score').reset_index(drop=True)
 
@@ -0,0 +1,460 @@
+# anomaly_detection/online.py
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+import pandas as pd
+import torch
+
+try:
+    from sklearn.ensemble._iforest import _average_path_length # Private helper, only used by _FlatForest
+except ImportError:
+    _average_path_length = None
+
+from .detect_anomalies import score_embeddings
+from ..data_processing.build_graph import STREAMING_COLUMNS, UNKNOWN_RELATIONSHIP
+from ..data_processing.incremental import IncrementalGraphBuilder
+from ..model.registry import load_model_bundle
+from ..training.neighbor_sampler import NeighborSampler
+from ..training.train import DEFAULT_FANOUT
+from ..utils.csr_graph import CSRGraph
+
+# Batches of at most this many nodes are scored with _FlatForest, larger ones with score_samples
+FLAT_FOREST_MAX_ROWS = 256
+# Edges appended since the last CSR snapshot are folded into a new one once there
+# are more than this many, or more than COMPACT_FRACTION of the snapshot's edges
+COMPACT_MIN_EDGES = 10_000
+COMPACT_FRACTION = 0.1
+
+
+def events_from_records(records):
+    """
+    Turns JSON event records into the event frame IncrementalGraphBuilder.append_events takes.
+
+    Args:
+        records (list[dict]): Events with the CSV columns (source_id, source_type, target_id,
+                              target_type, relationship_type, feature1, feature2).
+
+    Returns:
+        pandas.DataFrame: The events, ids as strings like the CSV reader produces them. A missing
+                          relationship_type becomes UNKNOWN_RELATIONSHIP, as in build_graph.
+
+    Raises:
+        ValueError: If the records are malformed or an id or type is missing.
+    """
+    if not isinstance(records, list) or not all(isinstance(record, dict) for record in records):
+        raise ValueError("Events must be a list of objects")
+    missing = sorted({column for record in records for column in STREAMING_COLUMNS if column not in record})
+    if missing:
+        raise ValueError(f"Events are missing fields: {missing}")
+    events_df = pd.DataFrame.from_records(records, columns=STREAMING_COLUMNS)
+    entity_columns = ['source_id', 'source_type', 'target_id', 'target_type']
+    null_columns = [column for column in entity_columns if events_df[column].isna().any()]
+    if null_columns:
+        raise ValueError(f"Events have null values in: {null_columns}")
+    events_df['relationship_type'] = events_df['relationship_type'].fillna(UNKNOWN_RELATIONSHIP)
+    for column in entity_columns + ['relationship_type']:
+        events_df[column] = events_df[column].astype(str)
+    for column in ('feature1', 'feature2'):
+        events_df[column] = pd.to_numeric(events_df[column], errors='raise')
+    return events_df
+
+
+class _FlatForest:
+    """
+    A fitted IsolationForest packed into flat node arrays, for scoring a few rows quickly.
+
+    score_samples walks the trees one sklearn call each, a fixed cost of a few
+    ms per call however few rows there are. Here every tree is stepped at once,
+    one NumPy gather per level, from the same fitted split arrays and per-leaf
+    path lengths, so the scores are identical to detector.score_samples. Per
+    row it is slower than sklearn's Cython traversal, so it only pays off for
+    small batches (see FLAT_FOREST_MAX_ROWS).
+    """
+
+    def __init__(self, detector):
+        trees = [estimator.tree_ for estimator in detector.estimators_]
+        offsets = np.cumsum([0] + [tree.node_count for tree in trees])
+        self.roots = offsets[:-1]
+        self.max_depth = max(tree.max_depth for tree in trees)
+        # Leaves point back at themselves, so extra steps keep a row where it is
+        self.left = np.concatenate([
+            np.where(tree.children_left < 0, np.arange(tree.node_count), tree.children_left) + offset
+            for tree, offset in zip(trees, offsets)
+        ])
+        self.right = np.concatenate([
+            np.where(tree.children_right < 0, np.arange(tree.node_count), tree.children_right) + offset
+            for tree, offset in zip(trees, offsets)
+        ])
+        subsample_features = detector._max_features != detector.n_features_in_
+        self.feature = np.concatenate([
+            (np.asarray(features)[np.maximum(tree.feature, 0)] if subsample_features else np.maximum(tree.feature, 0))
+            for tree, features in zip(trees, detector.estimators_features_)
+        ])
+        self.threshold = np.concatenate([tree.threshold for tree in trees])
+        # Same per-leaf depth term as IsolationForest._compute_score_samples
+        self.leaf_depth = np.concatenate([
+            path_lengths + average_path_lengths - 1.0
+            for path_lengths, average_path_lengths
+            in zip(detector._decision_path_lengths, detector._average_path_length_per_tree)
+        ])
+        self.denominator = len(trees) * float(_average_path_length([detector._max_samples])[0])
+
+    @classmethod
+    def from_detector(cls, detector, probe_rows=16):
+        """
+        Packs the detector, or returns None if this scikit-learn version lays forests out differently.
+
+        The packing reads private IsolationForest attributes, so the packed forest
+        is checked against detector.score_samples on a few random rows before it
+        is used; any error or mismatch falls back to score_samples.
+        """
+        if _average_path_length is None:
+            return None
+        try:
+            flat_forest = cls(detector)
+            probe = np.random.default_rng(0).normal(size=(probe_rows, detector.n_features_in_))
+            if np.allclose(flat_forest.score_samples(probe), detector.score_samples(probe), rtol=0, atol=1e-12):
+                return flat_forest
+        except (AttributeError, IndexError, TypeError, ValueError):
+            pass
+        return None
+
+    def score_samples(self, embeddings):
+        """Same values as IsolationForest.score_samples."""
+        X = np.asarray(embeddings, dtype=np.float32) # sklearn's tree dtype
+        rows = np.arange(len(X))
+        nodes = np.repeat(self.roots[:, None], len(X), axis=1)
+        for _ in range(self.max_depth):
+            nodes = np.where(X[rows, self.feature[nodes]] <= self.threshold[nodes], self.left[nodes], self.right[nodes])
+        # Summed tree by tree, in the same order as sklearn accumulates them
+        depths = self.leaf_depth[nodes].sum(axis=0)
+        return -(2 ** (-depths / self.denominator)) if self.denominator else -np.ones(len(X))
+
+
+class _GrowingNeighborSampler(NeighborSampler):
+    """
+    NeighborSampler over a graph that keeps growing.
+
+    Neighborhoods are sampled from a CSR snapshot of the in-adjacency plus the
+    edges appended since the snapshot was taken. Those recent edges are always
+    kept (at most fanout of them per node), so a new entity's first events count
+    in its embedding. compact() folds them into a new snapshot.
+    """
+
+    def __init__(self, data, fanout, seed=None):
+        super().__init__(CSRGraph.from_edge_index(data.edge_index, data.num_nodes, transpose=True), fanout, seed)
+        self._recent = {} # Target node -> sources of the edges appended since the snapshot
+        self._has_recent = np.zeros(data.num_nodes, dtype=bool)
+        self.num_recent_edges = 0
+
+    def compact(self, data):
+        """Takes a new CSR snapshot of `data` (O(edges)) and drops the recent-edge lists."""
+        self.adjacency = CSRGraph.from_edge_index(data.edge_index, data.num_nodes, transpose=True)
+        self._recent = {}
+        self._has_recent[:] = False
+        self.num_recent_edges = 0
+
+    def add_edges(self, sources, targets, num_nodes):
+        """Registers edges appended to the graph (global source / target indices)."""
+        if num_nodes > len(self._local):
+            # _local is all -1 between batches, so it can simply be reallocated
+            capacity = max(num_nodes, 2 * len(self._local))
+            self._local = np.full(capacity, -1, dtype=np.int64)
+            has_recent = np.zeros(capacity, dtype=bool)
+            has_recent[:len(self._has_recent)] = self._has_recent
+            self._has_recent = has_recent
+        for source, target in zip(sources.tolist(), targets.tolist()):
+            self._recent.setdefault(target, []).append(source)
+        self._has_recent[targets] = True
+        self.num_recent_edges += len(sources)
+
+    def _sample_hop(self, frontier, fanout):
+        """Returns (neighbor, frontier position) pairs for one hop, from the snapshot and the recent edges."""
+        in_snapshot = frontier < self.adjacency.num_nodes
+        if in_snapshot.all():
+            neighbors, owners = super()._sample_hop(frontier, fanout)
+        else:
+            snapshot_positions = np.flatnonzero(in_snapshot)
+            neighbors, owners = super()._sample_hop(frontier[snapshot_positions], fanout)
+            owners = snapshot_positions[owners]
+
+        recent_positions = np.flatnonzero(self._has_recent[frontier])
+        if len(recent_positions) == 0:
+            return neighbors, owners
+        recent_neighbors, recent_owners = [neighbors], [owners]
+        for position in recent_positions.tolist():
+            sources = self._recent[int(frontier[position])]
+            if 0 <= fanout < len(sources):
+                sources = self.rng.choice(sources, fanout, replace=False)
+            recent_neighbors.append(np.asarray(sources, dtype=np.int64))
+            recent_owners.append(np.full(len(sources), position, dtype=np.int64))
+        return np.concatenate(recent_neighbors), np.concatenate(recent_owners)
+
+
+class OnlineScorer:
+    """
+    Scores new and changed entities as events arrive, with a saved model and detector.
+
+    Events are appended to an IncrementalGraphBuilder; every node they touch is
+    embedded inductively by running the saved GraphSAGE over its sampled
+    num_layers-hop in-neighborhood only, and scored with the Isolation Forest
+    stored in the bundle. Nothing is retrained or refitted, so scores are on the
+    same scale as the batch run that saved the bundle. Nodes whose neighborhood
+    changed but that no event touched keep their previous score until they are
+    scored again.
+
+    Not thread-safe; MicroBatcher serializes concurrent callers onto one scorer.
+
+    Args:
+        builder (IncrementalGraphBuilder): The graph so far (e.g. the snapshot the model was trained on).
+        bundle (dict): A model bundle from load_model_bundle, saved with a detector.
+        fanout (list[int], optional): Neighbors sampled per node and hop (default: DEFAULT_FANOUT
+                                      per layer; -1 keeps all, which gives full-graph embeddings).
+        seed (int, optional): Seed for neighbor sampling.
+    """
+
+    def __init__(self, builder, bundle, fanout=None, seed=0):
+        if bundle.get('detector') is None:
+            raise ValueError("The model bundle has no detector; save it from a 'train' or 'finetune' pipeline run")
+        self.builder = builder
+        self.model = bundle['model']
+        self.detector = bundle['detector']
+        self._flat_forest = _FlatForest.from_detector(self.detector)
+        self.type_vocabulary = list(bundle['type_vocabulary'])
+        self._type_to_int = {node_type: i for i, node_type in enumerate(self.type_vocabulary)}
+        # Builder type code -> model type code, extended as the builder meets new types
+        self._type_remap = np.zeros(0, dtype=np.int64)
+        self.sampler = _GrowingNeighborSampler(builder.data, fanout or [DEFAULT_FANOUT] * self.model.num_layers, seed)
+
+    @classmethod
+    def from_files(cls, csv_filepath, model_path, **kwargs):
+        """Starts a scorer from a CSV export and a model bundle saved by the pipeline."""
+        return cls(IncrementalGraphBuilder.from_csv(csv_filepath), load_model_bundle(model_path), **kwargs)
+
+    def _model_type_codes(self, type_codes):
+        """Maps builder type codes to the codes the model was trained with (see align_type_codes)."""
+        unique_types = self.builder.unique_types
+        if len(self._type_remap) < len(unique_types):
+            unseen_types = []
+            remap = [self._type_to_int.get(node_type) for node_type in unique_types]
+            for i, node_type in enumerate(unique_types):
+                if remap[i] is None:
+                    remap[i] = self._type_to_int[node_type] = len(self.type_vocabulary)
+                    self.type_vocabulary.append(node_type)
+                    unseen_types.append(node_type)
+            if unseen_types:
+                print(f"Warning: node types not seen during training: {unseen_types}")
+            self._type_remap = np.asarray(remap, dtype=np.int64)
+        return self._type_remap[type_codes]
+
+    def append_events(self, events_df):
+        """
+        Adds events to the graph without scoring anything.
+
+        Returns:
+            np.ndarray: Sorted indices of the nodes the events touched.
+        """
+        data = self.builder.data
+        num_old_edges = data.num_edges
+        touched = self.builder.append_events(events_df)
+        data = self.builder.data
+        new_edges = data.edge_index[:, num_old_edges:].numpy()
+        self.sampler.add_edges(new_edges[0], new_edges[1], data.num_nodes)
+        if self.sampler.num_recent_edges > max(COMPACT_MIN_EDGES, COMPACT_FRACTION * self.sampler.adjacency.num_edges):
+            self.sampler.compact(data)
+        return touched
+
+    @torch.no_grad()
+    def embed(self, nodes):
+        """
+        Embeds nodes from their sampled neighborhoods with the saved model.
+
+        Args:
+            nodes (np.ndarray): Distinct node indices.
+
+        Returns:
+            torch.Tensor: [len(nodes), out_channels] embeddings.
+        """
+        n_id, edge_index, batch_size = self.sampler.sample(nodes)
+        x = self.builder.data.x[n_id] # Indexing copies, the graph's own x is left alone
+        x[:, 0] = torch.from_numpy(self._model_type_codes(x[:, 0].long().numpy())).to(x.dtype)
+        return self.model(x, edge_index)[:batch_size]
+
+    def score_nodes(self, nodes):
+        """
+        Embeds and scores nodes already in the graph.
+
+        Args:
+            nodes (iterable[int]): Node indices.
+
+        Returns:
+            pandas.DataFrame: One row per distinct node, in index order, with the same columns
+                              as detect_anomalies (node_index, node_id, anomaly_score,
+                              prediction, node_type).
+        """
+        nodes = np.unique(np.asarray(nodes, dtype=np.int64))
+        data = self.builder.data
+        if len(nodes):
+            embeddings = self.embed(nodes).numpy()
+            if self._flat_forest is not None and len(nodes) <= FLAT_FOREST_MAX_ROWS:
+                anomaly_scores = self._flat_forest.score_samples(embeddings) - self.detector.offset_
+                predictions = np.where(anomaly_scores < 0, -1, 1)
+            else:
+                anomaly_scores, predictions = score_embeddings(self.detector, embeddings)
+        else:
+            anomaly_scores, predictions = np.empty(0), np.empty(0, dtype=np.int64)
+        type_codes = data.x[torch.from_numpy(nodes), 0].long().numpy()
+        return pd.DataFrame({
+            'node_index': nodes,
+            'node_id': [data.idx_to_id[i] for i in nodes.tolist()],
+            'anomaly_score': anomaly_scores,
+            'prediction': predictions, # -1 is anomaly
+            'node_type': np.asarray(self.builder.unique_types, dtype=object)[type_codes],
+        })
+
+    def score_events(self, events_df):
+        """Appends events and scores every node they touched (see score_nodes)."""
+        return self.score_nodes(self.append_events(events_df))
+
+    def node_indices(self, events_df):
+        """Indices of the entities named in events (already in the graph), in order of first mention."""
+        id_to_idx = self.builder.data.id_to_idx
+        entity_ids = dict.fromkeys(events_df['source_id'].tolist() + events_df['target_id'].tolist())
+        return np.fromiter((id_to_idx[entity_id] for entity_id in entity_ids), dtype=np.int64, count=len(entity_ids))
+
+
+class BatcherClosed(RuntimeError):
+    """Raised when submitting to a MicroBatcher that has been closed."""
+
+
+class MicroBatcher:
+    """
+    Serializes scoring requests onto one thread and merges the ones that arrive together.
+
+    The worker takes the oldest request plus everything queued behind it (up to
+    max_batch_events event rows, waiting at most max_wait_ms for more), appends
+    all their events in one append and scores all touched nodes in one model and
+    one forest pass. The forest's fixed per-call cost (a few ms for 100 trees)
+    is then paid once per batch instead of once per request. With the default
+    max_wait_ms=0 a request never waits for company: batches only form from
+    requests that queued up while the previous batch was being scored, so an
+    idle scorer answers a single request right away and a busy one batches.
+
+    Args:
+        scorer (OnlineScorer): The scorer; only the batcher's thread touches it afterwards.
+        max_batch_events (int): Event rows merged into one batch at most.
+        max_wait_ms (float): How long a batch waits for more requests before it is scored.
+    """
+
+    def __init__(self, scorer, max_batch_events=1024, max_wait_ms=0.0):
+        self.scorer = scorer
+        self.max_batch_events = max_batch_events
+        self.max_wait_ms = max_wait_ms
+        self._requests = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._stats = {'requests': 0, 'batches': 0, 'events': 0, 'nodes_scored': 0, 'batch_seconds': 0.0,
+                       'max_batch_requests': 0}
+        self._thread = threading.Thread(target=self._run, name='online-scorer', daemon=True)
+        self._thread.start()
+
+    def submit(self, events_df):
+        """
+        Queues events for scoring.
+
+        Returns:
+            concurrent.futures.Future: Resolves to one score_nodes record (dict) per entity named in
+                                       the events, in order of first mention.
+
+        Raises:
+            BatcherClosed: If the batcher has been closed.
+        """
+        future = Future()
+        # Under the lock, so a request is either queued ahead of close()'s stop marker or refused
+        with self._lock:
+            if self._closed:
+                raise BatcherClosed("MicroBatcher is closed")
+            self._requests.put((events_df, future))
+        return future
+
+    def score(self, events_df, timeout=None):
+        """
+        Submits events and waits for their scores.
+
+        Raises:
+            BatcherClosed: If the batcher has been closed.
+            TimeoutError: If the scores are not ready within `timeout` seconds.
+        """
+        return self.submit(events_df).result(timeout)
+
+    def _next_batch(self):
+        """Blocks for one request, then collects what else is (or, with max_wait_ms, soon will be) queued."""
+        first = self._requests.get()
+        if first is None:
+            return None
+        batch, num_events = [first], len(first[0])
+        deadline = time.perf_counter() + self.max_wait_ms / 1000
+        while num_events < self.max_batch_events:
+            try:
+                timeout = deadline - time.perf_counter()
+                item = self._requests.get(timeout=timeout) if timeout > 0 else self._requests.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._requests.put(None) # Finish this batch, then stop
+                break
+            batch.append(item)
+            num_events += len(item[0])
+        return batch
+
+    def _run(self):
+        while (batch := self._next_batch()) is not None:
+            batch = [(events_df, future) for events_df, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            start = time.perf_counter()
+            try:
+                events_df = pd.concat([events for events, _ in batch], ignore_index=True) if len(batch) > 1 else batch[0][0]
+                results = self.scorer.score_events(events_df)
+                # score_nodes returns nodes in index order, so each request's rows are found by bisection
+                records = results.to_dict('records')
+                node_index = results['node_index'].to_numpy()
+                for events, future in batch:
+                    positions = np.searchsorted(node_index, self.scorer.node_indices(events))
+                    future.set_result([records[position] for position in positions.tolist()])
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                stats = self._stats
+                stats['requests'] += len(batch)
+                stats['batches'] += 1
+                stats['events'] += len(events_df)
+                stats['nodes_scored'] += len(results)
+                stats['batch_seconds'] += elapsed
+                stats['max_batch_requests'] = max(stats['max_batch_requests'], len(batch))
+
+    def stats(self):
+        """Request / batch counters and the mean batch size and latency."""
+        with self._lock:
+            stats = dict(self._stats)
+        batches = stats['batches']
+        stats['mean_batch_requests'] = stats['requests'] / batches if batches else None
+        stats['mean_batch_ms'] = stats['batch_seconds'] * 1000 / batches if batches else None
+        stats['queued'] = self._requests.qsize()
+        return stats
+
+    def close(self):
+        """Scores what is already queued, then stops the worker thread; later submits raise BatcherClosed."""
+        with self._lock:
+            if not self._closed:
+                self._closed = True
+                self._requests.put(None)
+        self._thread.join()
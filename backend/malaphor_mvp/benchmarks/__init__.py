@@ -0,0 +1 @@
+# Package initialization file 
\ No newline at end of file
@@ -0,0 +1,72 @@
+# benchmarks/bench_build_graph.py
+#
+# Compares the vectorized build_graph against the original per-node scan.
+# Run from the backend directory:
+#   python -m malaphor_mvp.benchmarks.bench_build_graph
+
+import argparse
+import tempfile
+import time
+
+import pandas as pd
+import torch
+
+from ..data_processing.build_graph import build_graph
+from .synthetic import write_events_csv
+
+
+def legacy_node_features(df, all_entities_df, idx_to_id):
+    """The original O(nodes x edges) aggregation loop, kept as the reference implementation."""
+    aggregated_features = {}
+    for idx in range(len(all_entities_df)):
+        entity_id = idx_to_id[idx]
+        incoming_edges = df[df['target_id'] == entity_id]
+        outgoing_edges = df[df['source_id'] == entity_id]
+
+        sum_feature1 = incoming_edges['feature1'].sum() + outgoing_edges['feature1'].sum()
+        avg_feature2 = 0
+        total_feature2_count = 0
+        if not incoming_edges.empty:
+            avg_feature2 += incoming_edges['feature2'].sum()
+            total_feature2_count += len(incoming_edges)
+        if not outgoing_edges.empty:
+            avg_feature2 += outgoing_edges['feature2'].sum()
+            total_feature2_count += len(outgoing_edges)
+        if total_feature2_count > 0:
+             avg_feature2 /= total_feature2_count
+
+        aggregated_features[idx] = [all_entities_df.loc[all_entities_df['id'] == entity_id, 'type_int'].iloc[0], sum_feature1, avg_feature2]
+
+    node_features_list = [aggregated_features[i] for i in range(len(all_entities_df))]
+    return torch.tensor(node_features_list, dtype=torch.float)
+
+
+def run(sizes, legacy_max_edges):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for num_edges in sizes:
+            filepath = write_events_csv(num_edges, tmp_dir)
+
+            start = time.perf_counter()
+            data, all_entities_df, edges_df = build_graph(filepath)
+            vectorized_s = time.perf_counter() - start
+            line = f"{num_edges:>9} edges, {data.num_nodes:>8} nodes | vectorized: {vectorized_s:8.3f}s"
+
+            if num_edges <= legacy_max_edges:
+                start = time.perf_counter()
+                df = pd.read_csv(filepath)
+                legacy_x = legacy_node_features(df, all_entities_df, data.idx_to_id)
+                legacy_s = time.perf_counter() - start
+                same = torch.equal(legacy_x, data.x)
+                line += f" | legacy: {legacy_s:8.3f}s | speedup: {legacy_s / vectorized_s:7.1f}x | same x: {same}"
+            else:
+                line += " | legacy: skipped"
+            print(line)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark vectorized vs. per-node feature aggregation in build_graph.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--legacy-max-edges', type=int, default=100_000,
+                        help="Skip the legacy loop above this many edges (it is O(nodes x edges)).")
+    args = parser.parse_args()
+    run(args.sizes, args.legacy_max_edges)
@@ -0,0 +1,63 @@
+# benchmarks/bench_cpu.py
+#
+# Full-batch GraphSAGE epochs/second across CPU thread counts, comparing plain
+# edge_index message passing with the precomputed sparse adjacency and torch.compile.
+# Each configuration runs in a fresh process (torch thread pools can only be sized once).
+# Run from the backend directory:
+#   python -m malaphor_mvp.benchmarks.bench_cpu
+
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+from ..data_processing.build_graph import build_graph
+from ..model.cpu_perf import configure_cpu_threads
+from ..training.train import train_graphsage
+from .synthetic import write_events_csv
+
+MODES = {
+    'edge_index': {},
+    'sparse': {'use_sparse_adjacency': True},
+    'sparse+compile': {'use_sparse_adjacency': True, 'compile_forward': True},
+}
+
+
+def _run_mode(filepath, threads, mode, epochs, results):
+    configure_cpu_threads(threads, 1)
+    data, _, _ = build_graph(filepath, chunksize=200_000)
+    options = MODES[mode]
+    # One warm-up epoch absorbs compilation and allocator warm-up
+    train_graphsage(data, epochs=1, **options)
+    start = time.perf_counter()
+    train_graphsage(data, epochs=epochs, **options)
+    results.put(epochs / (time.perf_counter() - start))
+
+
+def run(num_edges, thread_counts, modes, epochs):
+    context = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        filepath = write_events_csv(num_edges, tmp_dir)
+        print(f"{num_edges} edges, {epochs} epochs per measurement")
+        for threads in thread_counts:
+            line = f"threads {threads:>3}"
+            for mode in modes:
+                results = context.Queue()
+                process = context.Process(target=_run_mode, args=(filepath, threads, mode, epochs, results))
+                process.start()
+                epochs_per_second = results.get()
+                process.join()
+                line += f" | {mode}: {epochs_per_second:7.2f} epochs/s"
+            print(line)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark CPU training throughput across thread counts.")
+    parser.add_argument('--edges', type=int, default=1_000_000)
+    parser.add_argument('--threads', type=int, nargs='+',
+                        default=sorted({1, 2, 4, 8, os.cpu_count() or 1}))
+    parser.add_argument('--modes', nargs='+', choices=list(MODES), default=['edge_index', 'sparse'])
+    parser.add_argument('--epochs', type=int, default=10)
+    args = parser.parse_args()
+    run(args.edges, args.threads, args.modes, args.epochs)
@@ -0,0 +1,43 @@
+# benchmarks/bench_incremental.py
+#
+# Shows that appending a fixed-size batch costs the same whatever the history size.
+# Run from the backend directory:
+#   python -m malaphor_mvp.benchmarks.bench_incremental
+
+import argparse
+import tempfile
+import time
+
+from ..data_processing.incremental import IncrementalGraphBuilder
+from .synthetic import random_events
+
+
+def run(history_sizes, batch_size, repeats):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for num_edges in history_sizes:
+            events = random_events(num_edges + batch_size * repeats, seed=num_edges)
+            filepath = f"{tmp_dir}/history_{num_edges}.csv"
+            events.iloc[:num_edges].to_csv(filepath, index=False)
+
+            builder = IncrementalGraphBuilder.from_csv(filepath)
+            timings = []
+            for i in range(repeats):
+                start_row = num_edges + i * batch_size
+                batch = events.iloc[start_row:start_row + batch_size]
+                start = time.perf_counter()
+                builder.append_events(batch)
+                timings.append(time.perf_counter() - start)
+
+            timings.sort()
+            print(f"history {num_edges:>9} edges | batch {batch_size:>6} | "
+                  f"median append: {timings[len(timings) // 2] * 1e3:8.2f} ms | "
+                  f"graph now {builder.data.num_nodes} nodes / {builder.data.num_edges} edges")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark incremental appends against history size.")
+    parser.add_argument('--history-sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--batch-size', type=int, default=1_000)
+    parser.add_argument('--repeats', type=int, default=20)
+    args = parser.parse_args()
+    run(args.history_sizes, args.batch_size, args.repeats)
@@ -0,0 +1,74 @@
+# benchmarks/bench_jobs.py
+#
+# Throughput of the background job queue under a burst of concurrent uploads:
+# N pipeline runs back to back in one process (what N synchronous /upload
+# requests amount to) vs. N jobs submitted at once to a JobQueue with 1..W workers.
+# Run from the backend directory:
+#   python -m malaphor_mvp.benchmarks.bench_jobs
+
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+from ..jobs.job_queue import JobQueue
+from ..jobs.store import FINISHED_STATUSES, JobStore
+from ..process import run_full_pipeline
+from .bench_paths import _events_with_targets
+
+
+def _sequential(filepath, num_jobs):
+    start = time.perf_counter()
+    for _ in range(num_jobs):
+        with contextlib.redirect_stdout(io.StringIO()):
+            run_full_pipeline(filepath)
+    return time.perf_counter() - start
+
+
+def _queued(filepath, num_jobs, workers, tmp_dir):
+    store = JobStore(os.path.join(tmp_dir, f'jobs_{workers}.sqlite3'), os.path.join(tmp_dir, f'results_{workers}'))
+    queue = JobQueue(store, max_workers=workers)
+    # Start the worker processes (and their imports) before timing
+    warmup = queue.submit(filepath)
+    while store.get(warmup)['status'] not in FINISHED_STATUSES:
+        time.sleep(0.1)
+
+    start = time.perf_counter()
+    job_ids = [queue.submit(filepath) for _ in range(num_jobs)]
+    submit_seconds = time.perf_counter() - start
+    pending = set(job_ids)
+    while pending:
+        time.sleep(0.05)
+        pending = {job_id for job_id in pending if store.get(job_id)['status'] not in FINISHED_STATUSES}
+    seconds = time.perf_counter() - start
+    queue.shutdown()
+
+    failed = [job_id for job_id in job_ids if store.get(job_id)['status'] != 'succeeded']
+    return seconds, submit_seconds / num_jobs, failed
+
+
+def run(num_edges, num_jobs, worker_counts):
+    print(f"CPUs: {os.cpu_count()}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        filepath = os.path.join(tmp_dir, 'events.csv')
+        _events_with_targets(num_edges, seed=0).to_csv(filepath, index=False)
+
+        seconds = _sequential(filepath, num_jobs)
+        print(f"{num_jobs} jobs on {num_edges} edges | sequential: {seconds:7.2f} s | "
+              f"{60 * num_jobs / seconds:6.1f} jobs/min | each request blocks until its own run ends")
+        for workers in worker_counts:
+            seconds, submit_latency, failed = _queued(filepath, num_jobs, workers, tmp_dir)
+            print(f"{num_jobs} jobs on {num_edges} edges | {workers} worker(s): {seconds:7.2f} s | "
+                  f"{60 * num_jobs / seconds:6.1f} jobs/min | submit: {1000 * submit_latency:6.1f} ms/job | "
+                  f"failed: {len(failed)}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark job queue throughput.")
+    parser.add_argument('--edges', type=int, default=20_000)
+    parser.add_argument('--jobs', type=int, default=8)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    args = parser.parse_args()
+    run(args.edges, args.jobs, args.workers)
@@ -0,0 +1,105 @@
+# benchmarks/bench_online.py
+#
+# Latency of scoring one new event online (OnlineScorer) against rerunning the
+# batch chain (build_graph -> embed_nodes -> detect_anomalies with the saved
+# detector), and throughput when many clients submit through a MicroBatcher.
+# Run from the backend directory:
+#   python -m malaphor_mvp.benchmarks.bench_online
+
+import argparse
+import contextlib
+import io
+import tempfile
+import threading
+import time
+
+import numpy as np
+import torch
+
+from ..anomaly_detection.detect_anomalies import detect_anomalies, fit_detector
+from ..anomaly_detection.online import MicroBatcher, OnlineScorer
+from ..data_processing.build_graph import build_graph
+from ..model.graphsage_model import GraphSAGE
+from ..model.registry import load_model_bundle, save_model_bundle
+from ..training.train import embed_nodes
+from .synthetic import random_events
+
+
+def _percentiles(seconds):
+    p50, p95 = np.percentile(np.asarray(seconds) * 1e3, [50, 95])
+    return f"p50 {p50:6.2f} ms / p95 {p95:6.2f} ms"
+
+
+def _saved_bundle(filepath, model_path):
+    # Latency does not depend on the weights, so an untrained model and its detector will do
+    with contextlib.redirect_stdout(io.StringIO()):
+        data, _, _ = build_graph(filepath)
+        model = GraphSAGE(data.num_node_features, 64, 32)
+        model.reconstruction_decoder = torch.nn.Linear(32, data.num_node_features) # load_model_bundle expects one
+        detector = fit_detector(embed_nodes(model, data), contamination=0.2)
+        save_model_bundle(model_path, model, data.unique_types, detector=detector)
+
+
+def _batch_rerun(filepath, bundle):
+    # What scoring one new event costs today: rebuild, re-embed and rescore everything
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        data, _, _ = build_graph(filepath)
+        detect_anomalies(data, embed_nodes(bundle['model'], data), detector=bundle['detector'])
+    return time.perf_counter() - start
+
+
+def run(sizes, requests, clients, max_batch_events):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for num_edges in sizes:
+            events = random_events(num_edges + requests * (clients + 1), seed=num_edges)
+            filepath = f"{tmp_dir}/history_{num_edges}.csv"
+            model_path = f"{tmp_dir}/model_{num_edges}.pt"
+            events.iloc[:num_edges].to_csv(filepath, index=False)
+            _saved_bundle(filepath, model_path)
+            rerun_seconds = _batch_rerun(filepath, load_model_bundle(model_path))
+
+            scorer = OnlineScorer.from_files(filepath, model_path)
+            single, nodes = [], 0
+            for i in range(requests):
+                row = num_edges + i
+                start = time.perf_counter()
+                nodes += len(scorer.score_events(events.iloc[row:row + 1]))
+                single.append(time.perf_counter() - start)
+            print(f"{num_edges:>9} edges | batch rerun: {rerun_seconds * 1e3:9.1f} ms | "
+                  f"online, one event per request: {_percentiles(single)} "
+                  f"({nodes / requests:.1f} nodes per request)")
+
+            # Under load: `clients` threads each send `requests` single-event requests back to back
+            batcher = MicroBatcher(scorer, max_batch_events=max_batch_events)
+            latencies = [[] for _ in range(clients)]
+
+            def client(c):
+                for i in range(requests):
+                    row = num_edges + requests * (c + 1) + i
+                    start = time.perf_counter()
+                    batcher.score(events.iloc[row:row + 1])
+                    latencies[c].append(time.perf_counter() - start)
+
+            threads = [threading.Thread(target=client, args=(c,)) for c in range(clients)]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            seconds = time.perf_counter() - start
+            batcher.close()
+            stats = batcher.stats()
+            print(f"{'':>9}       | micro-batched, {clients} clients: {_percentiles(sum(latencies, []))} | "
+                  f"{clients * requests / seconds:7.0f} requests/s | "
+                  f"mean batch {stats['mean_batch_requests']:.1f} requests")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark online anomaly scoring of new events.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--requests', type=int, default=200, help="Requests per client")
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--max-batch-events', type=int, default=1024)
+    args = parser.parse_args()
+    run(args.sizes, args.requests, args.clients, args.max_batch_events)
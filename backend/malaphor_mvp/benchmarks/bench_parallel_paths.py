@@ -0,0 +1,47 @@
+# benchmarks/bench_parallel_paths.py
+#
+# Measures how the top-K path search scales with worker processes and checks
+# that every worker count returns the serial result.
+# Run from the backend directory:
+#   python -m malaphor_mvp.benchmarks.bench_parallel_paths
+
+import argparse
+import os
+import tempfile
+import time
+
+from ..data_processing.build_graph import build_graph
+from ..path_analysis.analyze_paths import analyze_paths
+from .bench_paths import _events_with_targets, _random_anomaly_results
+
+
+def run(num_edges, worker_counts, top_k, max_path_length):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        filepath = f"{tmp_dir}/events_{num_edges}.csv"
+        _events_with_targets(num_edges, seed=num_edges).to_csv(filepath, index=False)
+        data, _, _ = build_graph(filepath)
+    anomaly_results_df = _random_anomaly_results(data.num_nodes, seed=num_edges)
+
+    results = {}
+    for num_workers in worker_counts:
+        start = time.perf_counter()
+        paths = analyze_paths(data, anomaly_results_df, max_path_length=max_path_length,
+                              top_k=top_k, num_workers=num_workers)
+        results[num_workers] = (time.perf_counter() - start, [(score, indices) for score, _, indices in paths])
+
+    serial_seconds, serial_paths = results[worker_counts[0]]
+    print(f"\n{num_edges} edges, top-{top_k}, max path length {max_path_length}, {os.cpu_count()} CPUs available")
+    for num_workers, (seconds, paths) in results.items():
+        print(f"  {num_workers:>3} workers: {seconds:8.3f} s | speedup: {serial_seconds / seconds:5.2f}x | "
+              f"same result: {paths == serial_paths}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the parallel top-K path search from 1 to N workers.")
+    parser.add_argument('--num-edges', type=int, default=200_000)
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    parser.add_argument('--top-k', type=int, default=10)
+    parser.add_argument('--max-path-length', type=int, default=5)
+    args = parser.parse_args()
+    run(args.num_edges, args.workers, args.top_k, args.max_path_length)
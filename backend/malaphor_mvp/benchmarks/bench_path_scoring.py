@@ -0,0 +1,61 @@
+# benchmarks/bench_path_scoring.py
+#
+# Measures path scoring throughput (paths/sec): one DataFrame filter per path
+# (score_path) against batched gathers over padded path arrays (score_paths).
+# Run from the backend directory:
+#   python -m malaphor_mvp.benchmarks.bench_path_scoring
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from ..path_analysis.path_scoring import node_score_vector, pad_paths, pad_scores, score_path, score_paths
+
+
+def _random_paths(num_paths, num_nodes, max_path_length, rng):
+    # Simple paths of 2..max_path_length distinct nodes; scoring never looks at edges
+    lengths = rng.integers(2, max_path_length + 1, size=num_paths)
+    return [rng.choice(num_nodes, size=length, replace=False).tolist() for length in lengths]
+
+
+def run(num_nodes, num_paths, legacy_paths, max_path_length, batch_size):
+    rng = np.random.default_rng(0)
+    # Same layout as detect_anomalies output: one row per node, sorted by score
+    anomaly_results_df = pd.DataFrame({
+        'node_index': np.arange(num_nodes),
+        'anomaly_score': rng.normal(0.05, 0.05, size=num_nodes),
+    }).sort_values(by='anomaly_score').reset_index(drop=True)
+    paths = _random_paths(num_paths, num_nodes, max_path_length, rng)
+
+    start = time.perf_counter()
+    legacy_scores = [score_path(path, None, anomaly_results_df) for path in paths[:legacy_paths]]
+    legacy_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    padded_scores = pad_scores(node_score_vector(anomaly_results_df, num_nodes))
+    batched_scores = np.concatenate([
+        score_paths(pad_paths(paths[i:i + batch_size], max_path_length), padded_scores)
+        for i in range(0, len(paths), batch_size)
+    ])
+    batched_seconds = time.perf_counter() - start
+
+    max_difference = np.abs(batched_scores[:legacy_paths] - np.asarray(legacy_scores)).max()
+    legacy_rate = legacy_paths / legacy_seconds
+    batched_rate = num_paths / batched_seconds
+    print(f"{num_nodes} nodes | score_path: {legacy_rate:12,.0f} paths/s ({legacy_paths} paths) | "
+          f"score_paths: {batched_rate:12,.0f} paths/s ({num_paths} paths) | "
+          f"speedup: {batched_rate / legacy_rate:8.1f}x | max |difference|: {max_difference:.2e}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark per-path DataFrame scoring against batched array scoring.")
+    parser.add_argument('--num-nodes', type=int, default=100_000)
+    parser.add_argument('--num-paths', type=int, default=1_000_000)
+    parser.add_argument('--legacy-paths', type=int, default=2_000,
+                        help="Paths scored with score_path (it is slow)")
+    parser.add_argument('--max-path-length', type=int, default=4)
+    parser.add_argument('--batch-size', type=int, default=65536)
+    args = parser.parse_args()
+    run(args.num_nodes, args.num_paths, args.legacy_paths, args.max_path_length, args.batch_size)
@@ -0,0 +1,76 @@
+# benchmarks/bench_paths.py
+#
+# Compares exhaustive path enumeration with the best-first top-K search and
+# checks that both return the same top-K paths.
+# Run from the backend directory:
+#   python -m malaphor_mvp.benchmarks.bench_paths
+
+import argparse
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from ..data_processing.build_graph import build_graph
+from ..path_analysis.analyze_paths import analyze_paths
+from .synthetic import random_events
+
+
+def _events_with_targets(num_edges, seed):
+    # random_events has no end-node candidates; turn every tenth VM into an S3 bucket
+    events = random_events(num_edges, seed=seed)
+    for column in ('source_id', 'target_id'):
+        events[column] = events[column].str.replace(r'^vm_(\d*0)$', r's3_\1', regex=True)
+    return events
+
+
+def _random_anomaly_results(num_nodes, seed):
+    # Roughly the range of IsolationForest.decision_function, with some negatives
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'node_index': np.arange(num_nodes),
+        'anomaly_score': rng.normal(0.05, 0.05, size=num_nodes),
+    })
+
+
+def _same_paths(exhaustive, top):
+    return (len(exhaustive) == len(top)
+            and all(a[0] == b[0] and a[2] == b[2] for a, b in zip(exhaustive, top)))
+
+
+def run(sizes, top_k, max_path_length, skip_exhaustive_above):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for num_edges in sizes:
+            filepath = f"{tmp_dir}/events_{num_edges}.csv"
+            _events_with_targets(num_edges, seed=num_edges).to_csv(filepath, index=False)
+            data, _, _ = build_graph(filepath)
+            anomaly_results_df = _random_anomaly_results(data.num_nodes, seed=num_edges)
+
+            start = time.perf_counter()
+            top = analyze_paths(data, anomaly_results_df, max_path_length=max_path_length, top_k=top_k)
+            top_seconds = time.perf_counter() - start
+
+            if num_edges > skip_exhaustive_above:
+                print(f"\n{num_edges:>9} edges | top-{top_k}: {top_seconds:8.3f} s | exhaustive skipped")
+                continue
+
+            start = time.perf_counter()
+            exhaustive = analyze_paths(data, anomaly_results_df, max_path_length=max_path_length)
+            exhaustive_seconds = time.perf_counter() - start
+
+            print(f"\n{num_edges:>9} edges | {len(exhaustive):>9} paths | "
+                  f"exhaustive: {exhaustive_seconds:8.3f} s | top-{top_k}: {top_seconds:8.3f} s | "
+                  f"speedup: {exhaustive_seconds / top_seconds:7.1f}x | "
+                  f"same top-{top_k}: {_same_paths(exhaustive[:top_k], top)}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark top-K path search against exhaustive enumeration.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 3_000, 10_000, 100_000])
+    parser.add_argument('--top-k', type=int, default=10)
+    parser.add_argument('--max-path-length', type=int, default=4)
+    parser.add_argument('--skip-exhaustive-above', type=int, default=10_000,
+                        help="Only run the top-K search on larger graphs")
+    args = parser.parse_args()
+    run(args.sizes, args.top_k, args.max_path_length, args.skip_exhaustive_above)
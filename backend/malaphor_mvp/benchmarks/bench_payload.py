@@ -0,0 +1,103 @@
+# benchmarks/bench_payload.py
+#
+# Compares the original per-node / iterrows payload loop with the column-wise
+# builder in utils.payload, and checks both produce identical JSON.
+# Run from the backend directory:
+#   python -m malaphor_mvp.benchmarks.bench_payload
+
+import argparse
+import json
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from ..data_processing.build_graph import build_graph
+from ..utils.payload import build_payload
+from .bench_paths import _events_with_targets
+
+
+def legacy_payload(pyg_data, anomaly_results_df, edges_df, risky_paths):
+    """The payload loop run_full_pipeline used before utils.payload (reference only)."""
+    nodes_for_frontend = []
+    anomaly_results_df = anomaly_results_df.set_index('node_index')
+    for i in range(pyg_data.num_nodes):
+        original_id = pyg_data.idx_to_id[i]
+        original_type = pyg_data.unique_types[int(pyg_data.x[i, 0].item())]
+        anomaly_info = anomaly_results_df.loc[i].to_dict() if i in anomaly_results_df.index else {'anomaly_score': None, 'prediction': None}
+        nodes_for_frontend.append({
+            'id': original_id,
+            'label': original_id,
+            'type': original_type,
+            'anomaly_score': anomaly_info.get('anomaly_score'),
+            'prediction': anomaly_info.get('prediction'),
+            'features': pyg_data.x[i].tolist(),
+            'node_index': i,
+        })
+
+    edges_for_frontend = []
+    for _, row in edges_df.iterrows():
+        edges_for_frontend.append({
+            'source': row['source_id'],
+            'target': row['target_id'],
+            'relationship_type': row['relationship_type'],
+        })
+
+    risky_paths_for_frontend = []
+    for score, path_ids, path_indices in risky_paths:
+        path_with_types = []
+        for node_id, node_index in zip(path_ids, path_indices):
+            node_type_str = pyg_data.unique_types[int(pyg_data.x[node_index, 0].item())]
+            path_with_types.append(f"{node_id} ({node_type_str})")
+        risky_paths_for_frontend.append({
+            'score': float(score),
+            'path_ids': path_ids,
+            'path_with_types': " -> ".join(path_with_types),
+        })
+
+    return {'nodes': nodes_for_frontend, 'edges': edges_for_frontend, 'risky_paths': risky_paths_for_frontend[:10]}
+
+
+def _anomaly_results(data, seed):
+    # Same columns and order as detect_anomalies
+    rng = np.random.default_rng(seed)
+    scores = rng.normal(0.05, 0.05, size=data.num_nodes)
+    return pd.DataFrame({
+        'node_index': range(data.num_nodes),
+        'node_id': [data.idx_to_id[i] for i in range(data.num_nodes)],
+        'anomaly_score': scores,
+        'prediction': np.where(scores < 0, -1, 1),
+        'node_type': data.unique_types[data.x[:, 0].numpy().astype(np.int64)],
+    }).sort_values(by='anomaly_score').reset_index(drop=True)
+
+
+def run(sizes, chunksize):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for num_edges in sizes:
+            filepath = f"{tmp_dir}/events_{num_edges}.csv"
+            _events_with_targets(num_edges, seed=num_edges).to_csv(filepath, index=False)
+            data, _, edges_df = build_graph(filepath, chunksize=chunksize)
+            anomaly_results_df = _anomaly_results(data, seed=num_edges)
+            risky_paths = [(-0.5, [data.idx_to_id[0], data.idx_to_id[1]], [0, 1])]
+
+            start = time.perf_counter()
+            legacy = legacy_payload(data, anomaly_results_df, edges_df, risky_paths)
+            legacy_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            payload = build_payload(data, anomaly_results_df, edges_df, risky_paths)
+            payload_seconds = time.perf_counter() - start
+
+            print(f"{data.num_nodes:>8} nodes / {num_edges:>8} edges | legacy: {legacy_seconds:8.2f} s | "
+                  f"columnar: {payload_seconds:6.2f} s | speedup: {legacy_seconds / payload_seconds:6.1f}x | "
+                  f"identical JSON: {json.dumps(legacy) == json.dumps(payload)}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the frontend payload builder.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--chunksize', type=int, default=None,
+                        help="Build graphs with the streaming reader (compact categorical edges_df)")
+    args = parser.parse_args()
+    run(args.sizes, args.chunksize)
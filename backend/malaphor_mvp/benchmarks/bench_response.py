@@ -0,0 +1,57 @@
+# benchmarks/bench_response.py
+#
+# Measures /upload response size and encoding time: jsonify-style json.dumps of
+# the records payload vs. the streamed encoder (utils.json_stream), for the
+# records and columnar formats, uncompressed and gzip-compressed.
+# Run from the backend directory:
+#   python -m malaphor_mvp.benchmarks.bench_response
+
+import argparse
+import json
+import tempfile
+import time
+
+from ..data_processing.build_graph import build_graph
+from ..utils import json_stream
+from ..utils.payload import build_payload
+from .bench_paths import _events_with_targets
+from .bench_payload import _anomaly_results
+
+
+def _timed_bytes(encode):
+    start = time.perf_counter()
+    num_bytes = sum(len(chunk) for chunk in encode())
+    return num_bytes, time.perf_counter() - start
+
+
+def run(sizes, level):
+    print(f"orjson available: {json_stream.orjson is not None}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for num_edges in sizes:
+            filepath = f"{tmp_dir}/events_{num_edges}.csv"
+            _events_with_targets(num_edges, seed=num_edges).to_csv(filepath, index=False)
+            data, _, edges_df = build_graph(filepath)
+            anomaly_results_df = _anomaly_results(data, seed=num_edges)
+            risky_paths = [(-0.5, [data.idx_to_id[0], data.idx_to_id[1]], [0, 1])]
+            payloads = {payload_format: build_payload(data, anomaly_results_df, edges_df, risky_paths,
+                                                      payload_format=payload_format)
+                        for payload_format in ('records', 'columnar')}
+
+            print(f"--- {data.num_nodes} nodes / {num_edges} edges ---")
+            # What jsonify did: one indented-free json.dumps string of the whole payload
+            num_bytes, seconds = _timed_bytes(lambda: [json.dumps(payloads['records']).encode()])
+            print(f"  {'records, json.dumps':<28} {num_bytes / 1e6:8.2f} MB  {seconds:6.2f} s")
+            for payload_format, payload in payloads.items():
+                for encoding in (None, 'gzip'):
+                    num_bytes, seconds = _timed_bytes(lambda: json_stream.compress_chunks(
+                        json_stream.iter_json(payload), encoding, level))
+                    label = f"{payload_format}, streamed{', ' + encoding if encoding else ''}"
+                    print(f"  {label:<28} {num_bytes / 1e6:8.2f} MB  {seconds:6.2f} s")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark /upload response encoding and size.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--level', type=int, default=1, help="gzip compression level (app.py default)")
+    args = parser.parse_args()
+    run(args.sizes, args.level)
@@ -0,0 +1,294 @@
+# benchmarks/bench_suite.py
+#
+# End-to-end benchmark suite: every pipeline stage (build_graph, train_graphsage,
+# detect_anomalies, to_networkx, analyze_paths, build_payload and its JSON
+# encoding) on synthetic graphs of several sizes. Writes wall / CPU time, peak
+# memory and throughput per stage to a JSON results file and flags regressions
+# against a stored baseline (exit status 1 if any).
+# Run from the backend directory:
+#   python -m malaphor_mvp.benchmarks.bench_suite
+#   python -m malaphor_mvp.benchmarks.bench_suite --sizes 1000 10000 --update-baseline
+
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import queue
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+import torch
+
+from ..anomaly_detection.detect_anomalies import detect_anomalies
+from ..data_processing.build_graph import build_graph
+from ..data_processing.generate_simulated_data import generate_synthetic_data
+from ..path_analysis.analyze_paths import analyze_paths
+from ..training.train import train_graphsage
+from ..utils.derived_cache import node_id_array
+from ..utils.graph_converter import to_networkx
+from ..utils.instrumentation import Instrumentation
+from ..utils.json_stream import iter_json
+from ..utils.payload import build_payload
+
+# Bump when the results layout changes; files of another version are not compared
+SUITE_VERSION = 1
+
+DEFAULT_BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+# Stage -> (work unit, how many units one run of the stage processes), for throughput
+STAGE_THROUGHPUT = {
+    'build_graph': ('edges', lambda c: c['edges']),
+    'train_graphsage': ('edge_epochs', lambda c: c['edges'] * c['epochs']),
+    'detect_anomalies': ('nodes', lambda c: c['nodes']),
+    'to_networkx': ('edges', lambda c: c['edges']),
+    'analyze_paths': ('edges', lambda c: c['edges']),
+    'build_payload': ('records', lambda c: c['nodes'] + c['edges']),
+    'encode_payload': ('MB', lambda c: c['payload_bytes'] / 1e6),
+}
+
+
+def _run_stages(filepath, epochs, chunksize, results):
+    """Runs every stage once on `filepath` (in a fresh process) and puts the Instrumentation report on `results`."""
+    metrics = Instrumentation()
+    with contextlib.redirect_stdout(io.StringIO()):
+        with metrics.span('build_graph'):
+            data, _, edges_df = build_graph(filepath, chunksize=chunksize)
+        with metrics.span('train_graphsage'):
+            # Fixed epoch count (no early stopping) so runs stay comparable
+            _, embeddings = train_graphsage(data, epochs=epochs, lr=0.005, hidden_channels=64, out_channels=32,
+                                            use_sparse_adjacency=True)
+        with metrics.span('detect_anomalies'):
+            anomaly_results_df = detect_anomalies(data, embeddings, contamination=0.2)
+        with metrics.span('to_networkx'):
+            to_networkx(data, node_id_array(data).tolist(), data.edge_type)
+        with metrics.span('analyze_paths'):
+            risky_paths = analyze_paths(data, anomaly_results_df, max_path_length=4, top_k=10,
+                                        instrumentation=metrics)
+        with metrics.span('build_payload'):
+            payload = build_payload(data, anomaly_results_df, edges_df, risky_paths, max_paths=10)
+        with metrics.span('encode_payload'):
+            metrics.set_counter('payload_bytes', sum(len(chunk) for chunk in iter_json(payload)))
+    metrics.set_counter('nodes', data.num_nodes)
+    metrics.set_counter('edges', data.num_edges)
+    metrics.set_counter('epochs', epochs)
+    results.put(metrics.report())
+
+
+def run_in_process(target, args, poll_seconds=1.0):
+    """
+    Runs target(*args, results) in a new spawned process and returns what it puts on `results`.
+
+    Polls while the process is alive, so a crash or an OOM kill fails the caller
+    instead of blocking it forever.
+
+    Raises:
+        RuntimeError: If the process exits without a result or with a non-zero exit code.
+    """
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    process = context.Process(target=target, args=(*args, results))
+    process.start()
+    while True:
+        try:
+            result = results.get(timeout=poll_seconds)
+            break
+        except queue.Empty:
+            if not process.is_alive():
+                try:
+                    result = results.get(timeout=poll_seconds) # Put just before exiting
+                    break
+                except queue.Empty:
+                    raise RuntimeError(f"{target.__name__} exited with code {process.exitcode} "
+                                       f"without a result") from None
+    process.join()
+    if process.exitcode != 0:
+        raise RuntimeError(f"{target.__name__} exited with code {process.exitcode}")
+    return result
+
+
+def _measure(filepath, epochs, chunksize, repeats):
+    """
+    Runs the stages `repeats` times, each in a new process so peak memory is per run.
+
+    Returns:
+        dict: {'counters', 'peak_rss_mb', 'stages': {name: {'wall_seconds', 'cpu_seconds',
+               'peak_rss_mb', 'peak_rss_growth_mb', 'throughput', 'throughput_unit'}}}.
+               Times are medians over the repeats, memory the maximum. peak_rss_growth_mb is
+               how far the stage raised the process's peak RSS, so a stage that fits within
+               the memory an earlier stage already peaked at shows little or no growth.
+    """
+    reports = [run_in_process(_run_stages, (filepath, epochs, chunksize)) for _ in range(repeats)]
+
+    counters = reports[0]['counters']
+    stages = {}
+    for name in [record['name'] for record in reports[0]['spans']]:
+        records = [record for report in reports for record in report['spans'] if record['name'] == name]
+        wall_seconds = statistics.median(record['wall_seconds'] for record in records)
+        stage = {
+            'wall_seconds': wall_seconds,
+            'cpu_seconds': statistics.median(record['cpu_seconds'] for record in records),
+            'peak_rss_mb': max((record['peak_rss_mb'] or 0.0) for record in records),
+            'peak_rss_growth_mb': max((record['peak_rss_growth_mb'] or 0.0) for record in records),
+        }
+        if name in STAGE_THROUGHPUT:
+            unit, amount = STAGE_THROUGHPUT[name]
+            stage['throughput'] = amount(counters) / wall_seconds if wall_seconds > 0 else None
+            stage['throughput_unit'] = f'{unit}/s'
+        stages[name] = stage
+    return {
+        'counters': counters,
+        'peak_rss_mb': max((report['peak_rss_mb'] or 0.0) for report in reports),
+        'stages': stages,
+    }
+
+
+def _environment():
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'torch': torch.__version__,
+        'numpy': np.__version__,
+        'torch_threads': torch.get_num_threads(),
+    }
+
+
+def compare(results, baseline, time_tolerance=0.25, memory_tolerance=0.25, min_seconds=0.1, min_mb=32.0):
+    """
+    Compares a results file against a baseline, stage by stage and size by size.
+
+    A stage regresses when it is slower than the baseline by more than
+    time_tolerance (relative) and min_seconds (absolute), or raises peak memory
+    by more than memory_tolerance and min_mb. The absolute floors keep timer
+    noise on small graphs from being reported.
+
+    Args:
+        results (dict): A results file written by run().
+        baseline (dict): The stored baseline (same layout).
+
+    Returns:
+        tuple: (rows, regressions), each a list of {'size', 'stage', 'metric', 'baseline',
+               'current', 'ratio'} dicts; rows has every compared metric.
+    """
+    if baseline.get('suite_version') != results.get('suite_version'):
+        raise ValueError(f"Baseline is from suite version {baseline.get('suite_version')}, "
+                         f"results from {results.get('suite_version')}; regenerate the baseline")
+    baseline_runs = {run['size']: run for run in baseline['runs']}
+    rows, regressions = [], []
+    for run in results['runs']:
+        baseline_run = baseline_runs.get(run['size'])
+        if baseline_run is None:
+            continue
+        for stage_name, stage in run['stages'].items():
+            baseline_stage = baseline_run['stages'].get(stage_name)
+            if baseline_stage is None:
+                continue
+            for metric, tolerance, floor in (('wall_seconds', time_tolerance, min_seconds),
+                                             ('peak_rss_growth_mb', memory_tolerance, min_mb)):
+                old, new = baseline_stage[metric], stage[metric]
+                row = {'size': run['size'], 'stage': stage_name, 'metric': metric, 'baseline': old, 'current': new,
+                       'ratio': new / old if old else None}
+                rows.append(row)
+                if new > old * (1 + tolerance) and new - old > floor:
+                    regressions.append(row)
+    return rows, regressions
+
+
+def _print_comparison(rows, regressions):
+    flagged = {(row['size'], row['stage'], row['metric']) for row in regressions}
+    print(f"\n{'size':>9} {'stage':<30} {'metric':<20} {'baseline':>10} {'current':>10} {'ratio':>7}")
+    for row in rows:
+        ratio = '' if row['ratio'] is None else f"{row['ratio']:6.2f}x"
+        mark = '  REGRESSION' if (row['size'], row['stage'], row['metric']) in flagged else ''
+        print(f"{row['size']:>9} {row['stage']:<30} {row['metric']:<20} {row['baseline']:>10.3f} "
+              f"{row['current']:>10.3f} {ratio:>7}{mark}")
+    print(f"\n{len(regressions)} regression(s) against the baseline.")
+
+
+def run(sizes, epochs, repeats, seed, chunksize, data_dir=None):
+    """
+    Runs the suite on synthetic graphs of each size (number of events / edges).
+
+    Returns:
+        dict: The results: {'suite_version', 'created', 'environment', 'config',
+              'runs': [{'size', 'nodes', 'edges', 'peak_rss_mb', 'counters', 'stages'}, ...]}.
+    """
+    results = {
+        'suite_version': SUITE_VERSION,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'environment': _environment(),
+        'config': {'epochs': epochs, 'repeats': repeats, 'seed': seed, 'chunksize': chunksize},
+        'runs': [],
+    }
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        data_dir = data_dir or tmp_dir
+        os.makedirs(data_dir, exist_ok=True)
+        for num_edges in sizes:
+            # Generated outside the measured processes; reused from data_dir when already there
+            filepath = os.path.join(data_dir, f"synthetic_{num_edges}_seed{seed}.csv")
+            if not os.path.exists(filepath):
+                with contextlib.redirect_stdout(io.StringIO()):
+                    generate_synthetic_data(filepath, num_events=num_edges, seed=seed)
+
+            measured = _measure(filepath, epochs, chunksize, repeats)
+            counters = measured['counters']
+            results['runs'].append({
+                'size': num_edges,
+                'nodes': counters['nodes'],
+                'edges': counters['edges'],
+                **measured,
+            })
+
+            print(f"\n{num_edges:>9} edges, {counters['nodes']} nodes | peak RSS {measured['peak_rss_mb']:.0f} MB")
+            for name, stage in measured['stages'].items():
+                throughput = '' if stage.get('throughput') is None else \
+                    f" | {stage['throughput']:14,.0f} {stage['throughput_unit']}"
+                print(f"  {name:<28} {stage['wall_seconds']:9.3f} s | +{stage['peak_rss_growth_mb']:8.1f} MB"
+                      f"{throughput}")
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark every pipeline stage at several graph sizes.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument('--epochs', type=int, default=20, help="GraphSAGE training epochs (no early stopping)")
+    parser.add_argument('--repeats', type=int, default=3, help="Runs per size; times are medians")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--chunksize', type=int, default=100_000, help="build_graph's streaming chunk size")
+    parser.add_argument('--data-dir', default=None, help="Keep (and reuse) the generated CSVs here")
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE_PATH)
+    parser.add_argument('--update-baseline', action='store_true', help="Store these results as the baseline")
+    parser.add_argument('--time-tolerance', type=float, default=0.25)
+    parser.add_argument('--memory-tolerance', type=float, default=0.25)
+    parser.add_argument('--min-seconds', type=float, default=0.1, help="Ignore slowdowns smaller than this")
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.epochs, args.repeats, args.seed, args.chunksize, args.data_dir)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=1)
+    print(f"\nResults written to {args.output}")
+
+    if args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=1)
+        print(f"Baseline updated: {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline['environment'] != results['environment']:
+            print("Note: the baseline was recorded in a different environment; compare with care.")
+        if baseline['config'] != results['config']:
+            print(f"Note: the baseline used different settings {baseline['config']}; compare with care.")
+        rows, regressions = compare(results, baseline, args.time_tolerance, args.memory_tolerance,
+                                   min_seconds=args.min_seconds)
+        _print_comparison(rows, regressions)
+        sys.exit(1 if regressions else 0)
+    else:
+        print(f"No baseline at {args.baseline}; run with --update-baseline to store one.")
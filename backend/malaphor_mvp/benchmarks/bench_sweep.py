@@ -0,0 +1,288 @@
+# benchmarks/bench_sweep.py
+#
+# Accuracy-vs-latency sweep over the pipeline's tuning knobs (training epochs,
+# GraphSAGE hidden / embedding sizes, IsolationForest contamination and the
+# risky path length). Every grid point runs run_full_pipeline on labelled
+# synthetic data (see generate_synthetic_data) in a fresh process and is scored
+# on node detection precision / recall and on how many injected attack paths
+# show up among the reported risky paths, next to its wall time and peak
+# memory. The settings no other setting beats on every objective (the Pareto
+# frontier) are printed and written with the results.
+# Run from the backend directory:
+#   python -m malaphor_mvp.benchmarks.bench_sweep
+#   python -m malaphor_mvp.benchmarks.bench_sweep --events 20000 --epochs 20 50 --contamination 0.01 0.2
+
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import multiprocessing
+import os
+import statistics
+import tempfile
+import time
+
+import numpy as np
+import torch
+from sklearn.metrics import average_precision_score
+
+from ..data_processing.generate_simulated_data import generate_synthetic_data, load_ground_truth
+from ..process import run_full_pipeline
+from ..utils.instrumentation import Instrumentation
+from .bench_suite import run_in_process
+
+# Knob -> values swept by default (process.py's current settings are the last / larger ones)
+DEFAULT_GRID = {
+    'epochs': [20, 50, 150],
+    'hidden_channels': [16, 64],
+    'out_channels': [8, 32],
+    'contamination': [0.01, 0.05, 0.2],
+    'max_path_length': [3, 4],
+}
+
+# Objectives the frontier is computed over by default
+DEFAULT_MAXIMIZE = ('f1', 'path_hit_rate')
+DEFAULT_MINIMIZE = ('wall_seconds', 'peak_rss_growth_mb')
+
+# Differences smaller than this do not count when comparing settings on an objective (measurement noise)
+DEFAULT_TOLERANCES = {'wall_seconds': 0.05, 'peak_rss_mb': 16.0, 'peak_rss_growth_mb': 16.0}
+
+
+def evaluate(payload, ground_truth):
+    """
+    Scores a columnar pipeline payload against the generator's ground truth.
+
+    Args:
+        payload (dict): run_full_pipeline(..., payload_format='columnar') output.
+        ground_truth (dict): As returned by generate_synthetic_data / load_ground_truth.
+
+    Returns:
+        dict: {'precision', 'recall', 'f1' (of the nodes predicted anomalous),
+               'average_precision' (of the anomaly score ranking, independent of contamination),
+               'flagged_nodes', 'path_hit_rate' (share of injected attack paths contained in a
+               reported risky path), 'path_precision' (share of reported risky paths through an
+               anomalous node), 'risky_paths'}.
+    """
+    truth = set(ground_truth['anomalous_nodes'])
+    nodes = payload['nodes']
+    labels = np.array([node_id in truth for node_id in nodes['id']])
+    scores = np.array([np.nan if s is None else s for s in nodes['anomaly_score']], dtype=float)
+    flagged = np.array([p == -1 for p in nodes['prediction']])
+
+    true_positives = int((flagged & labels).sum())
+    precision = true_positives / flagged.sum() if flagged.any() else 0.0
+    recall = true_positives / labels.sum() if labels.any() else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    scored = ~np.isnan(scores)
+    # Lower anomaly_score is more anomalous
+    average_precision = float(average_precision_score(labels[scored], -scores[scored])) \
+        if labels[scored].any() else 0.0
+
+    reported = [path['path_ids'] for path in payload['risky_paths']]
+
+    def contains(path, attack):
+        return any(path[i:i + len(attack)] == attack for i in range(len(path) - len(attack) + 1))
+
+    attack_paths = ground_truth['attack_paths']
+    hits = sum(any(contains(path, attack) for path in reported) for attack in attack_paths)
+    return {
+        'precision': float(precision),
+        'recall': float(recall),
+        'f1': float(f1),
+        'average_precision': average_precision,
+        'flagged_nodes': int(flagged.sum()),
+        'path_hit_rate': hits / len(attack_paths) if attack_paths else 0.0,
+        'path_precision': sum(any(node_id in truth for node_id in path) for path in reported) / len(reported)
+                          if reported else 0.0,
+        'risky_paths': len(reported),
+    }
+
+
+def _run_setting(filepath, ground_truth, setting, seed, early_stopping, results):
+    """Runs the pipeline once with `setting` (in a fresh process) and puts its report and scores on `results`."""
+    torch.manual_seed(seed)
+    metrics = Instrumentation()
+    with contextlib.redirect_stdout(io.StringIO()):
+        payload = run_full_pipeline(filepath, payload_format='columnar', early_stopping=early_stopping,
+                                    instrumentation=metrics, **setting)
+    results.put({'report': metrics.report(), 'quality': evaluate(payload, ground_truth)})
+
+
+def _measure(filepath, ground_truth, setting, seeds, early_stopping):
+    """
+    Runs one setting once per training seed, each in a new process so peak memory is per run.
+
+    Returns:
+        dict: The evaluate() scores averaged over the seeds, plus 'wall_seconds' (median
+              pipeline time, process start-up excluded), 'peak_rss_mb' (maximum),
+              'peak_rss_growth_mb' (maximum rise of the peak RSS during the pipeline, so
+              without the imports), 'epochs_run' (median) and 'stage_seconds' ({stage: median seconds}).
+    """
+    runs = [run_in_process(_run_setting, (filepath, ground_truth, setting, seed, early_stopping)) for seed in seeds]
+
+    reports = [run['report'] for run in runs]
+    stage_names = [record['name'] for record in reports[0]['spans'] if '/' not in record['name']]
+
+    def top_level(report, field):
+        return sum((record[field] or 0.0) for record in report['spans'] if '/' not in record['name'])
+
+    stage_seconds = {name: statistics.median(record['wall_seconds'] for report in reports
+                                             for record in report['spans'] if record['name'] == name)
+                     for name in stage_names}
+    quality = {metric: statistics.mean(run['quality'][metric] for run in runs) for metric in runs[0]['quality']}
+    return {
+        **quality,
+        'wall_seconds': statistics.median(top_level(report, 'wall_seconds') for report in reports),
+        'peak_rss_mb': max((report['peak_rss_mb'] or 0.0) for report in reports),
+        'peak_rss_growth_mb': max(top_level(report, 'peak_rss_growth_mb') for report in reports),
+        'epochs_run': statistics.median(report['counters'].get('epochs_run', 0) for report in reports),
+        'stage_seconds': stage_seconds,
+    }
+
+
+def pareto_frontier(rows, maximize=DEFAULT_MAXIMIZE, minimize=DEFAULT_MINIMIZE, tolerances=None):
+    """
+    Indices of the rows no other row dominates.
+
+    A row is dominated when another is at least as good on every objective
+    (>= on `maximize`, <= on `minimize`) and better on at least one. Differences
+    within an objective's tolerance count as ties, so timer and RSS noise alone
+    never makes one setting dominate another.
+
+    Args:
+        rows (list[dict]): One dict of objective values per setting.
+        tolerances (dict, optional): {objective: smallest difference that counts}
+                                     (default DEFAULT_TOLERANCES, 0 for objectives not in it).
+
+    Returns:
+        list[int]: Indices into rows, in row order.
+    """
+    tolerances = DEFAULT_TOLERANCES if tolerances is None else tolerances
+    objectives = [(m, 1.0) for m in maximize] + [(m, -1.0) for m in minimize]
+
+    def dominates(b, a):
+        gains = [sign * (b[m] - a[m]) for m, sign in objectives]
+        slack = [tolerances.get(m, 0.0) for m, _ in objectives]
+        return all(g >= -t for g, t in zip(gains, slack)) and any(g > t for g, t in zip(gains, slack))
+
+    return [i for i, a in enumerate(rows) if not any(dominates(b, a) for b in rows)]
+
+
+def _print_rows(rows, frontier):
+    knobs = list(DEFAULT_GRID)
+    print(f"\n{'':1} {'epochs':>6} {'hidden':>6} {'out':>4} {'contam':>6} {'len':>3} | {'ran':>4} "
+          f"{'prec':>5} {'rec':>5} {'f1':>5} {'AP':>5} {'paths':>5} | {'wall s':>7} {'+MB':>8}")
+    for i in sorted(range(len(rows)), key=lambda i: rows[i]['wall_seconds']):
+        row = rows[i]
+        setting = row['setting']
+        mark = '*' if i in frontier else ' '
+        print(f"{mark} {setting[knobs[0]]:>6} {setting[knobs[1]]:>6} {setting[knobs[2]]:>4} "
+              f"{setting[knobs[3]]:>6g} {setting[knobs[4]]:>3} | {row['epochs_run']:>4g} "
+              f"{row['precision']:5.2f} {row['recall']:5.2f} {row['f1']:5.2f} {row['average_precision']:5.2f} "
+              f"{row['path_hit_rate']:5.2f} | {row['wall_seconds']:7.2f} {row['peak_rss_growth_mb']:8.0f}")
+    print(f"\n* Pareto frontier: {len(frontier)} of {len(rows)} settings")
+
+
+def run(grid, num_events, seed, seeds, early_stopping, maximize=DEFAULT_MAXIMIZE, minimize=DEFAULT_MINIMIZE,
+        tolerances=None, data_dir=None):
+    """
+    Sweeps every combination of the grid's values on one synthetic dataset.
+
+    Args:
+        grid (dict): {run_full_pipeline keyword: [values]}, e.g. DEFAULT_GRID.
+        num_events (int): Size of the synthetic dataset.
+        seed (int): Dataset seed.
+        seeds (list[int]): Training seeds; each setting runs once per seed.
+        early_stopping (bool): Passed to run_full_pipeline (epochs is then an upper bound).
+        maximize, minimize, tolerances: Frontier objectives (see pareto_frontier).
+
+    Returns:
+        dict: {'created', 'config', 'ground_truth' (summary), 'runs': [{'setting', <metrics>}, ...],
+               'pareto_frontier': [indices into runs]}.
+    """
+    settings = [dict(zip(grid, values)) for values in itertools.product(*grid.values())]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        data_dir = data_dir or tmp_dir
+        os.makedirs(data_dir, exist_ok=True)
+        filepath = os.path.join(data_dir, f"synthetic_{num_events}_seed{seed}.csv")
+        ground_truth_path = os.path.join(data_dir, f"synthetic_{num_events}_seed{seed}_ground_truth.json")
+        if not (os.path.exists(filepath) and os.path.exists(ground_truth_path)):
+            # In its own process: children inherit this process's peak RSS across exec on Linux,
+            # so generating here would hide the pipeline's memory behind the generator's
+            context = multiprocessing.get_context('spawn')
+            process = context.Process(target=generate_synthetic_data, args=(filepath, num_events),
+                                      kwargs={'seed': seed, 'ground_truth_path': ground_truth_path})
+            process.start()
+            process.join()
+            if process.exitcode != 0:
+                raise RuntimeError(f"Generating {filepath} failed (exit code {process.exitcode})")
+        ground_truth = load_ground_truth(ground_truth_path)
+        print(f"{num_events} events, {ground_truth['num_entities']} entities, "
+              f"{len(ground_truth['anomalous_nodes'])} anomalous, {len(ground_truth['attack_paths'])} attack paths; "
+              f"{len(settings)} settings x {len(seeds)} seed(s)")
+
+        rows = []
+        for i, setting in enumerate(settings, start=1):
+            row = {'setting': setting, **_measure(filepath, ground_truth, setting, seeds, early_stopping)}
+            rows.append(row)
+            print(f"  [{i}/{len(settings)}] {setting} -> f1 {row['f1']:.2f}, path hits {row['path_hit_rate']:.2f}, "
+                  f"{row['wall_seconds']:.2f} s, +{row['peak_rss_growth_mb']:.0f} MB")
+
+    frontier = pareto_frontier(rows, maximize, minimize, tolerances)
+    _print_rows(rows, frontier)
+    return {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'config': {'grid': grid, 'events': num_events, 'seed': seed, 'seeds': seeds,
+                   'early_stopping': early_stopping, 'maximize': list(maximize), 'minimize': list(minimize),
+                   'tolerances': DEFAULT_TOLERANCES if tolerances is None else tolerances},
+        'ground_truth': {'num_entities': ground_truth['num_entities'],
+                         'anomalous_nodes': len(ground_truth['anomalous_nodes']),
+                         'attack_paths': len(ground_truth['attack_paths'])},
+        'runs': rows,
+        'pareto_frontier': frontier,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Sweep pipeline settings for detection quality vs time and memory.")
+    parser.add_argument('--events', type=int, default=100_000, help="Synthetic dataset size")
+    parser.add_argument('--seed', type=int, default=0, help="Dataset seed")
+    parser.add_argument('--seeds', type=int, nargs='+', default=[0], help="Training seeds, scores are averaged")
+    parser.add_argument('--epochs', type=int, nargs='+', default=DEFAULT_GRID['epochs'])
+    parser.add_argument('--hidden-channels', type=int, nargs='+', default=DEFAULT_GRID['hidden_channels'])
+    parser.add_argument('--out-channels', type=int, nargs='+', default=DEFAULT_GRID['out_channels'])
+    parser.add_argument('--contamination', type=float, nargs='+', default=DEFAULT_GRID['contamination'])
+    parser.add_argument('--max-path-length', type=int, nargs='+', default=DEFAULT_GRID['max_path_length'])
+    parser.add_argument('--no-early-stopping', action='store_true', help="Always train for the full epochs")
+    parser.add_argument('--maximize', nargs='+', default=list(DEFAULT_MAXIMIZE),
+                        help="Quality objectives of the frontier (precision, recall, f1, average_precision, "
+                             "path_hit_rate, path_precision)")
+    parser.add_argument('--minimize', nargs='+', default=list(DEFAULT_MINIMIZE),
+                        help="Cost objectives of the frontier (wall_seconds, peak_rss_mb, peak_rss_growth_mb)")
+    parser.add_argument('--time-tolerance', type=float, default=DEFAULT_TOLERANCES['wall_seconds'],
+                        help="Seconds of difference treated as a tie on the frontier")
+    parser.add_argument('--memory-tolerance', type=float, default=DEFAULT_TOLERANCES['peak_rss_growth_mb'],
+                        help="MB of difference treated as a tie on the frontier")
+    parser.add_argument('--data-dir', default=None, help="Keep (and reuse) the generated dataset here")
+    parser.add_argument('--output', default='sweep_results.json')
+    args = parser.parse_args()
+
+    grid = {
+        'epochs': args.epochs,
+        'hidden_channels': args.hidden_channels,
+        'out_channels': args.out_channels,
+        'contamination': args.contamination,
+        'max_path_length': args.max_path_length,
+    }
+    tolerances = {'wall_seconds': args.time_tolerance, 'peak_rss_mb': args.memory_tolerance,
+                  'peak_rss_growth_mb': args.memory_tolerance}
+    results = run(grid, args.events, args.seed, args.seeds, not args.no_early_stopping,
+                  args.maximize, args.minimize, tolerances, args.data_dir)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=1)
+    print(f"\nResults written to {args.output}")
+    frontier_settings = [results['runs'][i]['setting'] for i in results['pareto_frontier']]
+    print("Frontier settings:")
+    for setting in frontier_settings:
+        print(f"  {setting}")
@@ -0,0 +1,53 @@
+# benchmarks/bench_train.py
+#
+# Full-batch vs. neighbor-sampled mini-batch GraphSAGE training on synthetic graphs.
+# Each run happens in a fresh process so peak RSS is per mode.
+# Run from the backend directory:
+#   python -m malaphor_mvp.benchmarks.bench_train
+
+import argparse
+import multiprocessing
+import resource
+import tempfile
+import time
+
+from ..data_processing.build_graph import build_graph
+from ..training.train import train_graphsage
+from .synthetic import write_events_csv
+
+
+def _train_once(filepath, epochs, batch_size, num_workers, results):
+    data, _, _ = build_graph(filepath, chunksize=200_000)
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    train_graphsage(data, epochs=epochs, batch_size=batch_size, num_workers=num_workers)
+    elapsed = time.perf_counter() - start
+    peak_mb = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before) / 1024
+    results.put((data.num_nodes, elapsed / epochs, peak_mb))
+
+
+def run(sizes, epochs, batch_size, num_workers):
+    context = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for num_edges in sizes:
+            filepath = write_events_csv(num_edges, tmp_dir)
+            for label, mode_batch_size in (('full-batch', None), (f'mini-batch {batch_size}', batch_size)):
+                results = context.Queue()
+                process = context.Process(
+                    target=_train_once, args=(filepath, epochs, mode_batch_size, num_workers, results)
+                )
+                process.start()
+                num_nodes, seconds_per_epoch, peak_mb = results.get()
+                process.join()
+                print(f"{num_edges:>9} edges, {num_nodes:>8} nodes | {label:<18} | "
+                      f"{seconds_per_epoch:7.3f} s/epoch | training peak RSS +{peak_mb:8.1f} MB")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark full-batch vs. mini-batch GraphSAGE training.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100_000, 1_000_000, 3_000_000])
+    parser.add_argument('--epochs', type=int, default=3)
+    parser.add_argument('--batch-size', type=int, default=4096)
+    parser.add_argument('--num-workers', type=int, default=0)
+    args = parser.parse_args()
+    run(args.sizes, args.epochs, args.batch_size, args.num_workers)
@@ -0,0 +1,64 @@
+# benchmarks/synthetic.py
+
+import numpy as np
+import pandas as pd
+
+EVENT_COLUMNS = ['source_id', 'source_type', 'target_id', 'target_type', 'relationship_type', 'timestamp', 'feature1', 'feature2']
+
+# (source_type, target_type, relationship_type) combinations seen in the simulated data
+_EDGE_KINDS = [
+    ('user', 'resource', 'accesses'),
+    ('user', 'config', 'modifies'),
+    ('resource', 'config', 'is_member_of'),
+    ('resource', 'config', 'has_policy'),
+    ('resource', 'resource', 'network_conn'),
+]
+
+_ID_PREFIXES = {'user': 'user', 'resource': 'vm', 'config': 'sg'}
+
+
+def random_events(num_edges, nodes_per_edge=0.1, seed=0):
+    """
+    Builds a random event DataFrame with the same columns as simulated_cloud_data.csv.
+
+    Only meant for quick benchmarks; entity popularity is uniform.
+
+    Args:
+        num_edges (int): Number of event rows.
+        nodes_per_edge (float): Roughly how many distinct entities per row.
+        seed (int): Random seed.
+
+    Returns:
+        pandas.DataFrame: The events.
+    """
+    rng = np.random.default_rng(seed)
+    # Split the entity budget evenly between the three entity types
+    pool_size = max(1, int(num_edges * nodes_per_edge) // 3)
+
+    kinds = rng.integers(0, len(_EDGE_KINDS), size=num_edges)
+    source_types = np.array([k[0] for k in _EDGE_KINDS], dtype=object)[kinds]
+    target_types = np.array([k[1] for k in _EDGE_KINDS], dtype=object)[kinds]
+    relationships = np.array([k[2] for k in _EDGE_KINDS], dtype=object)[kinds]
+
+    def _ids(types):
+        numbers = rng.integers(0, pool_size, size=num_edges).astype(str).astype(object)
+        prefixes = pd.Series(types).map(_ID_PREFIXES).to_numpy(dtype=object)
+        return prefixes + '_' + numbers
+
+    return pd.DataFrame({
+        'source_id': _ids(source_types),
+        'source_type': source_types,
+        'target_id': _ids(target_types),
+        'target_type': target_types,
+        'relationship_type': relationships,
+        'timestamp': 1678886400 + np.sort(rng.integers(0, 86400, size=num_edges)),
+        'feature1': rng.integers(1, 100, size=num_edges),
+        'feature2': np.round(rng.random(num_edges), 3),
+    }, columns=EVENT_COLUMNS)
+
+
+def write_events_csv(num_edges, directory, seed=0):
+    """Writes random_events(num_edges) to a CSV in `directory` and returns the path."""
+    filepath = f"{directory}/events_{num_edges}.csv"
+    random_events(num_edges, seed=seed).to_csv(filepath, index=False)
+    return filepath
@@ -84,18 +84,429 @@
 
 
 
+import numpy as np
 import pandas as pd
 import torch
 import torch_geometric.data
 # import networkx as nx # No longer needed here
 
-def build_graph(filepath):
+from .graph_cache import graph_cache_key, load_arrays, save_arrays
+
+
+def _accumulate_node_sums(source_indices, target_indices, feature1, feature2, num_nodes):
+    """
+    Scatters edge features onto both endpoints of every edge.
+
+    Each edge contributes to its source and its target (a self-loop contributes
+    twice), matching the incoming + outgoing sums of the original per-node scan.
+    NaN feature values are skipped in the sums but still count towards the
+    degree, like pandas' ``Series.sum()`` next to ``len(edges)``.
+
+    Returns:
+        tuple: (feature1_sum, feature2_sum, degree) as float64/float64/int64 arrays.
+    """
+    feature1 = np.nan_to_num(np.asarray(feature1, dtype=np.float64))
+    feature2 = np.nan_to_num(np.asarray(feature2, dtype=np.float64))
+
+    feature1_sum = (np.bincount(source_indices, weights=feature1, minlength=num_nodes)
+                    + np.bincount(target_indices, weights=feature1, minlength=num_nodes))
+    feature2_sum = (np.bincount(source_indices, weights=feature2, minlength=num_nodes)
+                    + np.bincount(target_indices, weights=feature2, minlength=num_nodes))
+    degree = (np.bincount(source_indices, minlength=num_nodes)
+              + np.bincount(target_indices, minlength=num_nodes))
+    return feature1_sum, feature2_sum, degree
+
+
+def _finalize_node_features(type_codes, feature1_sum, feature2_sum, degree):
+    """Turns the per-node running sums into the [type_int, sum(feature1), mean(feature2)] matrix."""
+    avg_feature2 = np.divide(feature2_sum, degree, out=np.zeros_like(feature2_sum), where=degree > 0)
+    features = np.column_stack([np.asarray(type_codes, dtype=np.float64), feature1_sum, avg_feature2])
+    return torch.tensor(features, dtype=torch.float)
+
+
+def aggregate_node_features(source_indices, target_indices, feature1, feature2, type_codes):
+    """
+    Computes node features for all nodes at once with scatter-adds.
+
+    Replaces the old per-node scan (two full DataFrame filters per node) with a
+    handful of ``np.bincount`` passes, so the cost is O(nodes + edges).
+
+    Args:
+        source_indices (np.ndarray): Node index of each edge's source.
+        target_indices (np.ndarray): Node index of each edge's target.
+        feature1 (array-like): Per-edge feature1 values.
+        feature2 (array-like): Per-edge feature2 values.
+        type_codes (np.ndarray): Integer type code of every node, ordered by node index.
+
+    Returns:
+        torch.Tensor: Node features of shape [num_nodes, 3] (type_int, sum_feature1, avg_feature2).
+    """
+    feature1_sum, feature2_sum, degree = _accumulate_node_sums(
+        source_indices, target_indices, feature1, feature2, len(type_codes)
+    )
+    return _finalize_node_features(type_codes, feature1_sum, feature2_sum, degree)
+
+
+# Columns and dtypes used by the streaming reader. The low-cardinality type and
+# relationship columns are parsed as categoricals. Ids are parsed as plain strings
+# and factorized per chunk (hash-based), which is ~3x faster than letting the
+# parser build sorted categoricals for high-cardinality columns. Features stay
+# float64 while a chunk is parsed so the aggregates (and therefore x) are
+# bit-identical to the in-memory build; only per-node sums outlive the chunk.
+STREAMING_COLUMNS = ['source_id', 'source_type', 'target_id', 'target_type', 'relationship_type', 'feature1', 'feature2']
+STREAMING_DTYPES = {
+    'source_id': str,
+    'source_type': 'category',
+    'target_id': str,
+    'target_type': 'category',
+    'relationship_type': 'category',
+    'feature1': np.float64,
+    'feature2': np.float64,
+}
+
+# Relationship of events whose relationship_type is missing. Both builders map
+# them to this named type, so such edges never borrow another type's code.
+UNKNOWN_RELATIONSHIP = 'unknown'
+
+
+def _grow(array, size):
+    """Returns `array` with room for at least `size` entries (capacity doubles)."""
+    if size <= len(array):
+        return array
+    grown = np.zeros((max(size, 2 * len(array)),) + array.shape[1:], dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+class _GraphAccumulator:
+    """
+    Builds graph state chunk by chunk without keeping the raw rows around.
+
+    Node indices are handed out in order of first appearance. Per node we keep
+    the id, the type, the running feature sums and the first row at which the
+    node appeared as a source / target. Edges are kept as int32 index arrays
+    plus an int16 relationship code, all in amortized-growth buffers.
+    """
+
+    def __init__(self):
+        self.id_to_idx = {}
+        self.node_ids = []
+        self.node_types = []
+        self.first_source_row = np.zeros(0, dtype=np.int64)
+        self.first_target_row = np.zeros(0, dtype=np.int64)
+        self.relationship_to_int = {}
+        self.relationship_types = []
+
+        self.num_rows = 0
+        self.num_edges = 0
+        self.edge_source = np.zeros(0, dtype=np.int32)
+        self.edge_target = np.zeros(0, dtype=np.int32)
+        self.edge_relationship = np.zeros(0, dtype=np.int16)
+
+        self.feature1_sum = np.zeros(0, dtype=np.float64)
+        self.feature2_sum = np.zeros(0, dtype=np.float64)
+        self.degree = np.zeros(0, dtype=np.int64)
+
+    @property
+    def num_nodes(self):
+        return len(self.node_ids)
+
+    def _intern_entities(self, ids, types, role):
+        """
+        Maps one id column ('source' or 'target' role) of a chunk to node indices, registering new nodes.
+
+        Only the distinct ids of the chunk are looked up, and new nodes are appended in bulk.
+
+        Returns:
+            tuple: (node index per row as int32, factorized codes, node index per code)
+        """
+        codes, categories = pd.factorize(ids)
+        categories = np.asarray(categories, dtype=object)
+        present, first_pos = np.unique(codes, return_index=True)
+
+        present_idx = np.fromiter(
+            (self.id_to_idx.get(entity_id, -1) for entity_id in categories[present]),
+            dtype=np.int64, count=len(present),
+        )
+        is_new = present_idx < 0
+        if is_new.any():
+            start = self.num_nodes
+            new_ids = categories[present[is_new]].tolist()
+            present_idx[is_new] = np.arange(start, start + len(new_ids))
+            self.id_to_idx.update(zip(new_ids, range(start, start + len(new_ids))))
+            self.node_ids.extend(new_ids)
+            self.node_types.extend(np.asarray(types)[first_pos[is_new]].tolist())
+            self.first_source_row = _grow(self.first_source_row, self.num_nodes)
+            self.first_target_row = _grow(self.first_target_row, self.num_nodes)
+
+        # Rows are stored 1-based so that 0 means "never seen in this role"
+        first_row = self.first_source_row if role == 'source' else self.first_target_row
+        unseen = first_row[present_idx] == 0
+        first_row[present_idx[unseen]] = self.num_rows + first_pos[unseen] + 1
+
+        category_to_idx = np.zeros(len(categories), dtype=np.int32)
+        category_to_idx[present] = present_idx
+        return category_to_idx[codes], codes, category_to_idx
+
+    def _scatter(self, codes, category_to_idx, feature1, feature2):
+        """
+        Adds one endpoint's contribution to the per-node sums, aggregating inside the chunk first.
+
+        Returns:
+            np.ndarray: Indices of the nodes whose sums changed.
+        """
+        num_categories = len(category_to_idx)
+        counts = np.bincount(codes, minlength=num_categories)
+        keep = counts > 0
+        touched = category_to_idx[keep]
+        self.feature1_sum[touched] += np.bincount(codes, weights=feature1, minlength=num_categories)[keep]
+        self.feature2_sum[touched] += np.bincount(codes, weights=feature2, minlength=num_categories)[keep]
+        self.degree[touched] += counts[keep]
+        return touched
+
+    def _intern_relationships(self, relationships):
+        relationships = relationships.astype('category')
+        if relationships.isna().any():
+            if UNKNOWN_RELATIONSHIP not in relationships.cat.categories:
+                relationships = relationships.cat.add_categories([UNKNOWN_RELATIONSHIP])
+            relationships = relationships.fillna(UNKNOWN_RELATIONSHIP)
+        codes = relationships.cat.codes.to_numpy()
+        category_to_int = np.zeros(len(relationships.cat.categories), dtype=np.int16)
+        for code, name in enumerate(relationships.cat.categories):
+            if name not in self.relationship_to_int:
+                self.relationship_to_int[name] = len(self.relationship_types)
+                self.relationship_types.append(name)
+            category_to_int[code] = self.relationship_to_int[name]
+        return category_to_int[codes]
+
+    def add_chunk(self, chunk):
+        """
+        Folds one DataFrame chunk of event rows into the graph state.
+
+        Returns:
+            np.ndarray: Sorted indices of the nodes touched by the chunk (including new ones).
+        """
+        source_indices, source_codes, source_map = self._intern_entities(
+            chunk['source_id'], chunk['source_type'], 'source'
+        )
+        target_indices, target_codes, target_map = self._intern_entities(
+            chunk['target_id'], chunk['target_type'], 'target'
+        )
+        relationship_codes = self._intern_relationships(chunk['relationship_type'])
+
+        num_nodes = self.num_nodes
+        self.feature1_sum = _grow(self.feature1_sum, num_nodes)
+        self.feature2_sum = _grow(self.feature2_sum, num_nodes)
+        self.degree = _grow(self.degree, num_nodes)
+
+        # Same NaN semantics as _accumulate_node_sums
+        feature1 = np.nan_to_num(chunk['feature1'].to_numpy(dtype=np.float64))
+        feature2 = np.nan_to_num(chunk['feature2'].to_numpy(dtype=np.float64))
+        touched = np.union1d(
+            self._scatter(source_codes, source_map, feature1, feature2),
+            self._scatter(target_codes, target_map, feature1, feature2),
+        )
+
+        start, end = self.num_edges, self.num_edges + len(chunk)
+        self.edge_source = _grow(self.edge_source, end)
+        self.edge_target = _grow(self.edge_target, end)
+        self.edge_relationship = _grow(self.edge_relationship, end)
+        self.edge_source[start:end] = source_indices
+        self.edge_target[start:end] = target_indices
+        self.edge_relationship[start:end] = relationship_codes
+
+        self.num_edges = end
+        self.num_rows += len(chunk)
+        return touched
+
+    def canonical_order(self):
+        """
+        Returns the node permutation that matches build_graph's in-memory ordering.
+
+        The in-memory build numbers nodes by first appearance in the source column,
+        then by first appearance in the target column for nodes never seen as a source.
+        """
+        first_source = self.first_source_row[:self.num_nodes]
+        first_target = self.first_target_row[:self.num_nodes]
+        is_source = first_source > 0
+        return np.lexsort((np.where(is_source, first_source, first_target), ~is_source))
+
+    def reorder(self, order):
+        """Renumbers nodes in place so that new index i is the node previously at order[i]."""
+        num_nodes, num_edges = self.num_nodes, self.num_edges
+        new_index = np.empty(num_nodes, dtype=np.int32)
+        new_index[order] = np.arange(num_nodes, dtype=np.int32)
+
+        self.node_ids = [self.node_ids[i] for i in order]
+        self.node_types = [self.node_types[i] for i in order]
+        self.id_to_idx = {id: idx for idx, id in enumerate(self.node_ids)}
+        for name in ('first_source_row', 'first_target_row', 'feature1_sum', 'feature2_sum', 'degree'):
+            array = getattr(self, name)
+            array[:num_nodes] = array[:num_nodes][order]
+        self.edge_source[:num_edges] = new_index[self.edge_source[:num_edges]]
+        self.edge_target[:num_edges] = new_index[self.edge_target[:num_edges]]
+
+    def finish(self):
+        """
+        Renumbers nodes into canonical order and materializes the build_graph outputs.
+
+        Returns:
+            tuple: (pyg_data, all_entities_df, edges_df), where edges_df is a compact
+                   categorical frame with source_id, target_id and relationship_type.
+        """
+        num_nodes, num_edges = self.num_nodes, self.num_edges
+        order = self.canonical_order()
+        new_index = np.empty(num_nodes, dtype=np.int32)
+        new_index[order] = np.arange(num_nodes, dtype=np.int32)
+
+        edge_index = torch.empty((2, num_edges), dtype=torch.long)
+        edge_index[0] = torch.from_numpy(new_index[self.edge_source[:num_edges]])
+        edge_index[1] = torch.from_numpy(new_index[self.edge_target[:num_edges]])
+
+        node_ids = np.asarray(self.node_ids, dtype=object)[order]
+        type_codes, unique_types = pd.factorize(np.asarray(self.node_types, dtype=object)[order])
+
+        x = _finalize_node_features(
+            type_codes,
+            self.feature1_sum[:num_nodes][order],
+            self.feature2_sum[:num_nodes][order],
+            self.degree[:num_nodes][order],
+        )
+        return _assemble_graph(
+            x, edge_index, self.edge_relationship[:num_edges],
+            node_ids, unique_types, self.relationship_types,
+        )
+
+
+def _set_relationship_vocabulary(data, relationship_types):
+    """Stores the names data.edge_type codes refer to (mirrors unique_types / type_to_int)."""
+    data.relationship_types = np.asarray(relationship_types, dtype=object)
+    data.relationship_to_int = {relationship: i for i, relationship in enumerate(data.relationship_types)}
+
+
+def _assemble_graph(x, edge_index, edge_relationship, node_ids, unique_types, relationship_types):
+    """
+    Wraps prebuilt arrays into the (pyg_data, all_entities_df, edges_df) triple returned by build_graph.
+
+    edges_df is a compact frame: source_id, target_id and relationship_type are
+    categoricals whose codes are the edge arrays themselves.
+    """
+    node_ids = np.asarray(node_ids, dtype=object)
+    unique_types = np.asarray(unique_types, dtype=object)
+    type_codes = x[:, 0].numpy().astype(np.int64)
+
+    data = torch_geometric.data.Data(x=x, edge_index=edge_index, edge_type=torch.from_numpy(np.asarray(edge_relationship)))
+    data.id_to_idx = {id: idx for idx, id in enumerate(node_ids)}
+    data.idx_to_id = dict(enumerate(node_ids))
+    data.unique_types = unique_types
+    data.type_to_int = {type: i for i, type in enumerate(unique_types)}
+    _set_relationship_vocabulary(data, relationship_types)
+
+    all_entities_df = pd.DataFrame({'id': node_ids, 'type': unique_types[type_codes], 'type_int': type_codes})
+
+    id_categories = pd.Index(node_ids)
+    edges_df = pd.DataFrame({
+        'source_id': pd.Categorical.from_codes(edge_index[0].numpy(), categories=id_categories),
+        'target_id': pd.Categorical.from_codes(edge_index[1].numpy(), categories=id_categories),
+        'relationship_type': pd.Categorical.from_codes(
+            np.asarray(edge_relationship), categories=pd.Index(relationship_types, dtype=object)
+        ),
+    })
+    return data, all_entities_df, edges_df
+
+
+def save_graph_to_cache(cache_dir, key, data, edges_df):
+    """Persists build_graph's output (x, edge_index, edge types and id/type/relationship vocabularies)."""
+    arrays = {
+        'x': data.x.numpy(),
+        'edge_index': data.edge_index.numpy(),
+        'edge_relationship': data.edge_type.numpy(),
+    }
+    meta = {
+        'node_ids': [data.idx_to_id[i] for i in range(data.num_nodes)],
+        'unique_types': list(data.unique_types),
+        'relationship_types': list(data.relationship_types),
+    }
+    return save_arrays(cache_dir, key, arrays, meta)
+
+
+def load_graph_from_cache(cache_dir, key):
+    """
+    Loads a graph saved by save_graph_to_cache.
+
+    x and edge_index are backed by memory-mapped files, so the cost is dominated
+    by rebuilding the id dictionaries.
+
+    Returns:
+        tuple: (pyg_data, all_entities_df, edges_df), or None on a cache miss.
+    """
+    cached = load_arrays(cache_dir, key)
+    if cached is None:
+        return None
+    arrays, meta = cached
+    return _assemble_graph(
+        torch.from_numpy(arrays['x']),
+        torch.from_numpy(arrays['edge_index']),
+        arrays['edge_relationship'],
+        meta['node_ids'],
+        meta['unique_types'],
+        meta['relationship_types'],
+    )
+
+
+def build_graph_streaming(filepath, chunksize=100_000):
+    """
+    Builds the same outputs as build_graph while reading the CSV in chunks.
+
+    Peak memory is proportional to the number of nodes plus compact int32 edge
+    arrays, instead of to the raw CSV text. Only the columns the graph needs are
+    parsed (the timestamp is skipped).
+
+    Args:
+        filepath (str): Path to the input CSV file.
+        chunksize (int): Number of rows parsed per chunk.
+
+    Returns:
+        tuple: (pyg_data, all_entities_df, edges_df). pyg_data.x and pyg_data.edge_index
+               are identical to build_graph's; edges_df only holds source_id,
+               target_id and relationship_type as categoricals.
+    """
+    accumulator = _GraphAccumulator()
+    for chunk in pd.read_csv(filepath, usecols=STREAMING_COLUMNS, dtype=STREAMING_DTYPES, chunksize=chunksize):
+        accumulator.add_chunk(chunk)
+    return accumulator.finish()
+
+
+def build_graph(filepath, chunksize=None, cache_dir=None, content_hash=None):
     """
     Builds a PyG Data object and returns data needed for frontend.
 
+    Args:
+        filepath (str): Path to the input CSV file.
+        chunksize (int, optional): If set, stream the CSV in chunks of this many rows
+                                   (see build_graph_streaming) instead of loading it whole.
+        cache_dir (str, optional): If set, reuse / persist the built graph in this directory,
+                                   keyed by the file's content hash. Cached loads return the
+                                   compact edges_df (source_id, target_id, relationship_type).
+        content_hash (str, optional): sha256 of the file if the caller already computed it
+                                      (e.g. while receiving the upload), so it isn't read twice.
+
     Returns:
         tuple: (pyg_data, all_entities_df, edges_df)
     """
+    if cache_dir:
+        key = graph_cache_key(filepath, content_hash=content_hash)
+        cached = load_graph_from_cache(cache_dir, key)
+        if cached is not None:
+            print(f"Loaded cached graph {key[:12]} from {cache_dir}")
+            return cached
+        data, all_entities_df, edges_df = build_graph(filepath, chunksize=chunksize)
+        save_graph_to_cache(cache_dir, key, data, edges_df)
+        return data, all_entities_df, edges_df
+
+    if chunksize:
+        return build_graph_streaming(filepath, chunksize=chunksize)
+
     df = pd.read_csv(filepath)
 
     # 1. Create a list of all unique entities (nodes)
@@ -106,52 +517,43 @@ def build_graph(filepath):
     # Map original IDs to integer indices (required by PyG)
     id_to_idx = {id: idx for idx, id in enumerate(all_entities_df['id'])}
     idx_to_id = {idx: id for id, idx in id_to_idx.items()}
-    num_nodes = len(all_entities_df)
 
     # 2. Create Edge Index (adjacency list format for PyG)
-    source_indices = df['source_id'].apply(lambda x: id_to_idx[x]).values
-    target_indices = df['target_id'].apply(lambda x: id_to_idx[x]).values
-    edge_index = torch.tensor([source_indices, target_indices], dtype=torch.long)
+    source_indices = df['source_id'].map(id_to_idx).to_numpy(dtype=np.int64)
+    target_indices = df['target_id'].map(id_to_idx).to_numpy(dtype=np.int64)
+    edge_index = torch.from_numpy(np.stack([source_indices, target_indices]))
 
 
     # 3. Create Node Features (x)
     unique_types = all_entities_df['type'].unique()
     type_to_int = {type: i for i, type in enumerate(unique_types)}
-    all_entities_df['type_int'] = all_entities_df['type'].apply(lambda x: type_to_int[x]) # Add int type back to df
-
-    aggregated_features = {}
-    for idx in range(num_nodes): # Iterate by index to match PyG order
-        entity_id = idx_to_id[idx]
-        incoming_edges = df[df['target_id'] == entity_id]
-        outgoing_edges = df[df['source_id'] == entity_id]
-
-        sum_feature1 = incoming_edges['feature1'].sum() + outgoing_edges['feature1'].sum()
-        avg_feature2 = 0
-        total_feature2_count = 0
-        if not incoming_edges.empty:
-            avg_feature2 += incoming_edges['feature2'].sum()
-            total_feature2_count += len(incoming_edges)
-        if not outgoing_edges.empty:
-            avg_feature2 += outgoing_edges['feature2'].sum()
-            total_feature2_count += len(outgoing_edges)
-        if total_feature2_count > 0:
-             avg_feature2 /= total_feature2_count
+    all_entities_df['type_int'] = all_entities_df['type'].map(type_to_int) # Add int type back to df
 
-        aggregated_features[idx] = [all_entities_df.loc[all_entities_df['id'] == entity_id, 'type_int'].iloc[0], sum_feature1, avg_feature2]
+    # sum(feature1), mean(feature2) over incoming + outgoing edges, plus the type code
+    x = aggregate_node_features(
+        source_indices,
+        target_indices,
+        df['feature1'].to_numpy(),
+        df['feature2'].to_numpy(),
+        all_entities_df['type_int'].to_numpy(),
+    )
 
 
-    node_features_list = [aggregated_features[i] for i in range(num_nodes)] # Ensure ordered by index
-    x = torch.tensor(node_features_list, dtype=torch.float)
+    # Relationship of each edge as a compact integer code (names in data.relationship_types)
+    df['relationship_type'] = df['relationship_type'].fillna(UNKNOWN_RELATIONSHIP)
+    relationship_codes, relationship_types = pd.factorize(df['relationship_type'])
+    edge_type = torch.from_numpy(relationship_codes.astype(np.int16))
 
 
     # 4. Create PyG Data object
-    data = torch_geometric.data.Data(x=x, edge_index=edge_index)
+    data = torch_geometric.data.Data(x=x, edge_index=edge_index, edge_type=edge_type)
 
     # Store mappings and types within PyG data object (useful for other steps)
     data.id_to_idx = id_to_idx
     data.idx_to_id = idx_to_id
     data.unique_types = unique_types
     data.type_to_int = type_to_int
+    _set_relationship_vocabulary(data, relationship_types)
 
     # Return PyG data, and DFs containing original info for frontend
-    return data, all_entities_df, df # Return edges_df (original df) for frontend edge info
\ No newline at end of file
+    return data, all_entities_df, df # Return edges_df (original df) for frontend edge info
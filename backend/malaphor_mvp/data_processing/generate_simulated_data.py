@@ -1,6 +1,40 @@
+import argparse
+import json
+import os
+from contextlib import contextmanager
+
+import numpy as np
 import pandas as pd
 import time
 
+EVENT_COLUMNS = ['source_id', 'source_type', 'target_id', 'target_type', 'relationship_type', 'timestamp', 'feature1', 'feature2']
+
+# Entity pools of generate_synthetic_data: pool (also the id prefix) -> (node type, share of all entities)
+ENTITY_POOLS = {
+    'user': ('user', 0.30),
+    'vm': ('resource', 0.30),
+    's3': ('resource', 0.12),
+    'db': ('resource', 0.08),
+    'sg': ('config', 0.10),
+    'policy': ('config', 0.10),
+}
+
+# Normal activity: (source pool, target pool, relationship, share of events,
+# mean log feature1, whether feature2 is set); volumes are in the range of generate_data's rows
+EVENT_KINDS = [
+    ('user', 'vm', 'accesses', 0.30, 2.3, True),
+    ('user', 's3', 'accesses', 0.12, 1.8, True),
+    ('user', 'db', 'accesses', 0.08, 2.5, True),
+    ('user', 'sg', 'modifies', 0.03, 0.0, True),
+    ('user', 'policy', 'modifies', 0.02, 0.0, True),
+    ('vm', 'sg', 'is_member_of', 0.15, 0.0, False),
+    ('s3', 'policy', 'has_policy', 0.06, 0.0, False),
+    ('db', 'policy', 'has_policy', 0.04, 0.0, False),
+    ('vm', 'vm', 'network_conn', 0.12, 4.6, True),
+    ('vm', 'db', 'network_conn', 0.05, 4.0, True),
+    ('vm', 's3', 'network_conn', 0.03, 4.0, True),
+]
+
 def generate_data(filepath="data/simulated_cloud_data.csv"):
     """Generates a simple simulated cloud data CSV."""
     data = []
@@ -29,5 +63,252 @@ def generate_data(filepath="data/simulated_cloud_data.csv"):
     df.to_csv(filepath, index=False)
     print(f"Simulated data generated at {filepath}")
 
+class _EntityPool:
+    """Ids of one entity pool with Zipf popularity: the entity of rank r is drawn with weight (r + 1) ** -exponent."""
+
+    def __init__(self, name, size, exponent, rng):
+        self.name = name
+        self.node_type = ENTITY_POOLS[name][0]
+        self.ids = (name + '_' + np.arange(size).astype(str).astype(object)).astype(object)
+        # Ranks are shuffled, so an id's number says nothing about its popularity
+        weights = (rng.permutation(size) + 1.0) ** -exponent
+        self.cdf = np.cumsum(weights) / weights.sum()
+
+    def popular(self, rng, size):
+        """Indices drawn by popularity (heavy-tailed degrees)."""
+        return np.minimum(np.searchsorted(self.cdf, rng.random(size), side='right'), len(self.ids) - 1)
+
+    def rarest(self, count):
+        """Indices of the `count` least popular entities."""
+        return np.argsort(np.diff(self.cdf, prepend=0.0))[:count]
+
+
+def _normal_events(pools, kinds, kind_cdf, rng, size):
+    """`size` rows of normal activity, as a dict of column arrays."""
+    kind = np.searchsorted(kind_cdf, rng.random(size), side='right')
+    columns = {name: np.empty(size, dtype=object) for name in ('source_id', 'source_type', 'target_id', 'target_type',
+                                                                'relationship_type')}
+    feature1 = np.empty(size, dtype=np.int64)
+    feature2 = np.zeros(size, dtype=np.float64)
+    for k, (source, target, relationship, _, log_volume, sensitive) in enumerate(kinds):
+        rows = np.flatnonzero(kind == k)
+        columns['source_id'][rows] = pools[source].ids[pools[source].popular(rng, len(rows))]
+        columns['target_id'][rows] = pools[target].ids[pools[target].popular(rng, len(rows))]
+        columns['source_type'][rows] = pools[source].node_type
+        columns['target_type'][rows] = pools[target].node_type
+        columns['relationship_type'][rows] = relationship
+        feature1[rows] = np.maximum(1, np.rint(np.exp(rng.normal(log_volume, 0.75, len(rows)))))
+        if sensitive:
+            feature2[rows] = np.round(rng.beta(2, 5, len(rows)), 3)
+    columns['feature1'] = feature1
+    columns['feature2'] = feature2
+    return columns
+
+
+def _anomalous_events(pools, rng, num_actors, num_compromised, events_per_actor):
+    """
+    The injected anomalies and their ground truth.
+
+    Anomalous users pull large volumes of highly sensitive data from rarely used
+    S3 buckets / databases and modify security groups. Compromised VMs open
+    high-volume connections to rarely used databases / buckets. Every anomalous
+    user also gets an attack path: user -accesses-> compromised VM -network_conn-> S3 bucket.
+
+    Returns:
+        tuple: (event columns dict, {node_id: role}, [attack path node ids, ...])
+    """
+    users = rng.choice(len(pools['user'].ids), num_actors, replace=False)
+    vms = rng.choice(len(pools['vm'].ids), num_compromised, replace=False)
+    rare = {name: pools[name].rarest(max(1, len(pools[name].ids) // 10)) for name in ('s3', 'db', 'sg')}
+    rows = []
+
+    def add(source, source_idx, target, target_idx, relationship, volume_factor):
+        rows.append((pools[source].ids[source_idx], pools[source].node_type, pools[target].ids[target_idx],
+                     pools[target].node_type, relationship,
+                     int(max(1, round(np.exp(rng.normal(2.3, 0.5)) * volume_factor))), round(rng.uniform(0.9, 1.0), 3)))
+
+    labels = {}
+    for user in users:
+        labels[pools['user'].ids[user]] = 'anomalous_user'
+        for _ in range(events_per_actor):
+            target = 's3' if rng.random() < 0.5 else 'db'
+            add('user', user, target, rng.choice(rare[target]), 'accesses', 30)
+        add('user', user, 'sg', rng.choice(rare['sg']), 'modifies', 1)
+    for vm in vms:
+        labels[pools['vm'].ids[vm]] = 'compromised_vm'
+        for _ in range(events_per_actor):
+            target = 's3' if rng.random() < 0.5 else 'db'
+            add('vm', vm, target, rng.choice(rare[target]), 'network_conn', 300)
+
+    attack_paths = []
+    for user in users:
+        vm = rng.choice(vms)
+        bucket = rng.choice(rare['s3'])
+        add('user', user, 'vm', vm, 'accesses', 30)
+        add('vm', vm, 's3', bucket, 'network_conn', 300)
+        attack_paths.append([pools['user'].ids[user], pools['vm'].ids[vm], pools['s3'].ids[bucket]])
+
+    columns = dict(zip(['source_id', 'source_type', 'target_id', 'target_type', 'relationship_type',
+                        'feature1', 'feature2'], (np.array(column, dtype=object) for column in zip(*rows))))
+    columns['feature1'] = columns['feature1'].astype(np.int64)
+    columns['feature2'] = columns['feature2'].astype(np.float64)
+    return columns, labels, attack_paths
+
+
+@contextmanager
+def _chunk_writer(filepath, file_format):
+    """Yields write(chunk_df), appending each chunk to one CSV or Parquet file."""
+    if file_format == 'csv':
+        with open(filepath, 'w', newline='') as f:
+            first = [True]
+
+            def write(chunk_df):
+                # Generated values never need CSV quoting, so rows are joined directly (~2x faster than to_csv)
+                if first[0]:
+                    f.write(','.join(chunk_df.columns) + '\n')
+                    first[0] = False
+                columns = [values if values.dtype == object else values.astype(str).astype(object)
+                           for values in (chunk_df[name].to_numpy() for name in chunk_df.columns)]
+                f.write('\n'.join(map(','.join, zip(*columns))) + '\n')
+            yield write
+    elif file_format == 'parquet':
+        try:
+            import pyarrow as pa # Optional: only needed for Parquet output
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Parquet output needs pyarrow (pip install pyarrow)") from None
+        writer = None
+
+        def write(chunk_df):
+            nonlocal writer
+            table = pa.Table.from_pandas(chunk_df, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(filepath, table.schema)
+            writer.write_table(table) # One row group per chunk
+        try:
+            yield write
+        finally:
+            if writer is not None:
+                writer.close()
+    else:
+        raise ValueError(f"Unknown file format {file_format!r}; use 'csv' or 'parquet'")
+
+
+def generate_synthetic_data(filepath, num_events, seed=0, entities_per_event=0.05, popularity_exponent=1.0,
+                            anomaly_rate=0.002, events_per_actor=15, chunk_size=500_000, file_format='csv',
+                            ground_truth_path=None, start_time=1_700_000_000, duration=30 * 86400):
+    """
+    Generates a large simulated cloud activity log with labelled anomalies.
+
+    Events use generate_data's columns, entity types (user, resource, config)
+    and relationships. Entity popularity is Zipf-distributed within each pool,
+    so node degrees are heavy-tailed: a few users / VMs account for most
+    events. A small share of users act anomalously and some VMs are compromised
+    (see _anomalous_events); their events are spread over the whole log, and
+    the labels and attack paths are written to a ground truth JSON file.
+
+    Rows are generated and written chunk_size at a time, so memory stays
+    bounded by the chunk and the entity id pools. Output depends only on the
+    arguments: the same seed (and chunk_size) gives the same file.
+
+    Args:
+        filepath (str): Output file.
+        num_events (int): Number of event rows.
+        seed (int): Random seed.
+        entities_per_event (float): Distinct entities per event row (average degree ~ 2 / this).
+        popularity_exponent (float): Zipf exponent of entity popularity (higher = heavier head).
+        anomaly_rate (float): Share of users acting anomalously, and of VMs compromised.
+        events_per_actor (int): Anomalous events per anomalous user / compromised VM.
+        chunk_size (int): Rows generated and written per chunk.
+        file_format (str): 'csv' or 'parquet' (needs pyarrow).
+        ground_truth_path (str, optional): Where to write the labels (default: next to
+                                           filepath, as <name>_ground_truth.json).
+        start_time (int): Timestamp of the first event (seconds).
+        duration (int): Seconds the events are spread over.
+
+    Returns:
+        dict: The ground truth: {'seed', 'num_events', 'num_entities', 'anomalous_nodes'
+              ({node_id: role}), 'attack_paths' ([[user, vm, s3], ...]), 'num_anomalous_events',
+              'filepath', 'ground_truth_path'}.
+    """
+    rng = np.random.default_rng(seed)
+    num_entities = max(len(ENTITY_POOLS) * 10, int(num_events * entities_per_event))
+    pools = {
+        name: _EntityPool(name, max(10, int(num_entities * share)), popularity_exponent, rng)
+        for name, (_, share) in ENTITY_POOLS.items()
+    }
+    kind_cdf = np.cumsum([kind[3] for kind in EVENT_KINDS])
+    kind_cdf /= kind_cdf[-1]
+
+    # At least one anomalous user and VM, but anomalies never exceed ~5% of the events
+    num_actors = max(1, int(len(pools['user'].ids) * anomaly_rate))
+    num_compromised = max(1, int(len(pools['vm'].ids) * anomaly_rate))
+    while (num_actors + num_compromised) * (events_per_actor + 2) > max(num_events // 20, events_per_actor + 2) \
+            and num_actors + num_compromised > 2:
+        num_actors, num_compromised = max(1, num_actors // 2), max(1, num_compromised // 2)
+    anomalies, labels, attack_paths = _anomalous_events(pools, rng, num_actors, num_compromised, events_per_actor)
+    num_anomalous = len(anomalies['source_id'])
+    if num_anomalous > num_events:
+        raise ValueError(f"num_events={num_events} is too small for the {num_anomalous} anomalous events")
+
+    # Anomalous events go to random rows, in shuffled order
+    anomalous_rows = np.sort(rng.choice(num_events, num_anomalous, replace=False))
+    anomaly_order = rng.permutation(num_anomalous)
+
+    with _chunk_writer(filepath, file_format) as write:
+        for chunk_index, start in enumerate(range(0, num_events, chunk_size)):
+            end = min(start + chunk_size, num_events)
+            chunk_rng = np.random.default_rng([seed, chunk_index])
+            first, last = np.searchsorted(anomalous_rows, [start, end])
+            is_anomalous = np.zeros(end - start, dtype=bool)
+            is_anomalous[anomalous_rows[first:last] - start] = True
+            normal = _normal_events(pools, EVENT_KINDS, kind_cdf, chunk_rng, int((~is_anomalous).sum()))
+
+            chunk = {}
+            for column, values in normal.items():
+                merged = np.empty(end - start, dtype=values.dtype)
+                merged[~is_anomalous] = values
+                merged[is_anomalous] = anomalies[column][anomaly_order[first:last]]
+                chunk[column] = merged
+            chunk['timestamp'] = start_time + np.arange(start, end, dtype=np.int64) * duration // num_events
+            write(pd.DataFrame(chunk, columns=EVENT_COLUMNS))
+            print(f"Wrote events {start}-{end} of {num_events}")
+
+    ground_truth = {
+        'seed': seed,
+        'num_events': num_events,
+        'num_entities': sum(len(pool.ids) for pool in pools.values()),
+        'anomalous_nodes': labels,
+        'attack_paths': attack_paths,
+        'num_anomalous_events': num_anomalous,
+        'filepath': filepath,
+        'ground_truth_path': ground_truth_path or f"{os.path.splitext(filepath)[0]}_ground_truth.json",
+    }
+    with open(ground_truth['ground_truth_path'], 'w') as f:
+        json.dump(ground_truth, f, indent=1)
+    print(f"Synthetic data generated at {filepath} ({len(labels)} anomalous entities, "
+          f"ground truth in {ground_truth['ground_truth_path']})")
+    return ground_truth
+
+
+def load_ground_truth(path):
+    """Reads a ground truth file written by generate_synthetic_data."""
+    with open(path) as f:
+        return json.load(f)
+
+
 if __name__ == '__main__':
-    generate_data()
\ No newline at end of file
+    # Without --events: the small hand-written sample. With it, e.g.
+    #   python -m malaphor_mvp.data_processing.generate_simulated_data --events 5000000 --output events.csv
+    parser = argparse.ArgumentParser(description="Generate simulated cloud activity data.")
+    parser.add_argument('--events', type=int, default=None, help="Generate this many synthetic events")
+    parser.add_argument('--output', default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv')
+    parser.add_argument('--chunk-size', type=int, default=500_000)
+    args = parser.parse_args()
+    if args.events is None:
+        generate_data(args.output or "data/simulated_cloud_data.csv")
+    else:
+        generate_synthetic_data(args.output or f"data/synthetic_{args.events}.{args.format}", args.events,
+                                seed=args.seed, chunk_size=args.chunk_size, file_format=args.format)
\ No newline at end of file
@@ -0,0 +1,96 @@
+# data_processing/graph_cache.py
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+# Bump whenever the cached layout or build_graph's output changes
+# (2: missing relationship_type is encoded as 'unknown')
+GRAPH_CACHE_VERSION = 2
+
+_META_FILE = 'meta.json'
+
+
+def file_sha256(filepath, block_size=1 << 20):
+    """Hashes a file's content in fixed-size blocks."""
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def graph_cache_key(filepath, params=None, content_hash=None):
+    """
+    Builds the cache key for a graph built from `filepath`.
+
+    Args:
+        filepath (str): Input CSV file.
+        params (dict, optional): Build parameters that change the output graph.
+        content_hash (str, optional): Precomputed sha256 of the file, if the caller already has it.
+
+    Returns:
+        str: Hex digest combining the content hash, the parameters and the cache version.
+    """
+    content_hash = content_hash or file_sha256(filepath)
+    key_material = json.dumps({
+        'content': content_hash,
+        'params': params or {},
+        'version': GRAPH_CACHE_VERSION,
+    }, sort_keys=True)
+    return hashlib.sha256(key_material.encode('utf-8')).hexdigest()
+
+
+def save_arrays(cache_dir, key, arrays, meta):
+    """
+    Persists named arrays (as .npy) and a JSON metadata dict under cache_dir/key.
+
+    The entry is written to a temporary directory first and renamed into place,
+    so readers never see a half-written entry.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    entry_dir = os.path.join(cache_dir, key)
+    if os.path.isdir(entry_dir):
+        return entry_dir
+
+    staging_dir = tempfile.mkdtemp(prefix=f'.{key}.', dir=cache_dir)
+    try:
+        for name, array in arrays.items():
+            np.save(os.path.join(staging_dir, f'{name}.npy'), np.ascontiguousarray(array))
+        with open(os.path.join(staging_dir, _META_FILE), 'w') as f:
+            json.dump(meta, f, default=lambda value: value.item())  # numpy scalars
+        os.rename(staging_dir, entry_dir)
+    except OSError:
+        # Another process may have published the same entry first
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        if not os.path.isdir(entry_dir):
+            raise
+    return entry_dir
+
+
+def load_arrays(cache_dir, key):
+    """
+    Loads a cache entry written by save_arrays.
+
+    Arrays are memory-mapped copy-on-write, so loading is independent of their size
+    and callers may still modify them in memory without touching the file.
+
+    Returns:
+        tuple: (dict of arrays, meta dict), or None on a cache miss.
+    """
+    entry_dir = os.path.join(cache_dir, key)
+    meta_path = os.path.join(entry_dir, _META_FILE)
+    if not os.path.exists(meta_path):
+        return None
+
+    with open(meta_path) as f:
+        meta = json.load(f)
+    arrays = {}
+    for filename in os.listdir(entry_dir):
+        if filename.endswith('.npy'):
+            arrays[filename[:-4]] = np.load(os.path.join(entry_dir, filename), mmap_mode='c')
+    return arrays, meta
@@ -0,0 +1,133 @@
+# jobs/job_queue.py
+
+import multiprocessing as mp
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from ..model.cpu_perf import configure_cpu_threads
+from ..utils.instrumentation import Instrumentation
+from .store import JobStore, current_owner
+
+
+class JobCancelled(Exception):
+    """Raised inside a worker to abort a job whose cancellation was requested."""
+
+
+def _init_worker(torch_threads):
+    # Split the cores between workers instead of every worker's torch using all of them
+    configure_cpu_threads(torch_threads)
+
+
+def _run_job(db_path, results_dir, job_id, csv_filepath, pipeline_kwargs, delete_input,
+             result_cache=None, cache_key=None):
+    """Worker process entry point: runs the pipeline for one job and records the outcome."""
+    from ..process import run_full_pipeline # Imported here so the web process doesn't load torch for it
+
+    store = JobStore(db_path, results_dir)
+    try:
+        if not store.mark_running(job_id):
+            store.mark_cancelled(job_id) # Cancelled while it was queued
+            return
+
+        def progress(stage, fraction):
+            if store.update_progress(job_id, stage, fraction):
+                raise JobCancelled(job_id)
+
+        metrics = Instrumentation()
+        try:
+            results = run_full_pipeline(csv_filepath, progress_callback=progress, instrumentation=metrics,
+                                        **pipeline_kwargs)
+            store.save_result(job_id, results, metrics=metrics.report())
+        except JobCancelled:
+            print(f"Job {job_id} cancelled.")
+            store.mark_cancelled(job_id, metrics=metrics.report())
+        except Exception as e:
+            print(f"Job {job_id} failed: {e}")
+            store.fail(job_id, str(e), metrics=metrics.report())
+        else:
+            if result_cache is not None and cache_key is not None:
+                try:
+                    result_cache.put_file(cache_key, store.get(job_id)['result_path'])
+                except OSError as e:
+                    print(f"Could not cache the results of job {job_id}: {e}") # The job itself succeeded
+    finally:
+        if delete_input and os.path.exists(csv_filepath):
+            os.remove(csv_filepath)
+
+
+class JobQueue:
+    """
+    Runs pipeline jobs on a bounded pool of worker processes.
+
+    Submitting returns immediately with a job ID; the job waits in the pool's
+    queue until a worker is free. Workers report stage progress to the JobStore
+    and check for cancellation at every progress update (each stage start and
+    training epoch). Jobs still queued are cancelled without running at all.
+
+    Workers are started with 'spawn' rather than forked from the web server,
+    and torch's intra-op threads are divided between them.
+
+    Args:
+        store (JobStore): Where job state and results are kept.
+        max_workers (int): Jobs that may run at the same time.
+        pipeline_kwargs (dict, optional): Defaults passed to run_full_pipeline for every job.
+        result_cache (ResultCache, optional): Where workers store the results of jobs
+                                              submitted with a cache_key.
+    """
+
+    def __init__(self, store, max_workers=1, pipeline_kwargs=None, result_cache=None):
+        self.store = store
+        self.result_cache = result_cache
+        self.max_workers = max_workers
+        self.pipeline_kwargs = dict(pipeline_kwargs or {})
+        self._futures = {}
+        self.owner = current_owner()
+        orphaned = store.fail_orphaned("Interrupted: the server restarted before the job finished.")
+        if orphaned:
+            print(f"Marked {orphaned} unfinished job(s) of server processes that are gone as failed.")
+        torch_threads = max(1, (os.cpu_count() or 1) // max_workers)
+        self._executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=mp.get_context('spawn'),
+                                             initializer=_init_worker, initargs=(torch_threads,))
+
+    def submit(self, csv_filepath, params=None, filename=None, delete_input=False, cache_key=None):
+        """
+        Queues a pipeline run on `csv_filepath`.
+
+        Args:
+            csv_filepath (str): Input CSV; it must stay in place until the job has run.
+            params (dict, optional): JSON-serializable run_full_pipeline keyword arguments for this job.
+            filename (str, optional): Original upload name, kept for display.
+            delete_input (bool): Delete csv_filepath once the job is done with it.
+            cache_key (str, optional): Store the job's results in result_cache under this key.
+
+        Returns:
+            str: The job ID.
+        """
+        params = dict(params or {})
+        job_id = self.store.create(params, filename, owner=self.owner)
+        future = self._executor.submit(_run_job, self.store.db_path, self.store.results_dir, job_id,
+                                       csv_filepath, {**self.pipeline_kwargs, **params}, delete_input,
+                                       self.result_cache, cache_key)
+        self._futures[job_id] = (future, csv_filepath if delete_input else None)
+        future.add_done_callback(lambda _: self._futures.pop(job_id, None))
+        return job_id
+
+    def cancel(self, job_id):
+        """
+        Cancels a queued or running job.
+
+        Returns:
+            bool: True if the job existed and had not finished yet.
+        """
+        if not self.store.request_cancel(job_id):
+            return False
+        future, input_path = self._futures.get(job_id, (None, None))
+        if future is not None and future.cancel():
+            self.store.mark_cancelled(job_id) # Never reached a worker
+            if input_path and os.path.exists(input_path):
+                os.remove(input_path)
+        return True
+
+    def shutdown(self, wait=True):
+        """Stops accepting jobs; with wait=True, blocks until the running ones finish."""
+        self._executor.shutdown(wait=wait, cancel_futures=True)
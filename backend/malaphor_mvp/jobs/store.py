@@ -0,0 +1,221 @@
+# jobs/store.py
+
+import json
+import os
+import shutil
+import socket
+import sqlite3
+import time
+import uuid
+from contextlib import closing, contextmanager
+
+from ..utils.json_stream import iter_json
+
+# Job lifecycle: queued -> running -> succeeded / failed / cancelled
+FINISHED_STATUSES = ('succeeded', 'failed', 'cancelled')
+
+# Distinguishes this process from an earlier one that had the same pid (e.g. pid 1 in a container)
+_PROCESS_TOKEN = uuid.uuid4().hex
+
+
+def current_owner():
+    """Identifies this process as the owner of the jobs it queues: 'host:pid:token'."""
+    return f"{socket.gethostname()}:{os.getpid()}:{_PROCESS_TOKEN}"
+
+
+def owner_alive(owner):
+    """
+    Whether the process that recorded `owner` (see current_owner) may still be running.
+
+    Owners on other hosts, or on platforms where that can't be checked cheaply,
+    are assumed alive. Jobs without an owner have none to wait for.
+    """
+    if owner is None:
+        return False
+    host, pid, token = owner.rsplit(':', 2)
+    if host != socket.gethostname() or os.name == 'nt': # os.kill(pid, 0) would terminate it on Windows
+        return True
+    pid = int(pid)
+    if pid == os.getpid():
+        return token == _PROCESS_TOKEN
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass # Exists, owned by another user
+    return True
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    stage TEXT,
+    stage_progress REAL NOT NULL DEFAULT 0,
+    params TEXT NOT NULL,
+    filename TEXT,
+    error TEXT,
+    result_path TEXT,
+    metrics TEXT,
+    owner TEXT,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+)
+"""
+
+
+class JobStore:
+    """
+    SQLite-backed job records plus a directory of result files.
+
+    Every method opens its own short-lived connection, so one store can be used
+    from the web process and from the pool's worker processes at the same time
+    (SQLite serializes the writes). Results are written as JSON files next to
+    the database rather than into it, so large payloads can be streamed back.
+
+    Args:
+        db_path (str): SQLite database file (created if missing).
+        results_dir (str): Directory for the <job_id>.json result files.
+    """
+
+    def __init__(self, db_path, results_dir):
+        self.db_path = db_path
+        self.results_dir = results_dir
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        os.makedirs(results_dir, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL") # Readers don't block the workers' progress updates
+            conn.execute(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        with closing(sqlite3.connect(self.db_path, timeout=30)) as conn:
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA synchronous=NORMAL") # With WAL: no fsync per progress update, still crash-safe
+            with conn: # Commit on success, roll back on error
+                yield conn
+
+    def create(self, params, filename=None, owner=None):
+        """Records a new queued job and returns its ID; `owner` is the process that will run it (see current_owner)."""
+        job_id = uuid.uuid4().hex
+        with self._connect() as conn:
+            conn.execute("INSERT INTO jobs (id, status, params, filename, owner, created_at) "
+                         "VALUES (?, 'queued', ?, ?, ?, ?)",
+                         (job_id, json.dumps(params), filename, owner, time.time()))
+        return job_id
+
+    def get(self, job_id):
+        """Returns the job as a dict, or None if there is no such job."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job['params'] = json.loads(job['params'])
+        job['metrics'] = None if job['metrics'] is None else json.loads(job['metrics'])
+        job['cancel_requested'] = bool(job['cancel_requested'])
+        return job
+
+    def list_jobs(self, limit=50):
+        """Returns the most recently created jobs, newest first."""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT id FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+        return [self.get(row['id']) for row in rows]
+
+    def mark_running(self, job_id):
+        """Moves a queued job to running; returns False if it was cancelled in the meantime."""
+        with self._connect() as conn:
+            cursor = conn.execute("UPDATE jobs SET status = 'running', started_at = ? "
+                                  "WHERE id = ? AND status = 'queued' AND cancel_requested = 0",
+                                  (time.time(), job_id))
+        return cursor.rowcount == 1
+
+    def update_progress(self, job_id, stage, stage_progress):
+        """
+        Records the current stage and how far into it the job is.
+
+        Returns:
+            bool: True if cancellation of the job has been requested.
+        """
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET stage = ?, stage_progress = ? WHERE id = ?", (stage, stage_progress, job_id))
+            row = conn.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row['cancel_requested'])
+
+    def save_result(self, job_id, results, metrics=None):
+        """Writes the results as JSON and marks the job succeeded (with its Instrumentation report, if given)."""
+        result_path = os.path.join(self.results_dir, f"{job_id}.json")
+        partial_path = result_path + '.partial'
+        with open(partial_path, 'wb') as f:
+            for chunk in iter_json(results):
+                f.write(chunk)
+        os.replace(partial_path, result_path) # Readers never see a half-written file
+        self._finish(job_id, 'succeeded', result_path=result_path, metrics=metrics)
+
+    def save_result_file(self, job_id, filepath):
+        """Marks the job succeeded with an existing JSON results file (e.g. a cached result)."""
+        result_path = os.path.join(self.results_dir, f"{job_id}.json")
+        try:
+            os.link(filepath, result_path) # No copy when both are on the same filesystem
+        except OSError:
+            shutil.copyfile(filepath, result_path)
+        self._finish(job_id, 'succeeded', result_path=result_path)
+
+    def fail(self, job_id, error, metrics=None):
+        """Marks the job failed with an error message."""
+        self._finish(job_id, 'failed', error=error, metrics=metrics)
+
+    def mark_cancelled(self, job_id, metrics=None):
+        """Marks the job cancelled."""
+        self._finish(job_id, 'cancelled', metrics=metrics)
+
+    def _finish(self, job_id, status, error=None, result_path=None, metrics=None):
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET status = ?, error = ?, result_path = ?, metrics = ?, finished_at = ? "
+                         "WHERE id = ?",
+                         (status, error, result_path, None if metrics is None else json.dumps(metrics),
+                          time.time(), job_id))
+
+    def request_cancel(self, job_id):
+        """
+        Flags an unfinished job for cancellation; a running job stops at its next progress update.
+
+        Returns:
+            bool: True if the job exists and had not finished yet.
+        """
+        with self._connect() as conn:
+            cursor = conn.execute(f"UPDATE jobs SET cancel_requested = 1 "
+                                  f"WHERE id = ? AND status NOT IN {FINISHED_STATUSES}", (job_id,))
+        return cursor.rowcount == 1
+
+    def recent_metrics(self, limit=100):
+        """Instrumentation reports of the most recently finished jobs that recorded one."""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT metrics FROM jobs WHERE metrics IS NOT NULL "
+                                "ORDER BY finished_at DESC LIMIT ?", (limit,)).fetchall()
+        return [json.loads(row['metrics']) for row in rows]
+
+    def status_counts(self):
+        """Number of jobs in each status."""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        return {row['status']: row['n'] for row in rows}
+
+    def fail_orphaned(self, error):
+        """
+        Marks queued or running jobs failed whose owner process is gone, e.g. after a server restart.
+
+        Jobs of other live processes sharing the database (several server workers) are left alone.
+
+        Returns:
+            int: Number of jobs marked failed.
+        """
+        with self._connect() as conn:
+            rows = conn.execute(f"SELECT id, owner FROM jobs WHERE status NOT IN {FINISHED_STATUSES}").fetchall()
+            orphaned = [(row['id'],) for row in rows if not owner_alive(row['owner'])]
+            conn.executemany(f"UPDATE jobs SET status = 'failed', error = ?, finished_at = ? "
+                             f"WHERE id = ? AND status NOT IN {FINISHED_STATUSES}",
+                             [(error, time.time(), job_id) for job_id, in orphaned])
+        return len(orphaned)
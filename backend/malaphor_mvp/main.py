@@ -79,17 +79,22 @@
 
 # main.py (Updated)
 
+import json
 import os
 from data_processing.generate_simulated_data import generate_data
 from data_processing.build_graph import build_graph
 from training.train import train_graphsage
-from anomaly_detection.detect_anomalies import detect_anomalies
+from model.registry import save_model_bundle
+from anomaly_detection.detect_anomalies import detect_anomalies, fit_detector
 from path_analysis.analyze_paths import analyze_paths, print_risky_paths # Import new functions
 from utils.helpers import print_anomaly_results # Keep helper for node anomalies
+from utils.instrumentation import Instrumentation
 
 DATA_FILE = "data/simulated_cloud_data.csv"
-# MODEL_SAVE_PATH = "output/graphsage_model.pth" # Not strictly needed for MVP
+GRAPH_CACHE_DIR = "output/graph_cache" # Built graphs, keyed by the data file's content hash
+MODEL_SAVE_PATH = "output/graphsage_model.pt" # Model bundle, reusable via process.run_full_pipeline(model_mode=...)
 # EMBEDDINGS_SAVE_PATH = "output/node_embeddings.pt" # Not strictly needed for MVP
+METRICS_SAVE_PATH = "output/metrics.json" # Per-stage wall/CPU time, peak RSS and counters of the last run
 
 def ensure_output_dir():
     """Ensures the output directory exists."""
@@ -103,6 +108,7 @@ if __name__ == '__main__':
     ensure_output_dir()
 
     print("--- Malaphor MVP Pipeline (Attack Path Analysis) ---")
+    metrics = Instrumentation()
 
     # 1. Generate or load data
     if not os.path.exists(DATA_FILE):
@@ -113,8 +119,11 @@ if __name__ == '__main__':
 
     # 2. Build Graph
     print("\nBuilding graph from data...")
-    graph_data = build_graph(DATA_FILE)
+    with metrics.span('build_graph'):
+        graph_data, _, _ = build_graph(DATA_FILE, cache_dir=GRAPH_CACHE_DIR)
     print(graph_data) # Print summary of the graph data object
+    metrics.set_counter('nodes', graph_data.num_nodes)
+    metrics.set_counter('edges', graph_data.num_edges)
 
     # 3. Train GraphSAGE
     print("\nTraining GraphSAGE model...")
@@ -123,37 +132,50 @@ if __name__ == '__main__':
     hidden_channels = 64
     out_channels = 32 # Size of the final embedding vector
 
-    # We only need the embeddings for path analysis, not the trained model itself for this MVP
-    _, node_embeddings = train_graphsage(
-        data=graph_data,
-        epochs=epochs,
-        lr=lr,
-        hidden_channels=hidden_channels,
-        out_channels=out_channels
-    )
+    with metrics.span('train'):
+        trained_model, node_embeddings = train_graphsage(
+            data=graph_data,
+            epochs=epochs,
+            lr=lr,
+            hidden_channels=hidden_channels,
+            out_channels=out_channels,
+            epoch_callback=lambda epoch, epochs: metrics.count('epochs_run')
+        )
 
     # 4. Detect Node Anomalies (Optional, but useful for path scoring)
     print("\nDetecting individual node anomalies...")
     contamination_rate = 0.2 # Adjust based on your expectation or sensitivity
 
-    anomaly_results_df = detect_anomalies(
-        data=graph_data, # Pass data object for index mapping and types
-        embeddings=node_embeddings,
-        contamination=contamination_rate
-    )
+    with metrics.span('detect_anomalies'):
+        detector = fit_detector(node_embeddings, contamination=contamination_rate)
+        anomaly_results_df = detect_anomalies(
+            data=graph_data, # Pass data object for index mapping and types
+            embeddings=node_embeddings,
+            contamination=contamination_rate,
+            detector=detector
+        )
+    # The fitted detector is saved with the model so later snapshots can be scored without refitting
+    save_model_bundle(MODEL_SAVE_PATH, trained_model, graph_data.unique_types, detector=detector)
+    metrics.set_counter('anomalous_nodes', int((anomaly_results_df['prediction'] == -1).sum()))
 
     # Print node anomaly results as before (optional, helps understand path scores)
     print_anomaly_results(anomaly_results_df, top_n=5) # Print top 5 node anomalies
     # print_predicted_anomalies(anomaly_results_df) # Less useful now, focus on paths
 
     # 5. Analyze Paths (NEW STEP)
-    risky_paths = analyze_paths(
-        pyg_data=graph_data,
-        anomaly_results_df=anomaly_results_df,
-        max_path_length=4 # Max 3 hops (start -> 1 -> 2 -> end)
-    )
+    with metrics.span('analyze_paths'):
+        risky_paths = analyze_paths(
+            pyg_data=graph_data,
+            anomaly_results_df=anomaly_results_df,
+            max_path_length=4, # Max 3 hops (start -> 1 -> 2 -> end)
+            instrumentation=metrics
+        )
 
     # 6. Report Risky Paths
     print_risky_paths(risky_paths, graph_data, top_n=5)
 
-    print("\n--- Malaphor MVP Pipeline Finished ---")
\ No newline at end of file
+    print("\n--- Malaphor MVP Pipeline Finished ---")
+    metrics.log()
+    with open(METRICS_SAVE_PATH, 'w') as f:
+        json.dump(metrics.report(), f, indent=2)
+    print(f"Metrics written to {METRICS_SAVE_PATH}")
\ No newline at end of file
@@ -1,3 +1,4 @@
+import numpy as np
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
@@ -18,6 +19,7 @@ class GraphSAGE(nn.Module):
         self.convs.append(SAGEConv(hidden_channels, out_channels))
 
     def forward(self, x, edge_index):
+        # edge_index may also be a sparse adjacency (see cpu_perf.sparse_adjacency)
         # Propagate features through GraphSAGE layers
         for i in range(self.num_layers):
             x = self.convs[i](x, edge_index)
@@ -27,4 +29,41 @@ class GraphSAGE(nn.Module):
                 # x = F.dropout(x, p=0.5, training=self.training) # Optional: Add dropout
 
         # The output 'x' now contains the node embeddings
-        return x
\ No newline at end of file
+        return x
+
+    @torch.no_grad()
+    def inference(self, x_all, in_adjacency, batch_size=4096):
+        """
+        Layer-wise batched inference over full neighborhoods.
+
+        Computes layer l for all nodes (in batches of target nodes) before moving to
+        layer l + 1, so peak memory is two [num_nodes, channels] activations plus one
+        batch of messages, instead of the whole graph's messages at once. The result
+        matches forward(x, edge_index).
+
+        Args:
+            x_all (torch.Tensor): Input features of all nodes.
+            in_adjacency (CSRGraph): In-neighbor adjacency (rows are edge targets).
+            batch_size (int): Number of target nodes per batch.
+
+        Returns:
+            torch.Tensor: Node embeddings.
+        """
+        num_nodes = x_all.size(0)
+        for i, conv in enumerate(self.convs):
+            x_next = torch.empty(num_nodes, conv.out_channels)
+            for start in range(0, num_nodes, batch_size):
+                end = min(start + batch_size, num_nodes)
+                positions, counts = in_adjacency.positions(np.arange(start, end))
+                source_nodes, source_local = np.unique(in_adjacency.indices[positions], return_inverse=True)
+                edge_index = torch.from_numpy(np.stack([
+                    source_local.astype(np.int64),
+                    np.repeat(np.arange(end - start), counts),
+                ]))
+                x_source = x_all[torch.from_numpy(source_nodes.astype(np.int64))]
+                out = conv((x_source, x_all[start:end]), edge_index, size=(len(source_nodes), end - start))
+                if i < self.num_layers - 1:
+                    out = F.relu(out)
+                x_next[start:end] = out
+            x_all = x_next
+        return x_all
@@ -0,0 +1,123 @@
+# model/registry.py
+
+import os
+import tempfile
+
+import numpy as np
+import torch
+
+from .graphsage_model import GraphSAGE
+from ..utils.derived_cache import bump_graph_version
+
+# Bump when the bundle layout changes
+MODEL_BUNDLE_VERSION = 1
+
+
+def save_model_bundle(path, model, type_vocabulary, detector=None):
+    """
+    Saves a trained model with everything needed to apply it to a new snapshot.
+
+    The bundle holds the GraphSAGE weights (including the reconstruction decoder
+    attached by train_graphsage), the layer sizes and the node-type vocabulary
+    the type codes in x[:, 0] refer to. The model is trained on raw features,
+    so applying it needs no feature statistics.
+    With a detector, the Isolation Forest fitted on the model's embeddings is
+    stored too, so later snapshots are scored against the same baseline
+    without refitting.
+
+    Args:
+        path (str): File to write (a torch.save archive).
+        model (GraphSAGE): The trained model.
+        type_vocabulary (list[str]): Node types in type-code order (data.unique_types).
+        detector (IsolationForest, optional): Anomaly detector fitted on this model's embeddings.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    bundle = {
+        'version': MODEL_BUNDLE_VERSION,
+        'config': {
+            'in_channels': model.convs[0].in_channels,
+            'hidden_channels': model.convs[0].out_channels,
+            'out_channels': model.convs[-1].out_channels,
+            'num_layers': model.num_layers,
+        },
+        'state_dict': model.state_dict(),
+        'type_vocabulary': [str(t) for t in type_vocabulary],
+        'detector': detector,
+    }
+    # Write to a unique temporary file, then rename, so a concurrent reader never loads a
+    # partial file and concurrent writers (threads or processes) never share one
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", dir=directory or '.')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            torch.save(bundle, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    print(f"Saved model bundle to {path}")
+
+
+def load_model_bundle(path):
+    """
+    Loads a bundle written by save_model_bundle.
+
+    Returns:
+        dict: {'model': GraphSAGE in eval mode (with reconstruction_decoder),
+               'type_vocabulary': list[str],
+               'detector': IsolationForest or None (None for bundles saved without one),
+               'config': dict}
+    """
+    bundle = torch.load(path)
+    if bundle.get('version') != MODEL_BUNDLE_VERSION:
+        raise ValueError(f"Unsupported model bundle version {bundle.get('version')} in {path}")
+
+    config = bundle['config']
+    model = GraphSAGE(config['in_channels'], config['hidden_channels'], config['out_channels'],
+                      num_layers=config['num_layers'])
+    model.reconstruction_decoder = torch.nn.Linear(config['out_channels'], config['in_channels'])
+    model.load_state_dict(bundle['state_dict'])
+    model.eval()
+
+    return {
+        'model': model,
+        'type_vocabulary': bundle['type_vocabulary'],
+        'detector': bundle.get('detector'),
+        'config': config,
+    }
+
+
+def align_type_codes(data, type_vocabulary):
+    """
+    Re-encodes x[:, 0] so type codes mean what they meant when the model was trained.
+
+    build_graph numbers types by first appearance, so the same type can get a
+    different code in another snapshot. Types the model has never seen are
+    appended after the saved vocabulary. Updates data.x, data.unique_types and
+    data.type_to_int in place.
+
+    Returns:
+        list[str]: Types present in `data` but unknown to the model.
+    """
+    vocabulary = list(type_vocabulary)
+    type_to_int = {node_type: i for i, node_type in enumerate(vocabulary)}
+    unseen_types = []
+    for node_type in data.unique_types:
+        if node_type not in type_to_int:
+            type_to_int[node_type] = len(vocabulary)
+            vocabulary.append(node_type)
+            unseen_types.append(node_type)
+
+    remap = torch.tensor([type_to_int[node_type] for node_type in data.unique_types], dtype=data.x.dtype)
+    data.x[:, 0] = remap[data.x[:, 0].long()]
+    data.unique_types = np.asarray(vocabulary, dtype=object)
+    data.type_to_int = type_to_int
+    bump_graph_version(data)
+
+    if unseen_types:
+        print(f"Warning: node types not seen during training: {unseen_types}")
+    return unseen_types
+
@@ -1,70 +1,226 @@
 # path_analysis/analyze_paths.py
 
-import networkx as nx
+import numpy as np
 import pandas as pd
-from ..utils.graph_converter import to_networkx
-from ..path_analysis.path_scoring import score_path
+from ..utils.csr_graph import CSRGraph
+from ..utils.derived_cache import cached_derived, node_id_array
+from ..utils.instrumentation import Instrumentation
+from ..path_analysis.selectors import DEFAULT_END_SELECTOR, DEFAULT_START_SELECTOR
+from ..path_analysis.reachability import reachability_index
+from ..path_analysis.path_scoring import node_score_vector, pad_paths, pad_scores, path_edge_costs, score_paths
+from ..path_analysis.parallel_search import parallel_top_k_risky_paths
 import torch_geometric.data # Import for type hinting
 
-def analyze_paths(pyg_data: torch_geometric.data.Data, anomaly_results_df: pd.DataFrame, max_path_length=4):
+# Paths are scored in batches of this many
+PATH_SCORING_BATCH_SIZE = 65536
+
+def _enumerate_simple_paths(successors, start_nodes, end_mask, max_path_length, hops_to_end=None):
+    """
+    Yields every simple path (as a list of node indices) from a start node to an end node.
+
+    Same set of paths as nx.all_simple_paths over every (start, end) pair with
+    cutoff=max_path_length - 1, found with one depth-first walk per start node.
+    With hops_to_end (see ReachabilityIndex) the walk never descends into nodes
+    that can't reach an end node in the hops left.
+    """
+    max_hops = max_path_length - 1
+    if max_hops < 1:
+        return
+    if hops_to_end is None:
+        hops_to_end = [1] * len(end_mask) # Never prunes
+    for start in dict.fromkeys(start_nodes):
+        path = [start]
+        on_path = {start}
+        stack = [iter(successors(start))]
+        while stack:
+            neighbor = next(stack[-1], None)
+            if neighbor is None:
+                stack.pop()
+                on_path.discard(path.pop())
+                continue
+            if neighbor in on_path:
+                continue
+            if end_mask[neighbor]:
+                yield path + [neighbor]
+            if len(path) < max_hops and hops_to_end[neighbor] <= max_hops - len(path):
+                path.append(neighbor)
+                on_path.add(neighbor)
+                stack.append(iter(successors(neighbor)))
+
+def _path_adjacency(pyg_data, allowed_relationships=None, relationship_weights=None):
+    """
+    Builds the out-neighbor CSR adjacency path search traverses.
+
+    Edges whose relationship is not in allowed_relationships are dropped before
+    the search, so it never walks them. Parallel edges are merged, so traversal
+    sees the same neighbors a NetworkX DiGraph would; with relationship_weights
+    the merged hop keeps the cheapest allowed relationship's weight.
+
+    Returns:
+        CSRGraph: Deduplicated adjacency (edge_weights set when relationship_weights is given).
+    """
+    edge_index = pyg_data.edge_index
+    if allowed_relationships is None and relationship_weights is None:
+        return CSRGraph.from_edge_index(edge_index, pyg_data.num_nodes, dedupe=True)
+
+    if getattr(pyg_data, 'edge_type', None) is None:
+        raise ValueError("Relationship filters and weights need pyg_data.edge_type (see build_graph).")
+    edge_type = pyg_data.edge_type.numpy()
+    relationship_to_int = pyg_data.relationship_to_int
+
+    edge_weights = None
+    if relationship_weights is not None:
+        # Relationships without a weight cost nothing
+        weight_by_type = np.zeros(len(pyg_data.relationship_types), dtype=np.float64)
+        for relationship, weight in relationship_weights.items():
+            if relationship in relationship_to_int:
+                weight_by_type[relationship_to_int[relationship]] = weight
+        edge_weights = weight_by_type[edge_type]
+
+    if allowed_relationships is not None:
+        unknown = [r for r in allowed_relationships if r not in relationship_to_int]
+        if unknown:
+            print(f"Warning: relationships not present in the graph: {unknown}")
+        allowed = np.zeros(len(pyg_data.relationship_types), dtype=bool)
+        allowed[[relationship_to_int[r] for r in allowed_relationships if r in relationship_to_int]] = True
+        keep = allowed[edge_type]
+        edge_index = edge_index.numpy()[:, keep]
+        edge_type = edge_type[keep]
+        if edge_weights is not None:
+            edge_weights = edge_weights[keep]
+        print(f"Relationship filter keeps {int(keep.sum())} of {len(keep)} edges.")
+
+    return CSRGraph.from_edge_index(edge_index, pyg_data.num_nodes, edge_types=edge_type,
+                                    edge_weights=edge_weights, dedupe=True)
+
+def _preview(node_ids, limit=20):
+    """Formats at most `limit` node IDs for logging."""
+    shown = list(node_ids[:limit])
+    return f"{shown} ... ({len(node_ids) - limit} more)" if len(node_ids) > limit else str(shown)
+
+def analyze_paths(pyg_data: torch_geometric.data.Data, anomaly_results_df: pd.DataFrame, max_path_length=4, top_k=None, num_workers=1,
+                  allowed_relationships=None, relationship_weights=None, start_selector=None, end_selector=None,
+                  instrumentation=None):
     """
     Identifies potential attack paths in the graph, scores them, and reports the riskiest.
 
+    With top_k set, a best-first search returns only the top_k riskiest paths
+    without enumerating every path for every (start, end) pair. It returns the
+    same paths as the first top_k of the exhaustive result. With num_workers > 1
+    the start nodes are split across that many worker processes.
+
+    allowed_relationships restricts traversal to edges of those relationship
+    types, and relationship_weights adds a cost per hop by relationship type
+    (a positive weight makes paths over that relationship less risky).
+
     Args:
         pyg_data (torch_geometric.data.Data): The PyG graph data object.
         anomaly_results_df (pd.DataFrame): DataFrame from anomaly_detection,
                                          including 'node_index' and 'anomaly_score'.
         max_path_length (int): The maximum number of hops to consider for a path.
+        top_k (int, optional): Only find the top_k riskiest paths. None enumerates all paths.
+        num_workers (int): Worker processes for the top_k search.
+        allowed_relationships (iterable[str], optional): Only traverse edges with these
+                                                         relationship types (e.g. {'accesses', 'modifies'}).
+        relationship_weights (dict, optional): {relationship_type: cost added per hop};
+                                               between two nodes the cheapest allowed edge counts.
+        start_selector (NodeSelector, optional): Which nodes paths may start at
+                                                 (default: DEFAULT_START_SELECTOR).
+        end_selector (NodeSelector, optional): Which nodes paths may end at
+                                               (default: DEFAULT_END_SELECTOR).
+        instrumentation (Instrumentation, optional): Receives a span per step (adjacency,
+                                                     select_nodes, reachability, search or
+                                                     enumerate/score) and path counters.
 
     Returns:
         list: A list of tuples, each containing (path_score, path_as_original_ids, path_as_indices).
-              Sorted by score (lowest score = riskiest path)
+              Sorted by score (lowest score = riskiest path), ties by node indices
     """
     print(f"\nAnalyzing paths (max length: {max_path_length})...")
-
-    # Convert PyG data to NetworkX for easier path traversal
-    nx_graph = to_networkx(pyg_data, pyg_data.idx_to_id.values()) # Pass node_ids for attribute
+    metrics = instrumentation or Instrumentation()
+
+    # Out-neighbor CSR adjacency straight from edge_index, restricted to the allowed relationships
+    adjacency_key = (
+        'path_adjacency',
+        None if allowed_relationships is None else frozenset(allowed_relationships),
+        None if relationship_weights is None else tuple(sorted(relationship_weights.items())),
+    )
+    with metrics.span('adjacency'):
+        adjacency = cached_derived(pyg_data, adjacency_key,
+                                   lambda: _path_adjacency(pyg_data, allowed_relationships, relationship_weights))
+        successors = cached_derived(pyg_data, adjacency_key + ('successors',), adjacency.successor_function)
+    weighted = adjacency.edge_weights is not None
+
+    # Dense score per node index, built once instead of filtering the DataFrame per path
+    node_scores = node_score_vector(anomaly_results_df, pyg_data.num_nodes)
 
     # --- Identify Potential Start and End Nodes ---
-    # For MVP, let's define simple criteria based on node types and names in simulated data
-    start_node_criteria = lambda node_id, node_type: 'user' in node_type or 'vm_z' in node_id # Users, or potentially external-facing/compromised VMs
-    end_node_criteria = lambda node_id, node_type: 'db' in node_type or 's3' in node_id or 'sg' in node_type # Databases, S3, Security Groups (high value/impact)
-
-    potential_starts_idx = [i for i, node_id in pyg_data.idx_to_id.items() if start_node_criteria(node_id, pyg_data.unique_types[int(pyg_data.x[i, 0].item())])]
-    potential_ends_idx = [i for i, node_id in pyg_data.idx_to_id.items() if end_node_criteria(node_id, pyg_data.unique_types[int(pyg_data.x[i, 0].item())])]
-
-    print(f"Identified {len(potential_starts_idx)} potential start nodes and {len(potential_ends_idx)} potential end nodes.")
-    print(f"Starts: {[pyg_data.idx_to_id[i] for i in potential_starts_idx]}")
-    print(f"Ends: {[pyg_data.idx_to_id[i] for i in potential_ends_idx]}")
-
-
-    # --- Enumerate and Score Paths ---
-    risky_paths = []
-
-    for start_node_idx in potential_starts_idx:
-        for end_node_idx in potential_ends_idx:
-            if start_node_idx == end_node_idx:
-                continue # Don't look for paths from a node to itself
-
-            # Find all simple paths up to max_path_length
-            # Note: This can be computationally expensive on large graphs!
-            # For MVP, keep graph small and max_path_length low.
-            try:
-                for path_indices in nx.all_simple_paths(nx_graph, source=start_node_idx, target=end_node_idx, cutoff=max_path_length - 1): # cutoff is num_edges = path_length - 1
-                    # Score the found path
-                    path_score = score_path(path_indices, nx_graph, anomaly_results_df)
-
-                    # Convert node indices back to original IDs for reporting
-                    path_original_ids = [pyg_data.idx_to_id[idx] for idx in path_indices]
-
-                    risky_paths.append((path_score, path_original_ids, path_indices))
-            except nx.NetworkXNoPath:
-                continue # No path found between these two nodes
-
-    # Sort paths by score (lowest score first = riskiest)
-    risky_paths.sort(key=lambda x: x[0])
+    # Selectors compile to boolean masks over all nodes (cached per graph)
+    start_selector = start_selector or DEFAULT_START_SELECTOR
+    end_selector = end_selector or DEFAULT_END_SELECTOR
+    with metrics.span('select_nodes'):
+        potential_starts_idx = start_selector.select(pyg_data, node_scores).tolist()
+        end_mask = end_selector.mask(pyg_data, node_scores)
+
+    print(f"Identified {len(potential_starts_idx)} potential start nodes and {int(end_mask.sum())} potential end nodes.")
+    node_ids = node_id_array(pyg_data)
+    print(f"Starts: {_preview(node_ids[potential_starts_idx])}")
+    print(f"Ends: {_preview(node_ids[end_mask])}")
+
+    # --- Reachability Index ---
+    # Drop start nodes with no end node in range, and let the search skip nodes that can't reach one
+    with metrics.span('reachability'):
+        reachability = reachability_index(pyg_data, adjacency_key, adjacency, end_mask, max_path_length - 1)
+        potential_starts_idx = reachability.useful_starts(potential_starts_idx).tolist()
+    hops_to_end = reachability.hops_to_end
+    print(f"{len(potential_starts_idx)} start nodes can reach an end node within {max_path_length - 1} hops; "
+          f"{reachability.relevant_node_count()} nodes can be on such a path.")
+    metrics.set_counter('path_start_nodes', len(potential_starts_idx))
+    metrics.set_counter('path_end_nodes', int(end_mask.sum()))
+
+    if top_k is not None:
+        # --- Best-first Top-K Search ---
+        with metrics.span('search'):
+            risky_paths = [
+                (path_score, [pyg_data.idx_to_id[idx] for idx in path_indices], path_indices)
+                for path_score, path_indices in parallel_top_k_risky_paths(
+                    successors, potential_starts_idx, end_mask, node_scores, top_k, max_path_length, num_workers,
+                    edge_costs=adjacency.weight_function() if weighted else None,
+                    min_edge_cost=float(adjacency.edge_weights.min()) if weighted and adjacency.num_edges else 0.0,
+                    hops_to_end=hops_to_end)
+            ]
+        print(f"Found the top {len(risky_paths)} riskiest paths.")
+        metrics.set_counter('paths_found', len(risky_paths))
+        return risky_paths
+
+    # --- Enumerate Paths ---
+    # Note: This can be computationally expensive on large graphs!
+    # For MVP, keep graph small and max_path_length low.
+    with metrics.span('enumerate'):
+        all_paths = list(_enumerate_simple_paths(successors, potential_starts_idx, end_mask.tolist(), max_path_length,
+                                                 hops_to_end.tolist()))
+    metrics.set_counter('paths_enumerated', len(all_paths))
+
+    # --- Score Paths in Batches ---
+    with metrics.span('score'):
+        padded_scores = pad_scores(node_scores)
+        path_scores = []
+        for batch_start in range(0, len(all_paths), PATH_SCORING_BATCH_SIZE):
+            batch = pad_paths(all_paths[batch_start:batch_start + PATH_SCORING_BATCH_SIZE], max_path_length)
+            edge_costs = path_edge_costs(batch, adjacency) if weighted else None
+            path_scores.extend(score_paths(batch, padded_scores, edge_costs).tolist())
+
+    # Convert node indices back to original IDs for reporting
+    risky_paths = [
+        (path_score, [pyg_data.idx_to_id[idx] for idx in path_indices], path_indices)
+        for path_score, path_indices in zip(path_scores, all_paths)
+    ]
+
+    # Sort paths by score (lowest score first = riskiest), ties by node indices
+    risky_paths.sort(key=lambda x: (x[0], x[2]))
 
     print(f"Found and scored {len(risky_paths)} paths.")
+    metrics.set_counter('paths_found', len(risky_paths))
     return risky_paths
 
 def print_risky_paths(risky_paths, pyg_data: torch_geometric.data.Data, top_n=5): # Added pyg_data
@@ -0,0 +1,68 @@
+# path_analysis/parallel_search.py
+
+import heapq
+import itertools
+import multiprocessing as mp
+
+from .topk_search import top_k_risky_paths
+
+# Search inputs of this worker process, set by _init_worker. Only ever assigned in
+# pool workers, so concurrent searches in the parent (e.g. threaded Flask requests)
+# never see each other's inputs.
+_worker_search = None
+
+
+def _init_worker(search):
+    global _worker_search
+    _worker_search = search
+
+
+def _search_shard(start_nodes):
+    search = _worker_search
+    return top_k_risky_paths(search['successors'], start_nodes, search['end_mask'],
+                             search['node_scores'], search['k'], search['max_path_length'],
+                             edge_costs=search['edge_costs'], min_edge_cost=search['min_edge_cost'],
+                             hops_to_end=search['hops_to_end'])
+
+
+def parallel_top_k_risky_paths(successors, start_nodes, end_mask, node_scores, k, max_path_length, num_workers,
+                               edge_costs=None, min_edge_cost=0.0, hops_to_end=None):
+    """
+    Runs top_k_risky_paths with the start nodes sharded across worker processes.
+
+    The search from each start node is independent, so every worker finds the
+    top k paths for its own shard. The global top k is always among the shards'
+    results, so merging them gives exactly the serial result. Start nodes are
+    dealt round-robin, so each shard gets a similar mix of start nodes.
+
+    The graph, end mask, scores, costs and reachability labels reach the
+    workers as the fork pool's initializer arguments, so each call's workers
+    inherit that call's inputs copy-on-write; only the start-node shards and
+    the (small) per-shard results are pickled.
+    Falls back to the serial search when fork is unavailable (e.g. Windows) or
+    when there is only one worker or shard.
+
+    Args:
+        successors, start_nodes, end_mask, node_scores, k, max_path_length: See top_k_risky_paths.
+        num_workers (int): Number of worker processes.
+        edge_costs, min_edge_cost, hops_to_end: See top_k_risky_paths.
+
+    Returns:
+        list: Up to k (score, path_indices) tuples sorted by (score, path_indices).
+    """
+    start_nodes = list(dict.fromkeys(start_nodes))
+    num_shards = min(num_workers, len(start_nodes))
+    if num_shards <= 1 or 'fork' not in mp.get_all_start_methods():
+        return top_k_risky_paths(successors, start_nodes, end_mask, node_scores, k, max_path_length,
+                                 edge_costs=edge_costs, min_edge_cost=min_edge_cost, hops_to_end=hops_to_end)
+
+    shards = [start_nodes[i::num_shards] for i in range(num_shards)]
+    search = dict(successors=successors, end_mask=end_mask, node_scores=node_scores, k=k,
+                  max_path_length=max_path_length, edge_costs=edge_costs, min_edge_cost=min_edge_cost,
+                  hops_to_end=hops_to_end)
+    # With fork, initargs are inherited by the workers rather than pickled
+    with mp.get_context('fork').Pool(num_shards, initializer=_init_worker, initargs=(search,)) as pool:
+        shard_results = pool.map(_search_shard, shards)
+
+    # Each shard's list is already sorted by (score, path)
+    return list(itertools.islice(heapq.merge(*shard_results), k))
@@ -1,6 +1,9 @@
 # path_analysis/path_scoring.py
 
+import itertools
+
 import networkx as nx
+import numpy as np
 import pandas as pd
 
 def score_path(path: list, nx_graph: nx.DiGraph, anomaly_results_df: pd.DataFrame) -> float:
@@ -51,4 +54,88 @@ def score_path(path: list, nx_graph: nx.DiGraph, anomaly_results_df: pd.DataFram
     # We want lower scores to indicate higher risk, matching Isolation Forest.
     return total_anomaly_score
 
-# This function is used by analyze_paths.py, won't run directly.
\ No newline at end of file
+def node_score_vector(anomaly_results_df: pd.DataFrame, num_nodes: int) -> np.ndarray:
+    """
+    Turns the anomaly results into a dense per-node score array for path search.
+
+    Nodes without a result get 0, the same neutral contribution score_path gives them.
+
+    Args:
+        anomaly_results_df (pd.DataFrame): DataFrame containing 'node_index' and 'anomaly_score'.
+        num_nodes (int): Number of nodes in the graph.
+
+    Returns:
+        np.ndarray: float64 array where entry i is the anomaly score of node i.
+    """
+    scores = np.zeros(num_nodes, dtype=np.float64)
+    scores[anomaly_results_df['node_index'].to_numpy(dtype=np.int64)] = anomaly_results_df['anomaly_score'].to_numpy(dtype=np.float64)
+    return scores
+
+# Fills the unused tail of rows in a padded path array. It indexes the extra 0
+# appended by pad_scores, so padding never changes a path's score.
+PATH_PAD = -1
+
+
+def pad_scores(node_scores: np.ndarray) -> np.ndarray:
+    """Returns node_scores with a trailing 0 for PATH_PAD to index."""
+    return np.append(np.asarray(node_scores, dtype=np.float64), 0.0)
+
+
+def pad_paths(paths: list, max_path_length: int) -> np.ndarray:
+    """
+    Packs variable-length paths into one [num_paths, max_path_length] int64 array.
+
+    Rows shorter than max_path_length are filled with PATH_PAD.
+    """
+    padded = np.full((len(paths), max_path_length), PATH_PAD, dtype=np.int64)
+    lengths = np.fromiter(map(len, paths), dtype=np.int64, count=len(paths))
+    flat = np.fromiter(itertools.chain.from_iterable(paths), dtype=np.int64, count=int(lengths.sum()))
+    rows = np.repeat(np.arange(len(paths)), lengths)
+    columns = np.arange(len(flat)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    padded[rows, columns] = flat
+    return padded
+
+
+def path_edge_costs(padded_paths: np.ndarray, adjacency) -> np.ndarray:
+    """
+    Looks up the cost of every hop of every padded path.
+
+    Args:
+        padded_paths (np.ndarray): [num_paths, max_path_length] output of pad_paths.
+        adjacency (CSRGraph): Deduplicated adjacency whose edge_weights hold the hop costs.
+
+    Returns:
+        np.ndarray: [num_paths, max_path_length - 1] costs, 0 for padded hops.
+    """
+    sources, targets = padded_paths[:, :-1], padded_paths[:, 1:]
+    hops = targets != PATH_PAD
+    costs = np.zeros(sources.shape, dtype=np.float64)
+    costs[hops] = adjacency.edge_weights[adjacency.edge_positions(sources[hops], targets[hops])]
+    return costs
+
+
+def score_paths(padded_paths: np.ndarray, padded_scores: np.ndarray, edge_costs: np.ndarray = None) -> np.ndarray:
+    """
+    Scores a batch of paths at once: the sum of the node anomaly scores of each path,
+    plus the cost of each hop when edge_costs is given.
+
+    Gathers one column of node scores at a time and adds it to the running
+    totals, so every path is summed left to right (node, hop, node, ...), the
+    same order as the top-K search uses.
+
+    Args:
+        padded_paths (np.ndarray): [num_paths, max_path_length] output of pad_paths.
+        padded_scores (np.ndarray): Output of pad_scores(node_score_vector(...)).
+        edge_costs (np.ndarray, optional): Output of path_edge_costs for the same paths.
+
+    Returns:
+        np.ndarray: float64 score per path (lower score = higher risk).
+    """
+    totals = np.zeros(len(padded_paths), dtype=np.float64)
+    for position, column in enumerate(padded_paths.T):
+        if edge_costs is not None and position > 0:
+            totals += edge_costs[:, position - 1]
+        totals += padded_scores[column]
+    return totals
+
+# These functions are used by analyze_paths.py, won't run directly.
\ No newline at end of file
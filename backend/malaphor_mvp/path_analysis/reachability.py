@@ -0,0 +1,90 @@
+# path_analysis/reachability.py
+
+import hashlib
+
+import numpy as np
+
+from ..utils.csr_graph import CSRGraph
+from ..utils.derived_cache import cached_derived
+
+
+class ReachabilityIndex:
+    """
+    Bounded-hop distance labels telling the path search where no end node is reachable.
+
+    hops_to_end[v] is the fewest hops (at least one) from node v to any end
+    node, or max_hops + 1 if that takes more than max_hops. It comes from one
+    reverse multi-source BFS from all end nodes at once, over the same
+    adjacency the search walks.
+
+    The path engine searches from all start nodes to all end nodes at once, so
+    one label per node answers the question it asks: can a partial path at v
+    with r hops left still reach an end node? If hops_to_end[v] > r it cannot,
+    in O(1). Start nodes with no end node within max_hops are dropped up
+    front, and the search never enters nodes outside the relevant subgraph.
+    BFS distances ignore the simple-path constraint, so they never
+    overestimate and pruning with them is exact.
+
+    Args:
+        adjacency (CSRGraph): Out-neighbor adjacency the search traverses.
+        end_mask (np.ndarray): Boolean mask of end nodes.
+        max_hops (int): Longest path considered, in hops.
+    """
+
+    def __init__(self, adjacency, end_mask, max_hops):
+        self.max_hops = max_hops
+        self.unreachable = max_hops + 1
+        distance = self._distance_to_end(adjacency, end_mask, max_hops)
+
+        # One hop to an out-neighbor, then that neighbor's distance (0 if it is an end node)
+        hops_to_end = np.full(adjacency.num_nodes, self.unreachable, dtype=np.int16)
+        degree = adjacency.degree()
+        nonempty = np.flatnonzero(degree)
+        if len(nonempty):
+            nearest = np.minimum.reduceat(distance[adjacency.indices], adjacency.indptr[nonempty])
+            hops_to_end[nonempty] = np.minimum(nearest + 1, self.unreachable)
+        self.hops_to_end = hops_to_end
+
+    def _distance_to_end(self, adjacency, end_mask, max_hops):
+        """Reverse BFS from all end nodes: hops from each node to its nearest end node (0 for ends)."""
+        num_nodes = adjacency.num_nodes
+        sources = np.repeat(np.arange(num_nodes), adjacency.degree())
+        in_adjacency = CSRGraph.from_edge_index(np.stack([sources, adjacency.indices]), num_nodes, transpose=True)
+
+        distance = np.full(num_nodes, self.unreachable, dtype=np.int16)
+        frontier = np.flatnonzero(end_mask)
+        distance[frontier] = 0
+        for hops in range(1, max_hops):
+            # Intermediate nodes are at most max_hops - 1 hops from an end; farther distances aren't needed
+            positions, _ = in_adjacency.positions(frontier)
+            predecessors = in_adjacency.indices[positions]
+            frontier = np.unique(predecessors[distance[predecessors] == self.unreachable])
+            if len(frontier) == 0:
+                break
+            distance[frontier] = hops
+        return distance
+
+    def useful_starts(self, start_nodes):
+        """Start nodes that have an end node within max_hops hops."""
+        start_nodes = np.asarray(start_nodes, dtype=np.int64)
+        return start_nodes[self.hops_to_end[start_nodes] <= self.max_hops]
+
+    def can_reach_end(self, node, hops_left):
+        """O(1): can a path at `node` reach an end node within `hops_left` more hops?"""
+        return self.hops_to_end[node] <= hops_left
+
+    def relevant_node_count(self):
+        """Number of nodes that can be on a path to an end node within max_hops."""
+        return int((self.hops_to_end <= self.max_hops).sum())
+
+
+def reachability_index(data, adjacency_key, adjacency, end_mask, max_hops):
+    """
+    Returns the ReachabilityIndex for this graph, adjacency and end set, cached with the graph.
+
+    The cache entry is keyed by the adjacency (see analyze_paths), a digest of
+    the end mask and max_hops, and is dropped when the graph version changes.
+    """
+    end_digest = hashlib.sha1(np.packbits(end_mask).tobytes()).hexdigest()
+    return cached_derived(data, ('reachability', adjacency_key, end_digest, max_hops),
+                          lambda: ReachabilityIndex(adjacency, end_mask, max_hops))
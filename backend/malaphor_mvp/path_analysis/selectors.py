@@ -0,0 +1,104 @@
+# path_analysis/selectors.py
+
+import re
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from ..utils.derived_cache import cached_derived, node_id_array, node_type_codes
+
+
+@dataclass(frozen=True)
+class NodeSelector:
+    """
+    Describes which nodes path analysis may start or end at.
+
+    A node matches if it satisfies ANY of the identity rules (types,
+    type_contains, id_prefixes, id_contains, id_regex), or every node does when
+    no identity rule is set, AND its anomaly score is at most max_anomaly_score
+    when that is set.
+
+    Selectors compile into boolean masks over the node arrays with vectorized
+    string operations. The identity part depends only on the graph, so it is
+    cached per graph; the anomaly threshold is applied on top for each run.
+
+    Args:
+        types (frozenset[str]): Exact node types.
+        type_contains (tuple[str]): Substrings of the node type.
+        id_prefixes (tuple[str]): Prefixes of the original node ID.
+        id_contains (tuple[str]): Substrings of the original node ID.
+        id_regex (str): Regular expression searched for in the original node ID.
+        max_anomaly_score (float): Only nodes at least this anomalous (score <= threshold).
+    """
+    types: frozenset = frozenset()
+    type_contains: tuple = ()
+    id_prefixes: tuple = ()
+    id_contains: tuple = ()
+    id_regex: str = None
+    max_anomaly_score: float = None
+
+    def __post_init__(self):
+        # Normalize so that equal selectors hash equal (they are cache keys)
+        object.__setattr__(self, 'types', frozenset(self.types))
+        for name in ('type_contains', 'id_prefixes', 'id_contains'):
+            object.__setattr__(self, name, tuple(getattr(self, name)))
+        if self.id_regex is not None:
+            re.compile(self.id_regex) # Fail early on an invalid pattern
+
+    def _has_identity_rules(self):
+        return bool(self.types or self.type_contains or self.id_prefixes or self.id_contains or self.id_regex)
+
+    def _identity_mask(self, data):
+        """Boolean mask of nodes matching the identity rules (graph-only, uncached)."""
+        if not self._has_identity_rules():
+            return np.ones(data.num_nodes, dtype=bool)
+
+        # Type rules are evaluated once per distinct type, then spread to nodes by type code
+        unique_types = [str(t) for t in data.unique_types]
+        type_matches = np.array([
+            node_type in self.types or any(part in node_type for part in self.type_contains)
+            for node_type in unique_types
+        ], dtype=bool)
+        mask = type_matches[node_type_codes(data)] if type_matches.any() else np.zeros(data.num_nodes, dtype=bool)
+
+        if self.id_prefixes or self.id_contains or self.id_regex:
+            ids = pd.Series(node_id_array(data)).astype(str)
+            if self.id_prefixes:
+                mask |= ids.str.startswith(self.id_prefixes).to_numpy()
+            for part in self.id_contains:
+                mask |= ids.str.contains(part, regex=False).to_numpy()
+            if self.id_regex:
+                mask |= ids.str.contains(self.id_regex, regex=True).to_numpy()
+        return mask
+
+    def mask(self, data, node_scores=None):
+        """
+        Evaluates the selector over all nodes of `data`.
+
+        Args:
+            data (torch_geometric.data.Data): The graph.
+            node_scores (np.ndarray, optional): Anomaly score per node; required when
+                                                max_anomaly_score is set.
+
+        Returns:
+            np.ndarray: Boolean mask over node indices.
+        """
+        mask = cached_derived(data, ('node_selector', self), lambda: self._identity_mask(data))
+        mask.flags.writeable = False # Shared through the cache
+        if self.max_anomaly_score is not None:
+            if node_scores is None:
+                raise ValueError("max_anomaly_score needs node anomaly scores.")
+            mask = mask & (np.asarray(node_scores) <= self.max_anomaly_score)
+        return mask
+
+    def select(self, data, node_scores=None):
+        """Returns the sorted indices of matching nodes (see mask)."""
+        return np.flatnonzero(self.mask(data, node_scores))
+
+
+# The MVP's rules for simulated data
+# Users, or potentially external-facing/compromised VMs
+DEFAULT_START_SELECTOR = NodeSelector(type_contains=('user',), id_contains=('vm_z',))
+# Databases, S3, Security Groups (high value/impact)
+DEFAULT_END_SELECTOR = NodeSelector(type_contains=('db', 'sg'), id_contains=('s3',))
@@ -0,0 +1,102 @@
+# path_analysis/topk_search.py
+
+import bisect
+import heapq
+import itertools
+
+import numpy as np
+
+
+def _score_slack(value):
+    # Partial sums and bounds are accumulated in a different order than final
+    # scores; never prune on a difference smaller than float rounding.
+    return 1e-9 * max(1.0, abs(value))
+
+
+def top_k_risky_paths(successors, start_nodes, end_mask, node_scores, k, max_path_length,
+                      edge_costs=None, min_edge_cost=0.0, hops_to_end=None):
+    """
+    Finds the k lowest-scoring (riskiest) simple paths from any start node to any end node.
+
+    A path's score is the sum of its nodes' anomaly scores (plus its hop costs,
+    when edge_costs is given), added left to right exactly like score_paths. Instead of enumerating every path for every
+    (start, end) pair, the search expands partial paths from all start nodes
+    together in best-first order of an admissible lower bound on their best
+    completion, and keeps a bounded list of the k best complete paths. As soon as the most promising open partial path cannot beat
+    the current k-th best, the search stops.
+
+    The lower bound for a partial path with `r` hops left is
+    partial_score + min_end_score + min_cost + (r - 1) * min(0, min_node_score + min_cost):
+    a completion adds at least one hop into an end node, plus further hops
+    through intermediate nodes that can only lower the score if they are negative.
+
+    Ties are broken by the node-index sequence, so the result is identical to
+    sorting all enumerated paths by (score, path).
+
+    Args:
+        successors (callable): successors(node) -> iterable of out-neighbor indices.
+        start_nodes (iterable[int]): Candidate start node indices.
+        end_mask (np.ndarray): Boolean mask over nodes marking valid end nodes.
+        node_scores (np.ndarray): Anomaly score per node index (lower = more anomalous).
+        k (int): Number of paths to return.
+        max_path_length (int): Maximum number of nodes in a path (edges = nodes - 1).
+        edge_costs (callable, optional): edge_costs(node) -> hop costs aligned with successors(node).
+        min_edge_cost (float): Lower bound on every hop cost (the smallest edge weight).
+        hops_to_end (np.ndarray, optional): ReachabilityIndex.hops_to_end; partial paths
+                                            that can't reach an end node in time are dropped.
+
+    Returns:
+        list: Up to k (score, path_indices) tuples sorted by (score, path_indices).
+    """
+    max_hops = max_path_length - 1
+    if k <= 0 or max_hops < 1 or not end_mask.any():
+        return []
+
+    node_scores = np.asarray(node_scores, dtype=np.float64)
+    min_cost = float(min_edge_cost) if edge_costs is not None else 0.0
+    min_step = min(0.0, float(node_scores.min()) + min_cost)
+    min_end = float(node_scores[end_mask].min()) + min_cost
+    no_costs = itertools.repeat(0.0)
+    score_list = node_scores.tolist() # Python floats: fast scalar access in the hot loop
+    end_list = end_mask.tolist()
+    # Without an index every node counts as 1 hop from an end node, which never prunes
+    hops_to_end = hops_to_end.tolist() if hops_to_end is not None else [1] * len(score_list)
+
+    def lower_bound(partial, hops_used):
+        return partial + min_end + (max_hops - hops_used - 1) * min_step
+
+    best = [] # Sorted (score, path) of the k best complete paths found so far
+    frontier = []
+    counter = 0 # Heap tie-breaker; avoids comparing paths
+    for start in dict.fromkeys(start_nodes):
+        partial = 0.0 + score_list[start]
+        heapq.heappush(frontier, (lower_bound(partial, 0), counter, partial, (start,)))
+        counter += 1
+
+    while frontier:
+        bound, _, partial, path = heapq.heappop(frontier)
+        if len(best) == k and bound > best[-1][0] + _score_slack(best[-1][0]):
+            break # Nothing left in the frontier can enter the top k
+
+        hops_used = len(path) - 1
+        node = path[-1]
+        hop_costs = no_costs if edge_costs is None else edge_costs(node)
+        for neighbor, hop_cost in zip(successors(node), hop_costs):
+            if neighbor in path:
+                continue # Simple paths only
+            extended_score = partial + hop_cost + score_list[neighbor]
+            extended_path = path + (neighbor,)
+
+            if end_list[neighbor]:
+                candidate = (extended_score, extended_path)
+                if len(best) < k or candidate < best[-1]:
+                    bisect.insort(best, candidate)
+                    del best[k:]
+
+            if hops_used + 1 < max_hops and hops_to_end[neighbor] <= max_hops - hops_used - 1:
+                extended_bound = lower_bound(extended_score, hops_used + 1)
+                if len(best) < k or extended_bound <= best[-1][0] + _score_slack(best[-1][0]):
+                    heapq.heappush(frontier, (extended_bound, counter, extended_score, extended_path))
+                    counter += 1
+
+    return [(score, list(path)) for score, path in best]
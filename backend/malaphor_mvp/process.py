@@ -1,150 +1,254 @@
 # backend/malaphor_core/process.py
 
 import os
+from contextlib import contextmanager
 import pandas as pd
 import torch
 
 # Import your existing modules (assuming they are in malaphor_core)
 from .data_processing.generate_simulated_data import generate_data
 from .data_processing.build_graph import build_graph
-from .training.train import train_graphsage
-from .anomaly_detection.detect_anomalies import detect_anomalies
+from .training.train import train_graphsage, embed_nodes
+from .training.convergence import ConvergenceController
+from .model.cpu_perf import sparse_adjacency
+from .model.registry import align_type_codes, load_model_bundle, save_model_bundle
+from .anomaly_detection.detect_anomalies import detect_anomalies, fit_detector
 from .path_analysis.analyze_paths import analyze_paths
+from .utils.payload import build_payload
+from .utils.instrumentation import Instrumentation
 
 # Ensure a data directory exists if generating simulated data
 if not os.path.exists('backend/malaphor_core/data'):
     os.makedirs('backend/malaphor_core/data')
 
-def run_full_pipeline(csv_filepath):
+# How run_full_pipeline obtains the GraphSAGE model:
+#   'train'     - train from scratch (saved to model_path with save_model=True)
+#   'inference' - embed with the saved model at model_path, no training
+#   'finetune'  - warm-start from the saved model for a few epochs (saved back with save_model=True)
+MODEL_MODES = ('train', 'inference', 'finetune')
+
+# Stages run_full_pipeline reports to its progress_callback, in order
+PIPELINE_STAGES = ('build_graph', 'train', 'detect_anomalies', 'analyze_paths', 'build_payload')
+
+def run_full_pipeline(csv_filepath, chunksize=None, graph_cache_dir=None, train_batch_size=None,
+                      model_path=None, model_mode='train', finetune_epochs=10,
+                      early_stopping=True, train_time_budget=None, use_sparse_adjacency=True,
+                      path_workers=1, allowed_relationships=None, relationship_weights=None,
+                      start_selector=None, end_selector=None, payload_format='records',
+                      progress_callback=None, epochs=150, contamination=0.2, max_path_length=4,
+                      content_hash=None, instrumentation=None, anomaly_workers=1, hidden_channels=64,
+                      out_channels=32, save_model=False):
     """
     Runs the full Malaphor MVP pipeline on a given CSV file.
 
     Args:
         csv_filepath (str): Path to the input CSV file.
+        chunksize (int, optional): Stream the CSV in chunks of this many rows
+                                   (bounded memory, see build_graph_streaming).
+        graph_cache_dir (str, optional): Reuse graphs built from identical files
+                                         (see build_graph's cache_dir).
+        train_batch_size (int, optional): Train GraphSAGE on neighbor-sampled mini-batches
+                                          of this many nodes instead of full-batch.
+        model_path (str, optional): Model bundle to load from ('inference' / 'finetune') and,
+                                    with save_model, to save to ('train' / 'finetune').
+        model_mode (str): One of MODEL_MODES.
+        finetune_epochs (int): Epochs of warm-start training in 'finetune' mode.
+        early_stopping (bool): Stop training once the reconstruction loss plateaus
+                               instead of always running the full epoch budget.
+        train_time_budget (float, optional): Wall-clock limit for training, in seconds.
+        use_sparse_adjacency (bool): Aggregate over a precomputed sparse CSR adjacency in
+                                     full-batch training/inference (same results, faster on CPU).
+        path_workers (int): Worker processes for the path search (start nodes are sharded across them).
+        allowed_relationships (iterable[str], optional): Only follow edges of these relationship types
+                                                         when searching for paths.
+        relationship_weights (dict, optional): Cost added per hop by relationship type (see analyze_paths).
+        start_selector (NodeSelector, optional): Which nodes attack paths may start at.
+        end_selector (NodeSelector, optional): Which nodes attack paths may end at.
+        payload_format (str): 'records' (one object per node / edge) or the compact
+                              'columnar' layout (see utils.payload.build_columnar_payload).
+        progress_callback (callable, optional): Called as progress_callback(stage, fraction) when
+                                                each of PIPELINE_STAGES starts (fraction 0.0) and
+                                                after each training epoch. An exception raised by
+                                                it aborts the run (used to cancel jobs).
+        epochs (int): Maximum GraphSAGE training epochs in 'train' mode.
+        contamination (float): Expected share of anomalous nodes, used when an IsolationForest is
+                               fitted ('train' / 'finetune', or a saved bundle without a detector).
+                               'inference' with a saved detector scores against that detector's
+                               threshold and ignores it.
+        max_path_length (int): Longest risky path considered, in hops (see analyze_paths).
+        content_hash (str, optional): sha256 of the CSV if already known (skips rehashing it
+                                      for the graph cache).
+        instrumentation (Instrumentation, optional): Receives a timed span per stage (with
+                                                     sub-spans for path analysis) and counters
+                                                     (nodes, edges, epochs_run, paths, ...).
+                                                     Read its report() after the run.
+        anomaly_workers (int): Threads scoring embeddings with the Isolation Forest.
+        hidden_channels (int): GraphSAGE hidden layer size in 'train' mode (a saved model keeps its own).
+        out_channels (int): Embedding size in 'train' mode (a saved model keeps its own).
+        save_model (bool): Save the trained / fine-tuned model and its detector to model_path.
+                           Off by default, so a run never replaces the model other runs rely on.
 
     Returns:
         dict: A dictionary containing graph data (nodes, edges) and risky paths
               ready for JSON serialization and frontend use.
     """
     print(f"--- Running Malaphor Pipeline on {csv_filepath} ---")
+    metrics = instrumentation or Instrumentation()
+
+    def report(stage, fraction=0.0):
+        if progress_callback is not None:
+            progress_callback(stage, fraction)
+
+    @contextmanager
+    def stage(name):
+        # Progress report and timed span for one of PIPELINE_STAGES
+        report(name)
+        with metrics.span(name):
+            yield
+
+    def on_epoch(epoch, epochs):
+        metrics.count('epochs_run')
+        report('train', epoch / epochs)
 
     # 1. Build Graph
     # build_graph needs to return more than just the PyG Data object now.
     # It needs to return enough info to reconstruct nodes and edges for the frontend
     # with their original IDs and types.
     # Let's modify build_graph to return (pyg_data, node_list_for_frontend, edge_list_for_frontend)
-    try:
-        pyg_data, all_entities_df, edges_df = build_graph(csv_filepath)
-    except FileNotFoundError:
-         # If using simulated data initially and file doesn't exist
-         if "simulated_cloud_data.csv" in csv_filepath:
-              print("Simulated data not found, generating...")
-              generate_data(csv_filepath) # Assuming generate_data takes filepath
-              pyg_data, all_entities_df, edges_df = build_graph(csv_filepath)
-         else:
-             raise # Re-raise if it's not the simulated data case
+    with stage('build_graph'):
+        try:
+            pyg_data, all_entities_df, edges_df = build_graph(csv_filepath, chunksize=chunksize, cache_dir=graph_cache_dir,
+                                                              content_hash=content_hash)
+        except FileNotFoundError:
+             # If using simulated data initially and file doesn't exist
+             if "simulated_cloud_data.csv" in csv_filepath:
+                  print("Simulated data not found, generating...")
+                  generate_data(csv_filepath) # Assuming generate_data takes filepath
+                  pyg_data, all_entities_df, edges_df = build_graph(csv_filepath, chunksize=chunksize, cache_dir=graph_cache_dir)
+             else:
+                 raise # Re-raise if it's not the simulated data case
 
     print("Graph built.")
+    metrics.set_counter('nodes', pyg_data.num_nodes)
+    metrics.set_counter('edges', pyg_data.num_edges)
+
+    # 2. Train GraphSAGE (or reuse a saved one)
+    if model_mode not in MODEL_MODES:
+        raise ValueError(f"model_mode must be one of {MODEL_MODES}, got {model_mode!r}")
+    if model_mode != 'train' and not model_path:
+        raise ValueError(f"model_mode={model_mode!r} needs a model_path")
+    if save_model and not model_path:
+        raise ValueError("save_model=True needs a model_path")
 
-    # 2. Train GraphSAGE
-    print("Training GraphSAGE model...")
-    epochs = 150
     lr = 0.005
-    hidden_channels = 64
-    out_channels = 32
 
-    _, node_embeddings = train_graphsage(
-        data=pyg_data,
-        epochs=epochs,
-        lr=lr,
-        hidden_channels=hidden_channels,
-        out_channels=out_channels
-    )
-    print("GraphSAGE training finished.")
+    convergence = None
+    if early_stopping or train_time_budget:
+        convergence = ConvergenceController(
+            patience=10 if early_stopping else epochs,
+            min_rel_improvement=1e-3,
+            time_budget=train_time_budget
+        )
+
+    with stage('train'):
+        detector = None
+        if model_mode == 'train':
+            print("Training GraphSAGE model...")
+            model, node_embeddings = train_graphsage(
+                data=pyg_data,
+                epochs=epochs,
+                lr=lr,
+                hidden_channels=hidden_channels,
+                out_channels=out_channels,
+                batch_size=train_batch_size,
+                early_stopping=convergence,
+                use_sparse_adjacency=use_sparse_adjacency,
+                epoch_callback=on_epoch
+            )
+            print("GraphSAGE training finished.")
+        else:
+            print(f"Loading saved GraphSAGE model from {model_path} ({model_mode})...")
+            bundle = load_model_bundle(model_path)
+            # Express this snapshot's type codes the way the model was trained on them
+            align_type_codes(pyg_data, bundle['type_vocabulary'])
+            if model_mode == 'inference':
+                detector = bundle['detector'] # Score against the saved baseline (None: fit one below)
+                saved_contamination = getattr(detector, 'contamination', contamination)
+                if saved_contamination != contamination:
+                    print(f"Note: scoring with the saved detector (contamination={saved_contamination}); "
+                          f"contamination={contamination} is ignored.")
+
+            model = bundle['model']
+            if model_mode == 'inference':
+                adjacency = sparse_adjacency(pyg_data.edge_index, pyg_data.num_nodes) if use_sparse_adjacency else None
+                node_embeddings = embed_nodes(model, pyg_data, batch_size=train_batch_size, adjacency=adjacency)
+            else:
+                model, node_embeddings = train_graphsage(
+                    data=pyg_data,
+                    epochs=finetune_epochs,
+                    lr=lr,
+                    batch_size=train_batch_size,
+                    model=model,
+                    early_stopping=convergence,
+                    use_sparse_adjacency=use_sparse_adjacency,
+                    epoch_callback=on_epoch
+                )
+            print("GraphSAGE embeddings ready.")
 
 
     # 3. Detect Node Anomalies
-    print("Detecting individual node anomalies...")
-    contamination_rate = 0.2 # This might need tuning or be user-settable
-    anomaly_results_df = detect_anomalies(
-        data=pyg_data,
-        embeddings=node_embeddings,
-        contamination=contamination_rate
-    )
-    print("Node anomaly detection finished.")
+    with stage('detect_anomalies'):
+        print("Detecting individual node anomalies...")
+        if detector is None:
+            detector = fit_detector(node_embeddings, contamination=contamination)
+        anomaly_results_df = detect_anomalies(
+            data=pyg_data,
+            embeddings=node_embeddings,
+            contamination=contamination,
+            detector=detector,
+            n_jobs=anomaly_workers
+        )
+        print("Node anomaly detection finished.")
+
+        # Saved with the model, so inference runs on later snapshots reuse the fitted detector
+        if save_model and model_mode != 'inference':
+            save_model_bundle(model_path, model, pyg_data.unique_types, detector=detector)
+    metrics.set_counter('anomalous_nodes', int((anomaly_results_df['prediction'] == -1).sum()))
 
 
     # 4. Analyze Paths
-    print("Analyzing paths...")
-    max_path_length = 4
-    risky_paths = analyze_paths(
-        pyg_data=pyg_data,
-        anomaly_results_df=anomaly_results_df,
-        max_path_length=max_path_length
-    )
-    print(f"Found {len(risky_paths)} risky paths.")
+    with stage('analyze_paths'):
+        print("Analyzing paths...")
+        risky_paths = analyze_paths(
+            pyg_data=pyg_data,
+            anomaly_results_df=anomaly_results_df,
+            max_path_length=max_path_length,
+            top_k=10, # Only the top 10 are returned to the frontend
+            num_workers=path_workers,
+            allowed_relationships=allowed_relationships,
+            relationship_weights=relationship_weights,
+            start_selector=start_selector,
+            end_selector=end_selector,
+            instrumentation=metrics
+        )
+        print(f"Found {len(risky_paths)} risky paths.")
 
 
     # --- Prepare Data for Frontend ---
-
-    # Nodes: Combine original entity info and anomaly results
-    nodes_for_frontend = []
-    # Ensure anomaly_results_df is indexed by node_index
-    anomaly_results_df = anomaly_results_df.set_index('node_index')
-
-    for i in range(pyg_data.num_nodes):
-         original_id = pyg_data.idx_to_id[i]
-         node_type_int = int(pyg_data.x[i, 0].item())
-         original_type = pyg_data.unique_types[node_type_int]
-
-         # Get anomaly data for this node index
-         anomaly_info = anomaly_results_df.loc[i].to_dict() if i in anomaly_results_df.index else {'anomaly_score': None, 'prediction': None}
-
-         nodes_for_frontend.append({
-             'id': original_id, # Use original ID as Cytoscape node ID
-             'label': original_id, # Label for display
-             'type': original_type,
-             'anomaly_score': anomaly_info.get('anomaly_score'),
-             'prediction': anomaly_info.get('prediction'), # -1 for anomaly
-             'features': pyg_data.x[i].tolist(), # Include raw features if needed
-             'node_index': i # Keep internal index for potential debugging
-         })
-
-    # Edges: Use original IDs
-    edges_for_frontend = []
-    # edges_df returned by build_graph should contain source_id, target_id, relationship_type
-    for _, row in edges_df.iterrows():
-         edges_for_frontend.append({
-             'source': row['source_id'],
-             'target': row['target_id'],
-             'relationship_type': row['relationship_type'] # Add edge type as attribute
-         })
-
-    # Risky Paths: Convert to a JSON-friendly format using original IDs
-    risky_paths_for_frontend = []
-    # risky_paths is a list of (score, path_as_original_ids, path_as_indices)
-    for score, path_ids, path_indices in risky_paths:
-         # Optionally add types to the path nodes for display
-         path_with_types = []
-         for node_id, node_index in zip(path_ids, path_indices):
-             node_type_int = int(pyg_data.x[node_index, 0].item())
-             node_type_str = pyg_data.unique_types[node_type_int]
-             path_with_types.append(f"{node_id} ({node_type_str})")
-
-         risky_paths_for_frontend.append({
-             'score': float(score), # Ensure score is a standard float
-             'path_ids': path_ids,
-             'path_with_types': " -> ".join(path_with_types) # Simple string for display
-         })
-
-
-    results = {
-        'nodes': nodes_for_frontend,
-        'edges': edges_for_frontend,
-        'risky_paths': risky_paths_for_frontend[:10] # Return top N paths
-    }
+    # Nodes combine original entity info and anomaly results, edges use original IDs and
+    # risky paths are converted to a JSON-friendly format; all built column-wise
+    with stage('build_payload'):
+        results = build_payload(
+            pyg_data,
+            anomaly_results_df,
+            edges_df, # edges_df returned by build_graph contains source_id, target_id, relationship_type
+            risky_paths,
+            max_paths=10, # Return top N paths
+            payload_format=payload_format
+        )
 
     print("--- Pipeline Finished ---")
+    metrics.log()
     return results
 
 # No __main__ block here, this file is imported by Flask app
\ No newline at end of file
@@ -0,0 +1,99 @@
+# training/convergence.py
+
+import time
+
+import torch
+
+
+class ConvergenceController:
+    """
+    Decides when to stop training once the reconstruction loss plateaus.
+
+    Training stops when the loss has not improved on the best loss seen so far by
+    at least `min_rel_improvement` (relative) for `patience` epochs, or when
+    `time_budget` seconds have passed. Losses are buffered as detached tensors
+    and only read back every `check_every` epochs in one transfer, so the
+    controller adds no per-epoch sync.
+
+    After training, `report` holds the epochs run, the wall time, the best and
+    final loss, and why training stopped.
+
+    Args:
+        patience (int): Epochs without sufficient improvement before stopping.
+        min_rel_improvement (float): Relative loss decrease that counts as an improvement.
+        time_budget (float, optional): Wall-clock budget in seconds.
+        check_every (int): Epochs between loss read-backs.
+    """
+
+    def __init__(self, patience=10, min_rel_improvement=1e-3, time_budget=None, check_every=5):
+        self.patience = patience
+        self.min_rel_improvement = min_rel_improvement
+        self.time_budget = time_budget
+        self.check_every = max(1, check_every)
+        self.report = None
+
+    def start(self, max_epochs):
+        """Resets the state at the beginning of a training run."""
+        self.max_epochs = max_epochs
+        self.start_time = time.perf_counter()
+        self.best_loss = float('inf')
+        self.last_loss = None
+        self.epochs_run = 0
+        self.epochs_since_improvement = 0
+        self.stop_reason = None
+        self._pending = []
+
+    def _consume(self, losses):
+        for loss in losses:
+            self.last_loss = loss
+            if loss < self.best_loss * (1 - self.min_rel_improvement):
+                self.best_loss = loss
+                self.epochs_since_improvement = 0
+            else:
+                self.epochs_since_improvement += 1
+            if self.epochs_since_improvement >= self.patience:
+                self.stop_reason = 'converged'
+                return
+
+    def step(self, loss):
+        """
+        Records one epoch's loss.
+
+        Args:
+            loss (torch.Tensor): The epoch's (scalar) training loss.
+
+        Returns:
+            bool: True if training should stop after this epoch.
+        """
+        self.epochs_run += 1
+        self._pending.append(loss.detach())
+
+        if self.epochs_run % self.check_every == 0 or self.epochs_run >= self.max_epochs:
+            self._consume(torch.stack(self._pending).tolist())
+            self._pending = []
+
+        if self.stop_reason is None and self.time_budget is not None:
+            if time.perf_counter() - self.start_time >= self.time_budget:
+                self.stop_reason = 'time_budget'
+        if self.stop_reason is None and self.epochs_run >= self.max_epochs:
+            self.stop_reason = 'max_epochs'
+
+        if self.stop_reason is not None:
+            self.finish()
+            return True
+        return False
+
+    def finish(self):
+        """Flushes buffered losses and fills in `report`."""
+        if self._pending:
+            self._consume(torch.stack(self._pending).tolist())
+            self._pending = []
+        self.report = {
+            'epochs_run': self.epochs_run,
+            'max_epochs': self.max_epochs,
+            'seconds': time.perf_counter() - self.start_time,
+            'best_loss': self.best_loss,
+            'final_loss': self.last_loss,
+            'stop_reason': self.stop_reason or 'max_epochs',
+        }
+        return self.report
@@ -0,0 +1,100 @@
+# training/neighbor_sampler.py
+
+import numpy as np
+import torch
+
+
+class NeighborSampler:
+    """
+    Samples fixed fan-out neighborhoods around a batch of seed nodes.
+
+    Used as the collate_fn of a torch DataLoader over node indices, like PyG's
+    NeighborLoader: each batch becomes a small subgraph whose first `batch_size`
+    nodes are the seeds, built from at most fanout[l] in-neighbors per node at
+    hop l. Neighbors of high-degree nodes are drawn with replacement and
+    deduplicated, so a node keeps at most fanout[l] distinct neighbors.
+
+    Args:
+        in_adjacency (CSRGraph): In-neighbor adjacency (CSRGraph.from_edge_index(..., transpose=True)).
+        fanout (list[int]): Neighbors sampled per node for each hop; -1 keeps all of them.
+        seed (int, optional): Seed for the sampling RNG.
+    """
+
+    def __init__(self, in_adjacency, fanout, seed=None):
+        self.adjacency = in_adjacency
+        self.fanout = list(fanout)
+        self.rng = np.random.default_rng(seed)
+        self._worker_seed = None
+        # Scratch global -> local index map, reset after every batch
+        self._local = np.full(in_adjacency.num_nodes, -1, dtype=np.int64)
+
+    def _sample_hop(self, frontier, fanout):
+        """Returns (neighbor, frontier position) pairs for one hop."""
+        adjacency = self.adjacency
+        positions, counts = adjacency.positions(frontier)
+        owners = np.repeat(np.arange(len(frontier)), counts)
+        if fanout < 0 or counts.max(initial=0) <= fanout:
+            return adjacency.indices[positions].astype(np.int64), owners
+
+        keep_all = np.repeat(counts <= fanout, counts)
+        neighbors = [adjacency.indices[positions[keep_all]].astype(np.int64)]
+        owner_parts = [owners[keep_all]]
+
+        large = np.flatnonzero(counts > fanout)
+        draws = adjacency.indptr[frontier[large], None] + (
+            self.rng.random((len(large), fanout)) * counts[large, None]
+        ).astype(np.int64)
+        # A CSR position belongs to exactly one row, so deduplicating positions
+        # deduplicates (node, neighbor-edge) pairs
+        draws, first = np.unique(draws.ravel(), return_index=True)
+        owner_parts.append(np.repeat(large, fanout)[first])
+        neighbors.append(adjacency.indices[draws].astype(np.int64))
+        return np.concatenate(neighbors), np.concatenate(owner_parts)
+
+    def sample(self, seeds):
+        """
+        Builds the sampled subgraph for one batch of seed nodes.
+
+        Returns:
+            tuple: (n_id, edge_index, batch_size) where n_id holds the global index of
+                   every subgraph node (seeds first) and edge_index uses local indices.
+        """
+        seeds = np.asarray(seeds, dtype=np.int64)
+        local = self._local
+        local[seeds] = np.arange(len(seeds))
+        n_id = [seeds]
+        num_local = len(seeds)
+
+        edge_sources, edge_targets = [], []
+        frontier = seeds
+        for fanout in self.fanout:
+            if len(frontier) == 0:
+                break
+            neighbors, owners = self._sample_hop(frontier, fanout)
+
+            new_nodes = np.unique(neighbors[local[neighbors] < 0])
+            local[new_nodes] = np.arange(num_local, num_local + len(new_nodes))
+            num_local += len(new_nodes)
+            n_id.append(new_nodes)
+
+            # Messages flow neighbor -> frontier node
+            edge_sources.append(local[neighbors])
+            edge_targets.append(local[frontier[owners]])
+            frontier = new_nodes
+
+        n_id = np.concatenate(n_id)
+        local[n_id] = -1
+        edge_index = torch.from_numpy(np.stack([
+            np.concatenate(edge_sources) if edge_sources else np.zeros(0, dtype=np.int64),
+            np.concatenate(edge_targets) if edge_targets else np.zeros(0, dtype=np.int64),
+        ]))
+        return torch.from_numpy(n_id), edge_index, len(seeds)
+
+    def __call__(self, seeds):
+        # DataLoader collate_fn: receives a list of node indices. Worker processes start
+        # from a copy of this sampler, so give each worker its own RNG stream.
+        worker_info = torch.utils.data.get_worker_info()
+        if worker_info is not None and self._worker_seed != worker_info.seed:
+            self._worker_seed = worker_info.seed
+            self.rng = np.random.default_rng(worker_info.seed)
+        return self.sample(seeds)
@@ -1,31 +1,91 @@
 import torch
 import torch.nn.functional as F
 from ..model.graphsage_model import GraphSAGE
+from ..model.cpu_perf import compile_model, sparse_adjacency
 from ..data_processing.build_graph import build_graph # Assuming build_graph creates a PyG Data object
+from ..utils.csr_graph import CSRGraph
+from .neighbor_sampler import NeighborSampler
 
-def train_graphsage(data, epochs=50, lr=0.01, hidden_channels=64, out_channels=32):
+DEFAULT_FANOUT = 10 # Neighbors sampled per node and layer in mini-batch mode
+
+
+def embed_nodes(model, data, batch_size=None, adjacency=None):
+    """
+    Computes node embeddings with a trained model, without training.
+
+    Args:
+        model (GraphSAGE): The trained model.
+        data (torch_geometric.data.Data): The graph data.
+        batch_size (int, optional): If set, use layer-wise batched inference with this many
+                                    target nodes per batch (bounded memory).
+        adjacency (torch.Tensor, optional): Precomputed sparse adjacency (see
+                                            model.cpu_perf.sparse_adjacency) used instead
+                                            of data.edge_index for the full-graph pass.
+
+    Returns:
+        torch.Tensor: The node embeddings.
+    """
+    model.eval()
+    if batch_size:
+        in_adjacency = CSRGraph.from_edge_index(data.edge_index, data.num_nodes, transpose=True)
+        return model.inference(data.x, in_adjacency, batch_size=batch_size)
+    with torch.no_grad():
+        return model(data.x, data.edge_index if adjacency is None else adjacency)
+
+
+def train_graphsage(data, epochs=50, lr=0.01, hidden_channels=64, out_channels=32,
+                    batch_size=None, num_neighbors=None, num_workers=0, inference_batch_size=4096,
+                    model=None, early_stopping=None, use_sparse_adjacency=False, compile_forward=False,
+                    epoch_callback=None):
     """
     Trains the GraphSAGE model.
 
+    The reconstruction decoder is kept on the returned model as
+    `model.reconstruction_decoder`, so it is saved with the model and reused
+    when warm-starting.
+
     Args:
         data (torch_geometric.data.Data): The graph data.
         epochs (int): Number of training epochs.
         lr (float): Learning rate.
         hidden_channels (int): Number of hidden units in GNN layers.
         out_channels (int): Dimension of the final node embeddings.
+        batch_size (int, optional): If set, train on neighbor-sampled mini-batches of this many
+                                    seed nodes instead of full-batch, and compute the final
+                                    embeddings with layer-wise batched inference.
+        num_neighbors (list[int], optional): Per-layer fan-out for mini-batch mode
+                                             (default: DEFAULT_FANOUT for every layer).
+        num_workers (int): DataLoader worker processes sampling mini-batches.
+        inference_batch_size (int): Target nodes per batch for the final layer-wise inference.
+        model (GraphSAGE, optional): Previously trained model to fine-tune (warm start) instead
+                                     of starting from random weights. hidden_channels and
+                                     out_channels are then taken from the model.
+        early_stopping (ConvergenceController, optional): Stops training before `epochs` once the
+                                                          loss plateaus or a time budget runs out;
+                                                          its `report` describes the run afterwards.
+        use_sparse_adjacency (bool): Full-batch only. Precompute a sparse CSR adjacency once and
+                                     aggregate with sparse matmuls instead of edge_index
+                                     gather/scatter (same results, faster on CPU).
+        compile_forward (bool): Full-batch only. Run the forward pass through torch.compile.
+        epoch_callback (callable, optional): Called as epoch_callback(epoch, epochs) after each
+                                             epoch (1-based), e.g. to report progress.
 
     Returns:
         torch.nn.Module: The trained GraphSAGE model.
         torch.Tensor: The learned node embeddings.
     """
     in_channels = data.x.size(1) # Number of input features per node
-    model = GraphSAGE(in_channels, hidden_channels, out_channels)
-    optimizer = torch.optim.Adam(model.parameters(), lr=lr)
+    if model is None:
+        model = GraphSAGE(in_channels, hidden_channels, out_channels)
+    optimizer = torch.optim.Adam(model.convs.parameters(), lr=lr)
 
     # Self-supervised training task: Reconstruct node features
     # We'll use a simple linear layer after the GNN to try and reconstruct
     # the original features from the learned embeddings.
-    reconstruction_decoder = torch.nn.Linear(out_channels, in_channels)
+    reconstruction_decoder = getattr(model, 'reconstruction_decoder', None)
+    if reconstruction_decoder is None:
+        reconstruction_decoder = torch.nn.Linear(model.convs[-1].out_channels, in_channels)
+        model.reconstruction_decoder = reconstruction_decoder
     reconstruction_optimizer = torch.optim.Adam(reconstruction_decoder.parameters(), lr=lr)
 
     criterion = torch.nn.MSELoss() # Mean Squared Error for reconstruction
@@ -33,12 +93,25 @@ def train_graphsage(data, epochs=50, lr=0.01, hidden_channels=64, out_channels=3
     model.train()
     reconstruction_decoder.train()
 
+    if batch_size:
+        return _train_minibatch(
+            data, model, reconstruction_decoder, optimizer, reconstruction_optimizer, criterion,
+            epochs, batch_size, num_neighbors or [DEFAULT_FANOUT] * model.num_layers,
+            num_workers, inference_batch_size, early_stopping, epoch_callback,
+        )
+
+    # CPU performance options: aggregate over a precomputed sparse adjacency and/or a compiled forward
+    adjacency = sparse_adjacency(data.edge_index, data.num_nodes) if use_sparse_adjacency else data.edge_index
+    forward = compile_model(model) if compile_forward else model
+
     print("Starting GraphSAGE training...")
+    if early_stopping is not None:
+        early_stopping.start(epochs)
     for epoch in range(epochs):
         optimizer.zero_grad()
         reconstruction_optimizer.zero_grad()
 
-        embeddings = model(data.x, data.edge_index) # Get embeddings
+        embeddings = forward(data.x, adjacency) # Get embeddings
         reconstructed_features = reconstruction_decoder(embeddings) # Try to reconstruct original features
 
         loss = criterion(reconstructed_features, data.x) # Calculate reconstruction loss
@@ -47,14 +120,94 @@ def train_graphsage(data, epochs=50, lr=0.01, hidden_channels=64, out_channels=3
         optimizer.step()
         reconstruction_optimizer.step()
 
+        stop = early_stopping is not None and early_stopping.step(loss)
         if (epoch + 1) % 10 == 0:
-            print(f'Epoch {epoch+1}/{epochs}, Loss: {loss.item():.4f}')
+            _log_epoch(epoch + 1, epochs, loss, early_stopping)
+        if epoch_callback is not None:
+            epoch_callback(epoch + 1, epochs)
 
-    print("Training finished.")
-    model.eval() # Set model to evaluation mode
-    reconstruction_decoder.eval() # Decoder too
-    with torch.no_grad():
-        final_embeddings = model(data.x, data.edge_index) # Get final embeddings after training
+        if stop:
+            break
+
+    _print_training_summary(early_stopping)
+    # Final embeddings after training (embed_nodes also sets eval mode, decoder included)
+    final_embeddings = embed_nodes(model, data, adjacency=adjacency)
+
+    return model, final_embeddings
+
+
+def _log_epoch(epoch, epochs, loss, early_stopping):
+    # With early stopping, print the loss the controller last read back rather than
+    # forcing another sync with loss.item()
+    value = loss.item() if early_stopping is None else early_stopping.last_loss
+    if value is not None:
+        print(f'Epoch {epoch}/{epochs}, Loss: {value:.4f}')
+
+
+def _print_training_summary(early_stopping):
+    if early_stopping is None or early_stopping.report is None:
+        print("Training finished.")
+        return
+    report = early_stopping.report
+    print(f"Training finished after {report['epochs_run']}/{report['max_epochs']} epochs "
+          f"in {report['seconds']:.2f}s ({report['stop_reason']}, best loss {report['best_loss']:.4f}).")
+
+
+def _train_minibatch(data, model, reconstruction_decoder, optimizer, reconstruction_optimizer, criterion,
+                     epochs, batch_size, num_neighbors, num_workers, inference_batch_size, early_stopping,
+                     epoch_callback=None):
+    """
+    Same reconstruction objective as full-batch training, on sampled subgraphs.
+
+    Each step runs the model on the sampled neighborhood of `batch_size` seed nodes
+    and reconstructs the seeds' features, so memory scales with the batch and the
+    fan-out rather than with the whole graph.
+    """
+    if len(num_neighbors) != model.num_layers:
+        raise ValueError(f"num_neighbors needs one fan-out per layer ({model.num_layers}), got {num_neighbors}")
+
+    in_adjacency = CSRGraph.from_edge_index(data.edge_index, data.num_nodes, transpose=True)
+    sampler = NeighborSampler(in_adjacency, num_neighbors)
+    loader = torch.utils.data.DataLoader(
+        range(data.num_nodes),
+        batch_size=batch_size,
+        shuffle=True,
+        collate_fn=sampler,
+        num_workers=num_workers,
+        persistent_workers=num_workers > 0,
+    )
+
+    print(f"Starting GraphSAGE mini-batch training (batch_size={batch_size}, fan-out={num_neighbors})...")
+    if early_stopping is not None:
+        early_stopping.start(epochs)
+    for epoch in range(epochs):
+        total_loss = torch.zeros(())
+        for n_id, edge_index, num_seeds in loader:
+            optimizer.zero_grad()
+            reconstruction_optimizer.zero_grad()
+
+            x_sub = data.x[n_id]
+            embeddings = model(x_sub, edge_index)[:num_seeds]
+            loss = criterion(reconstruction_decoder(embeddings), x_sub[:num_seeds])
+
+            loss.backward()
+            optimizer.step()
+            reconstruction_optimizer.step()
+            total_loss += loss.detach() * num_seeds
+
+        epoch_loss = total_loss / data.num_nodes
+        stop = early_stopping is not None and early_stopping.step(epoch_loss)
+        if (epoch + 1) % 10 == 0:
+            _log_epoch(epoch + 1, epochs, epoch_loss, early_stopping)
+        if epoch_callback is not None:
+            epoch_callback(epoch + 1, epochs)
+
+        if stop:
+            break
+
+    _print_training_summary(early_stopping)
+    model.eval()
+    final_embeddings = model.inference(data.x, in_adjacency, batch_size=inference_batch_size)
 
     return model, final_embeddings
 
@@ -0,0 +1,166 @@
+# utils/csr_graph.py
+
+import networkx as nx
+import numpy as np
+import torch
+
+
+def _as_numpy(array):
+    # Tensor.numpy() shares memory with the tensor, so no copy is made
+    return array.numpy() if isinstance(array, torch.Tensor) else np.asarray(array)
+
+
+class CSRGraph:
+    """
+    Compressed sparse row adjacency built from a PyG edge_index.
+
+    Row `u` lists the neighbors of node `u` in indices[indptr[u]:indptr[u + 1]].
+    By default rows are edge sources (out-neighbors); with transpose=True rows
+    are edge targets and list in-neighbors, which is what message passing
+    aggregates over. edge_ids maps each CSR entry back to its column in edge_index;
+    edge_types and edge_weights (optional) hold each entry's edge type and cost.
+
+    Path analysis traverses this directly; use to_networkx only when a NetworkX
+    graph is really needed.
+    """
+
+    def __init__(self, indptr, indices, num_nodes, edge_ids=None, edge_types=None, edge_weights=None):
+        self.indptr = indptr
+        self.indices = indices
+        self.num_nodes = num_nodes
+        self.edge_ids = edge_ids
+        self.edge_types = edge_types
+        self.edge_weights = edge_weights
+        self._entry_keys = None # row * num_nodes + neighbor per entry, built by edge_positions
+
+    @classmethod
+    def from_edge_index(cls, edge_index, num_nodes, transpose=False, edge_types=None, edge_weights=None,
+                        dedupe=False):
+        """
+        Builds the CSR arrays with one stable sort over the edges.
+
+        edge_index is read through a zero-copy NumPy view of the tensor; only
+        the sorted CSR arrays are allocated.
+
+        Args:
+            edge_index (torch.Tensor): [2, num_edges] tensor of (source, target) indices.
+            num_nodes (int): Number of nodes.
+            transpose (bool): Index rows by target (in-neighbors) instead of source.
+            edge_types (torch.Tensor or np.ndarray, optional): Integer type per edge.
+            edge_weights (np.ndarray, optional): Cost per edge.
+            dedupe (bool): Keep one entry per (row, neighbor) pair, like nx.DiGraph.
+                           Rows are then sorted by neighbor, and of parallel edges the
+                           one with the lowest weight (else the first) is kept.
+
+        Returns:
+            CSRGraph: indptr (int32 unless there are more than 2**31 - 1 edges),
+                      int32 indices, int64 edge_ids and the edge types / weights in CSR order.
+        """
+        edge_index = _as_numpy(edge_index)
+        rows, cols = (edge_index[1], edge_index[0]) if transpose else (edge_index[0], edge_index[1])
+        if edge_weights is not None:
+            edge_weights = _as_numpy(edge_weights)
+
+        if dedupe:
+            # Sort by (row, neighbor, weight) and keep the first entry of every run;
+            # lexsort is stable, so equal weights keep edge_index order
+            sort_keys = (cols, rows) if edge_weights is None else (edge_weights, cols, rows)
+            edge_ids = np.lexsort(sort_keys)
+            sorted_rows, sorted_cols = rows[edge_ids], cols[edge_ids]
+            keep = np.ones(len(edge_ids), dtype=bool)
+            keep[1:] = (sorted_rows[1:] != sorted_rows[:-1]) | (sorted_cols[1:] != sorted_cols[:-1])
+            edge_ids = edge_ids[keep]
+        else:
+            edge_ids = np.argsort(rows, kind='stable')
+
+        index_dtype = np.int32 if len(edge_ids) <= np.iinfo(np.int32).max else np.int64
+        indptr = np.zeros(num_nodes + 1, dtype=index_dtype)
+        np.cumsum(np.bincount(rows[edge_ids], minlength=num_nodes), out=indptr[1:])
+        indices = cols[edge_ids].astype(np.int32)
+        if edge_types is not None:
+            edge_types = _as_numpy(edge_types)[edge_ids]
+        if edge_weights is not None:
+            edge_weights = edge_weights[edge_ids]
+        return cls(indptr, indices, num_nodes, edge_ids=edge_ids, edge_types=edge_types, edge_weights=edge_weights)
+
+    @property
+    def num_edges(self):
+        return len(self.indices)
+
+    def degree(self, nodes=None):
+        """Row lengths, for all nodes or for the given node array."""
+        if nodes is None:
+            return np.diff(self.indptr)
+        return self.indptr[nodes + 1] - self.indptr[nodes]
+
+    def neighbors(self, node):
+        """Neighbors of a single node (a view, no copy)."""
+        return self.indices[self.indptr[node]:self.indptr[node + 1]]
+
+    def successor_function(self):
+        """
+        Returns successors(node) -> list of neighbor indices, for Python-level traversal.
+
+        Slicing plain lists is much faster than indexing NumPy arrays one node at
+        a time, so the arrays are converted once per graph.
+        """
+        indptr = self.indptr.tolist()
+        indices = self.indices.tolist()
+        return lambda node: indices[indptr[node]:indptr[node + 1]]
+
+    def weight_function(self):
+        """Returns weights(node) -> list of edge weights aligned with successor_function()(node)."""
+        indptr = self.indptr.tolist()
+        weights = self.edge_weights.tolist()
+        return lambda node: weights[indptr[node]:indptr[node + 1]]
+
+    def edge_positions(self, rows, cols):
+        """
+        Finds the CSR position of each (rows[i], cols[i]) entry.
+
+        Requires a graph built with dedupe=True (rows sorted by neighbor); every
+        queried pair must exist.
+        """
+        if self._entry_keys is None:
+            entry_rows = np.repeat(np.arange(self.num_nodes, dtype=np.int64), np.diff(self.indptr))
+            self._entry_keys = entry_rows * self.num_nodes + self.indices # Sorted, since rows are sorted by neighbor
+        return np.searchsorted(self._entry_keys, np.asarray(rows, dtype=np.int64) * self.num_nodes + cols)
+
+    def positions(self, nodes):
+        """
+        Returns the CSR positions of all entries in the rows of `nodes`, concatenated.
+
+        Returns:
+            tuple: (positions, counts) where counts[i] is the row length of nodes[i].
+        """
+        starts = self.indptr[nodes]
+        counts = self.indptr[nodes + 1] - starts
+        row_offsets = np.cumsum(counts) - counts
+        positions = np.repeat(starts - row_offsets, counts) + np.arange(counts.sum())
+        return positions, counts
+
+    def to_networkx(self, node_ids=None):
+        """
+        Exports the graph as an nx.DiGraph (opt-in; traversal doesn't need it).
+
+        Args:
+            node_ids (list, optional): Original ID per node, stored as the 'original_id' attribute.
+
+        Returns:
+            nx.DiGraph: Nodes are 0..num_nodes-1, edges go row -> neighbor and carry
+                        'edge_type' when known.
+        """
+        graph = nx.DiGraph()
+        if node_ids is None:
+            graph.add_nodes_from(range(self.num_nodes))
+        else:
+            graph.add_nodes_from((i, {'original_id': node_id}) for i, node_id in enumerate(node_ids))
+
+        sources = np.repeat(np.arange(self.num_nodes), np.diff(self.indptr)).tolist()
+        targets = self.indices.tolist()
+        if self.edge_types is None:
+            graph.add_edges_from(zip(sources, targets))
+        else:
+            graph.add_edges_from(
+                (u, v, {'edge_type': t}) for u, v, t in zip(sources, targets, self.edge_types.tolist()))
+        return graph
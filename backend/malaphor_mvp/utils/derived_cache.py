@@ -0,0 +1,54 @@
+# utils/derived_cache.py
+
+import numpy as np
+
+# Attributes starting with '_' are kept in Data.__dict__ rather than the PyG store,
+# so they are never treated as node/edge attributes or copied by data.to()/subgraph().
+_CACHE_ATTR = '_derived_cache'
+_VERSION_ATTR = '_graph_version'
+
+
+def graph_version(data):
+    """Returns the graph's change counter (0 until something calls bump_graph_version)."""
+    return data.__dict__.get(_VERSION_ATTR, 0)
+
+
+def bump_graph_version(data):
+    """Marks the graph as changed, invalidating everything cached with cached_derived."""
+    data.__dict__[_VERSION_ATTR] = graph_version(data) + 1
+    data.__dict__.pop(_CACHE_ATTR, None)
+
+
+def cached_derived(data, key, build):
+    """
+    Returns a value derived from `data`, building it at most once per graph version.
+
+    Use it for structures computed from the graph alone (selector masks,
+    adjacency, reachability) that several steps or repeated calls need. Code
+    that modifies a graph in place must call bump_graph_version.
+
+    Args:
+        data (torch_geometric.data.Data): The graph.
+        key (hashable): Identifies the derived value.
+        build (callable): build() -> value, called on a miss.
+    """
+    version = graph_version(data)
+    cache = data.__dict__.get(_CACHE_ATTR)
+    if cache is None or cache['version'] != version:
+        cache = {'version': version, 'values': {}}
+        data.__dict__[_CACHE_ATTR] = cache
+    values = cache['values']
+    if key not in values:
+        values[key] = build()
+    return values[key]
+
+
+def node_id_array(data):
+    """Original node IDs as an object array indexed by node index (cached per graph)."""
+    return cached_derived(data, 'node_ids', lambda: np.asarray(
+        [data.idx_to_id[i] for i in range(data.num_nodes)], dtype=object))
+
+
+def node_type_codes(data):
+    """Type code of every node (x[:, 0]) as an int64 array (cached per graph)."""
+    return cached_derived(data, 'type_codes', lambda: data.x[:, 0].numpy().astype(np.int64))
@@ -6,28 +6,30 @@ def to_networkx(data: torch_geometric.data.Data, node_ids, edge_types=None):
     Converts a PyG Data object to a NetworkX graph.
     Includes node IDs as attributes.
     Optionally includes edge types.
+
+    Path analysis no longer needs this (it traverses utils.csr_graph.CSRGraph);
+    it is kept as an export for tools that want a NetworkX graph.
     """
     G = nx.DiGraph() # Use DiGraph for directed edges
 
-    # Add nodes with original IDs and any relevant features
-    for i, node_id in enumerate(node_ids):
-        node_features = data.x[i].tolist() # Convert tensor features to list
-        # For MVP, let's also add anomaly score if available (will pass this later)
-        G.add_node(i, original_id=node_id, features=node_features) # Use integer index as node ID for NetworkX
+    # Add nodes with original IDs and any relevant features, in one bulk call
+    node_features = data.x.tolist() # Convert tensor features to lists once, not per node
+    G.add_nodes_from(
+        (i, {'original_id': node_id, 'features': node_features[i]}) # Use integer index as node ID for NetworkX
+        for i, node_id in enumerate(node_ids)
+    )
 
     # Add edges
-    edge_index = data.edge_index.t().tolist() # Get edges as list of (src, dest) tuples
-
-    # For MVP, we didn't explicitly add edge types to the PyG Data object in a standard way.
-    # If your data had edge types associated with the edge_index, you'd add them here.
-    # Let's assume for now edges just represent a connection. If you simulate edge types,
-    # you would need to build edge features in build_graph and handle them.
-    # For a simple MVP, we'll add the edge.
+    edge_index = data.edge_index.t().tolist() # Get edges as list of (src, dest) pairs
 
-    for src, dest in edge_index:
-         G.add_edge(src, dest) # Add edge using integer indices
+    if edge_types is None:
+        G.add_edges_from(edge_index) # Add edges using integer indices
+    else:
+        # One type per edge_index column; with parallel edges the last one wins, as with add_edge
+        edge_types = edge_types.tolist() if hasattr(edge_types, 'tolist') else list(edge_types)
+        G.add_edges_from((src, dest, {'edge_type': edge_type}) for (src, dest), edge_type in zip(edge_index, edge_types))
 
     print(f"Converted PyG graph ({data.num_nodes} nodes, {data.num_edges} edges) to NetworkX graph ({G.number_of_nodes()} nodes, {G.number_of_edges()} edges).")
     return G
 
-# We won't run this directly, it's a utility.
\ No newline at end of file
+# We won't run this directly, it's a utility.
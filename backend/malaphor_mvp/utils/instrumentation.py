@@ -0,0 +1,178 @@
+# utils/instrumentation.py
+
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+try:
+    import resource # Unix only; without it peak RSS and child CPU time are reported as None
+except ImportError:
+    resource = None
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MB (None where unsupported)."""
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return max_rss / (1024 * 1024) if sys.platform == 'darwin' else max_rss / 1024
+
+
+def _children_cpu_seconds():
+    """CPU time of finished child processes (e.g. path search workers), in seconds."""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+class Instrumentation:
+    """
+    Collects timed spans and counters for one pipeline run.
+
+    Each span records wall time, CPU time of this process and of child
+    processes that finished during the span, and the process's peak RSS at the
+    end of the span together with how much the span raised it. Spans nest;
+    nested spans are named by their path ('analyze_paths/search'). Recording a
+    span costs a few microseconds, so it is cheap enough to leave on always.
+
+    Example:
+        metrics = Instrumentation()
+        with metrics.span('build_graph'):
+            ...
+        metrics.set_counter('nodes', data.num_nodes)
+        print(metrics.report())
+    """
+
+    def __init__(self):
+        self.spans = []
+        self.counters = {}
+        self._stack = []
+
+    @contextmanager
+    def span(self, name):
+        """Times the enclosed block as a span called `name` (nested under any open span)."""
+        path = '/'.join(self._stack + [name])
+        record = {'name': path, 'depth': len(self._stack)}
+        self.spans.append(record) # Listed in start order, parents before children
+        self._stack.append(name)
+        start_rss = peak_rss_mb()
+        start_children_cpu = _children_cpu_seconds()
+        start_cpu = time.process_time()
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['wall_seconds'] = time.perf_counter() - start
+            record['cpu_seconds'] = time.process_time() - start_cpu
+            end_children_cpu = _children_cpu_seconds()
+            record['children_cpu_seconds'] = (None if end_children_cpu is None
+                                              else end_children_cpu - start_children_cpu)
+            end_rss = peak_rss_mb()
+            record['peak_rss_mb'] = end_rss
+            record['peak_rss_growth_mb'] = None if end_rss is None else end_rss - start_rss
+            self._stack.pop()
+
+    def count(self, name, value=1):
+        """Adds `value` to a counter."""
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def set_counter(self, name, value):
+        """Sets a counter to `value`."""
+        self.counters[name] = value
+
+    def report(self):
+        """
+        The collected measurements as a JSON-serializable dict.
+
+        Returns:
+            dict: {'spans': [{'name', 'depth', 'wall_seconds', 'cpu_seconds',
+                              'children_cpu_seconds', 'peak_rss_mb', 'peak_rss_growth_mb'}, ...],
+                   'counters': {...}, 'peak_rss_mb': float}
+        """
+        return {
+            'spans': [dict(record) for record in self.spans],
+            'counters': dict(self.counters),
+            'peak_rss_mb': peak_rss_mb(),
+        }
+
+    def log(self):
+        """Prints the spans as an indented table, followed by the counters."""
+        print("--- Pipeline Metrics ---")
+        for record in self.spans:
+            if 'wall_seconds' not in record:
+                continue # Still open
+            label = '  ' * record['depth'] + record['name'].rsplit('/', 1)[-1]
+            rss = '' if record['peak_rss_mb'] is None else \
+                f" | peak RSS {record['peak_rss_mb']:8.1f} MB (+{record['peak_rss_growth_mb']:.1f})"
+            print(f"{label:<28} wall {record['wall_seconds']:8.3f} s | cpu {record['cpu_seconds']:8.3f} s{rss}")
+        if self.counters:
+            print("Counters: " + ", ".join(f"{name}={value}" for name, value in self.counters.items()))
+
+
+def summarize_reports(reports):
+    """
+    Aggregates Instrumentation reports of several runs per span name.
+
+    Returns:
+        dict: {'runs': int,
+               'spans': {name: {'count', 'total_wall_seconds', 'mean_wall_seconds', 'max_wall_seconds',
+                                'total_cpu_seconds', 'max_peak_rss_mb'}},
+               'counters': {name: total}}
+    """
+    spans = {}
+    counters = {}
+    for report in reports:
+        for record in report['spans']:
+            if 'wall_seconds' not in record:
+                continue
+            summary = spans.setdefault(record['name'], {
+                'count': 0, 'total_wall_seconds': 0.0, 'max_wall_seconds': 0.0,
+                'total_cpu_seconds': 0.0, 'max_peak_rss_mb': None,
+            })
+            summary['count'] += 1
+            summary['total_wall_seconds'] += record['wall_seconds']
+            summary['max_wall_seconds'] = max(summary['max_wall_seconds'], record['wall_seconds'])
+            summary['total_cpu_seconds'] += record['cpu_seconds']
+            if record['peak_rss_mb'] is not None:
+                summary['max_peak_rss_mb'] = max(summary['max_peak_rss_mb'] or 0.0, record['peak_rss_mb'])
+        for name, value in report['counters'].items():
+            if isinstance(value, (int, float)):
+                counters[name] = counters.get(name, 0) + value
+    for summary in spans.values():
+        summary['mean_wall_seconds'] = summary['total_wall_seconds'] / summary['count']
+    return {'runs': len(reports), 'spans': spans, 'counters': counters}
+
+
+class MetricsRegistry:
+    """
+    Thread-safe store of the most recent run reports, for a metrics endpoint.
+
+    Args:
+        max_reports (int): How many recent reports to keep.
+    """
+
+    def __init__(self, max_reports=100):
+        self._reports = deque(maxlen=max_reports)
+        self._lock = threading.Lock()
+        self.total_runs = 0
+
+    def record(self, report):
+        """Adds one run's report."""
+        with self._lock:
+            self._reports.append(report)
+            self.total_runs += 1
+
+    def recent(self):
+        """The kept reports, oldest first."""
+        with self._lock:
+            return list(self._reports)
+
+    def summary(self):
+        """summarize_reports over the kept reports, plus the number of runs ever recorded."""
+        summary = summarize_reports(self.recent())
+        summary['total_runs'] = self.total_runs
+        return summary
@@ -0,0 +1,139 @@
+# utils/json_stream.py
+
+import json
+import zlib
+
+try:
+    import orjson # Optional: several times faster than the json module
+except ImportError:
+    orjson = None
+
+# Lists longer than this are encoded (and sent) this many items at a time
+DEFAULT_BATCH_SIZE = 5000
+
+# zlib wbits for each supported Content-Encoding
+_WBITS = {'gzip': 16 + zlib.MAX_WBITS, 'deflate': zlib.MAX_WBITS}
+
+
+def dumps(value):
+    """Encodes a JSON-compatible value to UTF-8 bytes, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, separators=(',', ':')).encode()
+
+
+def iter_json(value, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Encodes `value` as JSON in pieces, so large payloads never exist as one string.
+
+    Dicts are walked key by key and long lists are encoded batch_size items at a
+    time; everything else is encoded in one call.
+
+    Yields:
+        bytes: Consecutive pieces of the JSON document.
+    """
+    if isinstance(value, dict):
+        yield b'{'
+        for i, (key, item) in enumerate(value.items()):
+            yield (b',' if i else b'') + dumps(str(key)) + b':'
+            yield from iter_json(item, batch_size)
+        yield b'}'
+    elif isinstance(value, list) and len(value) > batch_size:
+        yield b'['
+        for start in range(0, len(value), batch_size):
+            # Drop the batch's own brackets and splice it into the outer list
+            yield (b',' if start else b'') + dumps(value[start:start + batch_size])[1:-1]
+        yield b']'
+    else:
+        yield dumps(value)
+
+
+def negotiate_encoding(accept_encoding):
+    """
+    Picks the response Content-Encoding from an Accept-Encoding header.
+
+    Returns:
+        str or None: 'gzip', 'deflate', or None for an uncompressed response.
+    """
+    offered = {}
+    for part in (accept_encoding or '').split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        if params.strip().startswith('q='):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        offered[name.strip().lower()] = quality
+    for encoding in ('gzip', 'deflate'):
+        if offered.get(encoding, offered.get('*', 0.0)) > 0:
+            return encoding
+    return None
+
+
+def compress_chunks(chunks, encoding, level=6):
+    """
+    Compresses a stream of byte chunks on the fly.
+
+    Args:
+        chunks (iterable[bytes]): Uncompressed data, e.g. from iter_json.
+        encoding (str or None): 'gzip', 'deflate' or None (pass chunks through).
+        level (int): zlib compression level (1 = fastest, 9 = smallest).
+
+    Yields:
+        bytes: Compressed data, only when the compressor has output ready.
+    """
+    if encoding is None:
+        yield from chunks
+        return
+    compressor = zlib.compressobj(level, zlib.DEFLATED, _WBITS[encoding])
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def iter_file(path, chunk_size=1 << 20):
+    """
+    Reads an already-encoded JSON file back in chunks (e.g. a cached or stored result).
+
+    The file is opened right away rather than on first iteration, so the
+    response keeps working if the file is deleted (evicted) meanwhile.
+    """
+    f = open(path, 'rb')
+
+    def chunks():
+        with f:
+            while chunk := f.read(chunk_size):
+                yield chunk
+    return chunks()
+
+
+def extend_object(chunks, fields):
+    """
+    Adds top-level fields to a JSON object that is being streamed (e.g. from iter_file).
+
+    Args:
+        chunks (iterable[bytes]): A complete JSON object, in pieces.
+        fields (dict): Extra fields, encoded before the object's closing brace.
+
+    Yields:
+        bytes: The extended object.
+    """
+    previous = None
+    last_byte = b'' # Last non-whitespace byte already sent
+    for chunk in chunks:
+        if previous is not None:
+            yield previous
+            last_byte = previous.rstrip()[-1:] or last_byte
+        previous = chunk
+    body = (previous or b'').rstrip()
+    if not body.endswith(b'}'):
+        raise ValueError("extend_object needs a JSON object")
+    body = body[:-1]
+    yield body
+    empty = (body.rstrip()[-1:] or last_byte) == b'{'
+    for i, (key, value) in enumerate(fields.items()):
+        yield (b'' if empty and i == 0 else b',') + dumps(str(key)) + b':' + dumps(value)
+    yield b'}'
@@ -0,0 +1,154 @@
+# utils/payload.py
+
+import numpy as np
+
+from .derived_cache import node_id_array, node_type_codes
+
+
+def _optional_column(num_nodes, node_index, values):
+    """Spreads per-result values to a per-node list, with None for nodes without a result."""
+    column = np.full(num_nodes, None, dtype=object)
+    column[node_index] = values.tolist() # Python scalars, so the payload stays JSON-serializable
+    return column.tolist()
+
+
+def build_nodes_payload(pyg_data, anomaly_results_df):
+    """
+    Builds the frontend node list from whole columns at once.
+
+    Same records as the original per-node loop (id, label, type, anomaly_score,
+    prediction, features, node_index), without per-node tensor reads or
+    DataFrame lookups.
+
+    Args:
+        pyg_data (torch_geometric.data.Data): The graph.
+        anomaly_results_df (pandas.DataFrame): Output of detect_anomalies.
+
+    Returns:
+        list[dict]: One record per node, in node index order.
+    """
+    num_nodes = pyg_data.num_nodes
+    node_ids = node_id_array(pyg_data).tolist()
+    node_types = np.asarray(pyg_data.unique_types, dtype=object)[node_type_codes(pyg_data)].tolist()
+    features = pyg_data.x.tolist()
+
+    node_index = anomaly_results_df['node_index'].to_numpy()
+    anomaly_scores = _optional_column(num_nodes, node_index, anomaly_results_df['anomaly_score'].to_numpy())
+    predictions = _optional_column(num_nodes, node_index, anomaly_results_df['prediction'].to_numpy())
+
+    return [
+        {
+            'id': node_id, # Use original ID as Cytoscape node ID
+            'label': node_id, # Label for display
+            'type': node_type,
+            'anomaly_score': anomaly_score,
+            'prediction': prediction, # -1 for anomaly
+            'features': node_features, # Include raw features if needed
+            'node_index': i, # Keep internal index for potential debugging
+        }
+        for i, (node_id, node_type, anomaly_score, prediction, node_features)
+        in enumerate(zip(node_ids, node_types, anomaly_scores, predictions, features))
+    ]
+
+
+def build_edges_payload(edges_df):
+    """
+    Builds the frontend edge list (source, target, relationship_type) using original IDs.
+
+    Works with both edges_df layouts build_graph returns (the raw CSV frame or
+    the compact categorical frame).
+    """
+    columns = [edges_df[name].to_numpy(dtype=object).tolist()
+               for name in ('source_id', 'target_id', 'relationship_type')]
+    return [
+        {'source': source, 'target': target, 'relationship_type': relationship}
+        for source, target, relationship in zip(*columns)
+    ]
+
+
+def build_risky_paths_payload(pyg_data, risky_paths):
+    """
+    Converts analyze_paths output into JSON-friendly records.
+
+    Returns:
+        list[dict]: {'score', 'path_ids', 'path_with_types'} per path.
+    """
+    unique_types = np.asarray(pyg_data.unique_types, dtype=object)
+    type_codes = node_type_codes(pyg_data)
+    payload = []
+    for score, path_ids, path_indices in risky_paths:
+        path_types = unique_types[type_codes[path_indices]]
+        payload.append({
+            'score': float(score), # Ensure score is a standard float
+            'path_ids': path_ids,
+            'path_with_types': " -> ".join(f"{node_id} ({node_type})" for node_id, node_type in zip(path_ids, path_types)),
+        })
+    return payload
+
+
+PAYLOAD_FORMATS = ('records', 'columnar')
+
+
+def build_columnar_payload(pyg_data, anomaly_results_df, risky_paths, max_paths=10):
+    """
+    Assembles the compact /upload response: one array per field instead of one object per node/edge.
+
+    Node IDs are sent once; node types and relationships are small integer codes
+    into the 'node_types' / 'relationship_types' vocabularies, and edges are
+    (source, target) node index pairs taken straight from edge_index. Node i of
+    every node array is the node with node_index i. Edge columns come from
+    pyg_data, so they follow edge_index order like the records format.
+
+    Returns:
+        dict: {'format': 'columnar', 'node_types', 'relationship_types',
+               'nodes': {'id', 'type', 'anomaly_score', 'prediction', 'features'},
+               'edges': {'source', 'target', 'relationship_type'},
+               'risky_paths': [...]} (risky path records also carry 'path_indices').
+    """
+    num_nodes = pyg_data.num_nodes
+    node_index = anomaly_results_df['node_index'].to_numpy()
+    risky_paths = risky_paths[:max_paths]
+    risky_paths_payload = build_risky_paths_payload(pyg_data, risky_paths)
+    for record, (_, _, path_indices) in zip(risky_paths_payload, risky_paths):
+        record['path_indices'] = [int(i) for i in path_indices]
+
+    return {
+        'format': 'columnar',
+        'node_types': [str(t) for t in pyg_data.unique_types],
+        'relationship_types': [str(r) for r in pyg_data.relationship_types],
+        'nodes': {
+            'id': node_id_array(pyg_data).tolist(),
+            'type': node_type_codes(pyg_data).tolist(),
+            'anomaly_score': _optional_column(num_nodes, node_index, anomaly_results_df['anomaly_score'].to_numpy()),
+            'prediction': _optional_column(num_nodes, node_index, anomaly_results_df['prediction'].to_numpy()),
+            'features': pyg_data.x.tolist(),
+        },
+        'edges': {
+            'source': pyg_data.edge_index[0].tolist(),
+            'target': pyg_data.edge_index[1].tolist(),
+            'relationship_type': pyg_data.edge_type.tolist(),
+        },
+        'risky_paths': risky_paths_payload,
+    }
+
+
+def build_payload(pyg_data, anomaly_results_df, edges_df, risky_paths, max_paths=10, payload_format='records'):
+    """
+    Assembles the /upload response: nodes, edges and the top risky paths.
+
+    Args:
+        payload_format (str): 'records' (one object per node / edge, what the frontend
+                              reads) or 'columnar' (see build_columnar_payload).
+
+    Returns:
+        dict: {'nodes': [...], 'edges': [...], 'risky_paths': [...]} for 'records'.
+    """
+    if payload_format == 'columnar':
+        return build_columnar_payload(pyg_data, anomaly_results_df, risky_paths, max_paths=max_paths)
+    if payload_format != 'records':
+        raise ValueError(f"Unknown payload format {payload_format!r}; use one of {PAYLOAD_FORMATS}")
+    return {
+        'nodes': build_nodes_payload(pyg_data, anomaly_results_df),
+        'edges': build_edges_payload(edges_df),
+        'risky_paths': build_risky_paths_payload(pyg_data, risky_paths[:max_paths]),
+    }
@@ -0,0 +1,181 @@
+# utils/result_cache.py
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+from .json_stream import iter_json
+
+# Bump whenever run_full_pipeline's results change for the same input and parameters
+RESULT_CACHE_VERSION = 1
+
+
+def save_upload(stream, directory, suffix='.csv', block_size=1 << 20):
+    """
+    Copies an upload stream to a new uniquely named file, hashing it on the way.
+
+    The file gets a fresh name from tempfile (never the client-supplied one),
+    so concurrent uploads cannot overwrite each other, and the content hash
+    costs no extra pass over the data.
+
+    Args:
+        stream (file-like): Readable binary stream, e.g. a werkzeug FileStorage's .stream.
+        directory (str): Where to create the file.
+
+    Returns:
+        tuple: (file path, sha256 hex digest of the content). The caller deletes the file.
+    """
+    os.makedirs(directory, exist_ok=True)
+    digest = hashlib.sha256()
+    fd, filepath = tempfile.mkstemp(suffix=suffix, dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for block in iter(lambda: stream.read(block_size), b''):
+                digest.update(block)
+                f.write(block)
+    except BaseException:
+        os.remove(filepath)
+        raise
+    return filepath, digest.hexdigest()
+
+
+def result_cache_key(content_hash, params):
+    """
+    Cache key for pipeline results: the input's content hash plus every parameter that changes them.
+
+    Args:
+        content_hash (str): sha256 of the uploaded CSV.
+        params (dict): JSON-serializable pipeline parameters (model mode, epochs, contamination, ...).
+
+    Returns:
+        str: Hex digest.
+    """
+    key_material = json.dumps({
+        'content': content_hash,
+        'params': params,
+        'version': RESULT_CACHE_VERSION,
+    }, sort_keys=True)
+    return hashlib.sha256(key_material.encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    """
+    Content-addressed cache of pipeline results, stored as JSON files with LRU eviction by size.
+
+    Each entry is one <key>.json file. A hit refreshes the file's modification
+    time, and after every insert the least recently used entries are deleted
+    until the cache fits in max_bytes. All state is on disk, so the web process
+    and job workers can share one cache directory; the hit / miss / store /
+    eviction counters are for this process only.
+
+    Args:
+        cache_dir (str): Directory holding the entries (created if missing).
+        max_bytes (int): Size budget for all entries together.
+    """
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get_path(self, key):
+        """
+        Looks up an entry.
+
+        Returns:
+            str or None: Path of the cached JSON results, or None on a miss. Open it
+                         promptly; it may be evicted by a later insert.
+        """
+        path = self._path(key)
+        try:
+            os.utime(path) # Mark as most recently used
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return path
+
+    def put(self, key, results):
+        """Stores pipeline results (a JSON-compatible dict) under `key`."""
+        def write(f):
+            for chunk in iter_json(results):
+                f.write(chunk)
+        self._publish(key, write)
+
+    def put_file(self, key, filepath):
+        """Stores an existing JSON results file (e.g. a finished job's result) under `key`."""
+        def write(f):
+            with open(filepath, 'rb') as source:
+                shutil.copyfileobj(source, f)
+        self._publish(key, write)
+
+    def _publish(self, key, write):
+        # Written under a temporary name and renamed into place, so readers never see a partial entry
+        fd, staging_path = tempfile.mkstemp(prefix=f'.{key}.', dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                write(f)
+            os.replace(staging_path, self._path(key))
+        except BaseException:
+            os.remove(staging_path)
+            raise
+        self.stores += 1
+        self.evict()
+
+    def _entries(self):
+        """(mtime, size, path) of every entry, least recently used first."""
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith('.json') and not entry.name.startswith('.'):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue # Evicted concurrently
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return sorted(entries)
+
+    def evict(self):
+        """Deletes least recently used entries until the cache fits in max_bytes."""
+        entries = self._entries()
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                self.evictions += 1
+            except FileNotFoundError:
+                pass
+            total_bytes -= size
+
+    def clear(self):
+        """Deletes every entry."""
+        for _, _, path in self._entries():
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def stats(self):
+        """Hit / miss metrics of this process plus the current size of the cache."""
+        entries = self._entries()
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else None,
+            'stores': self.stores,
+            'evictions': self.evictions,
+            'entries': len(entries),
+            'bytes': sum(size for _, size, _ in entries),
+            'max_bytes': self.max_bytes,
+        }
@@ -0,0 +1,32 @@
+# tests/conftest.py
+#
+# Run from the backend directory:
+#   python -m pytest tests
+
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+SAMPLE_CSV = os.path.join(BACKEND_DIR, 'malaphor_mvp', 'data', 'simulated_cloud_data.csv')
+
+
+@pytest.fixture
+def events_csv(tmp_path):
+    """A small event CSV with one missing relationship_type."""
+    path = tmp_path / 'events.csv'
+    pd.DataFrame({
+        'source_id': ['user_1', 'user_2', 'vm_1', 'user_1'],
+        'source_type': ['user', 'user', 'vm', 'user'],
+        'target_id': ['vm_1', 's3_1', 's3_1', 's3_1'],
+        'target_type': ['vm', 's3', 's3', 's3'],
+        'relationship_type': ['accesses', None, 'network_conn', 'accesses'],
+        'feature1': [10, 20, 30, 40],
+        'feature2': [0.1, 0.2, 0.3, 0.4],
+    }).to_csv(path, index=False)
+    return str(path)
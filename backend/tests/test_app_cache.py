@@ -0,0 +1,60 @@
+# tests/test_app_cache.py
+
+import io
+import os
+
+import pytest
+
+import app as malaphor_app
+from malaphor_mvp.utils.result_cache import ResultCache
+
+from conftest import SAMPLE_CSV
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    config = malaphor_app.app.config
+    monkeypatch.setitem(config, 'MODEL_PATH', str(tmp_path / 'model' / 'graphsage.pt'))
+    monkeypatch.setitem(config, 'GRAPH_CACHE_DIR', str(tmp_path / 'graph_cache'))
+    monkeypatch.setitem(config, 'UPLOAD_TEMP_DIR', str(tmp_path / 'uploads'))
+    monkeypatch.setitem(config, 'PIPELINE_PARAMS', {**config['PIPELINE_PARAMS'], 'epochs': 5})
+    monkeypatch.setattr(malaphor_app, 'result_cache', ResultCache(str(tmp_path / 'result_cache'), 1 << 30))
+    return malaphor_app.app.test_client()
+
+
+def _upload(client, **form):
+    with open(SAMPLE_CSV, 'rb') as f:
+        data = {'file': (io.BytesIO(f.read()), 'events.csv'), **form}
+    response = client.post('/upload', data=data, content_type='multipart/form-data')
+    assert response.status_code == 200
+    return response
+
+
+def test_repeated_default_upload_is_served_from_the_cache(client):
+    first = _upload(client)
+    second = _upload(client)
+
+    assert first.headers.get('X-Result-Cache') is None
+    assert second.headers.get('X-Result-Cache') == 'hit'
+    assert second.get_json() == first.get_json()
+    assert not os.path.exists(malaphor_app.app.config['MODEL_PATH'])
+
+
+def test_uploads_that_save_the_model_always_run(client):
+    _upload(client, save_model='1')
+    model_path = malaphor_app.app.config['MODEL_PATH']
+    saved_at = os.stat(model_path).st_mtime_ns
+
+    response = _upload(client, save_model='1')
+
+    assert response.headers.get('X-Result-Cache') is None
+    assert os.stat(model_path).st_mtime_ns != saved_at
+
+
+def test_inference_uploads_are_cached_per_saved_model(client):
+    _upload(client, save_model='1')
+    _upload(client, model_mode='inference')
+    assert _upload(client, model_mode='inference').headers.get('X-Result-Cache') == 'hit'
+
+    _upload(client, save_model='1')
+    assert _upload(client, model_mode='inference').headers.get('X-Result-Cache') is None
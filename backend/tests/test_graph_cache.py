@@ -0,0 +1,31 @@
+# tests/test_graph_cache.py
+
+import os
+
+from malaphor_mvp.data_processing import graph_cache
+from malaphor_mvp.data_processing.build_graph import UNKNOWN_RELATIONSHIP, build_graph
+
+
+def test_cached_graph_matches_fresh_build(events_csv, tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    fresh, _, _ = build_graph(events_csv)
+    build_graph(events_csv, cache_dir=cache_dir)
+    cached, _, _ = build_graph(events_csv, cache_dir=cache_dir)
+
+    assert list(cached.relationship_types) == list(fresh.relationship_types)
+    assert cached.edge_type.tolist() == fresh.edge_type.tolist()
+    assert UNKNOWN_RELATIONSHIP in list(cached.relationship_types)
+
+
+def test_entry_of_an_old_cache_version_is_rebuilt(events_csv, tmp_path, monkeypatch, capsys):
+    cache_dir = str(tmp_path / 'cache')
+    monkeypatch.setattr(graph_cache, 'GRAPH_CACHE_VERSION', graph_cache.GRAPH_CACHE_VERSION - 1)
+    build_graph(events_csv, cache_dir=cache_dir)
+    monkeypatch.undo()
+    capsys.readouterr()
+
+    data, _, _ = build_graph(events_csv, cache_dir=cache_dir)
+
+    assert "Loaded cached graph" not in capsys.readouterr().out
+    assert len([name for name in os.listdir(cache_dir) if not name.startswith('.')]) == 2
+    assert data.relationship_types[data.edge_type[1]] == UNKNOWN_RELATIONSHIP
@@ -0,0 +1,44 @@
+# tests/test_job_store.py
+
+import os
+import socket
+import subprocess
+import sys
+
+from malaphor_mvp.jobs.store import JobStore, current_owner
+
+
+def _store(tmp_path):
+    return JobStore(str(tmp_path / 'jobs.sqlite3'), str(tmp_path / 'results'))
+
+
+def _exited_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+def test_fail_orphaned_only_fails_jobs_whose_owner_is_gone(tmp_path):
+    store = _store(tmp_path)
+    host = socket.gethostname()
+    mine = store.create({}, owner=current_owner())
+    other_live = store.create({}, owner=f"{host}:{os.getppid()}:token")
+    dead = store.create({}, owner=f"{host}:{_exited_pid()}:token")
+    earlier_same_pid = store.create({}, owner=f"{host}:{os.getpid()}:earlier-token")
+    store.mark_running(other_live)
+
+    assert store.fail_orphaned("Interrupted") == 2
+
+    assert store.get(mine)['status'] == 'queued'
+    assert store.get(other_live)['status'] == 'running'
+    assert store.get(dead)['status'] == 'failed'
+    assert store.get(earlier_same_pid)['status'] == 'failed'
+
+
+def test_finished_jobs_are_left_alone(tmp_path):
+    store = _store(tmp_path)
+    job_id = store.create({}, owner=f"{socket.gethostname()}:{_exited_pid()}:token")
+    store.mark_cancelled(job_id)
+
+    assert store.fail_orphaned("Interrupted") == 0
+    assert store.get(job_id)['status'] == 'cancelled'
@@ -0,0 +1,60 @@
+# tests/test_online.py
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import IsolationForest
+
+from malaphor_mvp.anomaly_detection import online
+from malaphor_mvp.anomaly_detection.online import _FlatForest, events_from_records
+from malaphor_mvp.data_processing.build_graph import STREAMING_COLUMNS, UNKNOWN_RELATIONSHIP
+
+
+@pytest.fixture
+def detector():
+    embeddings = np.random.default_rng(1).normal(size=(500, 8))
+    return IsolationForest(n_estimators=50, contamination=0.1, random_state=42).fit(embeddings)
+
+
+def test_flat_forest_matches_score_samples(detector):
+    rows = np.random.default_rng(2).normal(size=(64, 8))
+    flat_forest = _FlatForest.from_detector(detector)
+
+    assert flat_forest is not None, "the installed scikit-learn is outside the range _FlatForest supports"
+    np.testing.assert_array_equal(flat_forest.score_samples(rows), detector.score_samples(rows))
+
+
+def test_flat_forest_falls_back_when_private_attributes_change(detector, monkeypatch):
+    monkeypatch.delattr(type(detector), '_average_path_length_per_tree', raising=False)
+    monkeypatch.delattr(detector, '_average_path_length_per_tree', raising=False)
+    assert _FlatForest.from_detector(detector) is None
+
+
+def test_flat_forest_falls_back_when_packed_scores_differ(detector, monkeypatch):
+    monkeypatch.setattr(online, '_average_path_length', lambda n_samples: np.asarray(n_samples, dtype=float) * 2)
+    assert _FlatForest.from_detector(detector) is None
+
+
+def _event(**overrides):
+    event = {'source_id': 'user_1', 'source_type': 'user', 'target_id': 's3_1', 'target_type': 's3',
+             'relationship_type': 'accesses', 'feature1': 1, 'feature2': 0.5}
+    return {**event, **overrides}
+
+
+def test_events_from_records_maps_missing_relationship_to_unknown():
+    events_df = events_from_records([_event(relationship_type=None), _event(relationship_type=float('nan'))])
+
+    assert list(events_df.columns) == STREAMING_COLUMNS
+    assert events_df['relationship_type'].tolist() == [UNKNOWN_RELATIONSHIP, UNKNOWN_RELATIONSHIP]
+
+
+@pytest.mark.parametrize('column', ['source_id', 'target_id', 'source_type', 'target_type'])
+def test_events_from_records_rejects_null_entities(column):
+    with pytest.raises(ValueError, match=column):
+        events_from_records([_event(), _event(**{column: None})])
+
+
+def test_events_from_records_keeps_numeric_ids_as_strings():
+    events_df = events_from_records([_event(source_id=7)])
+    assert events_df['source_id'].tolist() == ['7']
+    assert isinstance(events_df, pd.DataFrame)